@@ -0,0 +1,251 @@
+"""
+Offline benchmarks for the framewirc hot paths.
+
+Usage:
+
+    python benchmarks/run.py [--output results.json] [--compare old.json]
+
+Results are written as JSON, so that runs from different versions can be
+compared with `--compare`.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import timeit
+
+from framewirc import commands, filters
+from framewirc.client import Client
+from framewirc.connection import Connection
+from framewirc.handlers import basic_handlers
+from framewirc.messages import (
+    build_message,
+    chunk_message,
+    make_privmsgs,
+    ReceivedMessage,
+)
+from framewirc.simulator import SimulatedServer
+from framewirc.strings import to_unicode
+
+
+REPEAT = 5
+# These time a single round trip, rather than an operation that is repeated,
+# so are reported as latencies, not rates.
+LATENCIES = {'simulator.ping_latency'}
+
+ASCII_TEXT = 'The quick brown fox jumps over the lazy dog. ' * 40
+MULTIBYTE_TEXT = 'Ŧɧé ʠüíčк ƀŗøŵñ ƒøχ ĵüɱƥş øvèŗ ŧɧé łäžÿ đøğ. ☃ ' * 40
+RAW_LINES = {
+    'privmsg': b':nick!~ident@host.example.com PRIVMSG #channel :Hello, world!\r\n',
+    'numeric': b':irc.example.com 353 me = #channel :@op +voice a b c d e f g\r\n',
+    'ping': b'PING :irc.example.com\r\n',
+}
+
+
+class BenchClient(Client):
+    handlers = ()
+    nick = 'bench'
+    real_name = 'framewirc benchmark'
+
+
+class NullWriter:
+    """Stands in for a StreamWriter, discarding everything written."""
+    def write(self, data):
+        pass
+
+
+def measure(func, number):
+    """Time `func`, returning the best seconds per call over REPEAT runs."""
+    best = min(timeit.Timer(func).repeat(repeat=REPEAT, number=number))
+    return best / number
+
+
+def bench_parse():
+    for name, raw in sorted(RAW_LINES.items()):
+        yield 'parse.' + name, measure(lambda: ReceivedMessage(raw), 20000)
+
+
+def bench_build():
+    def build():
+        build_message(commands.PRIVMSG, '#channel', suffix='Hello, world!')
+    yield 'build_message', measure(build, 20000)
+
+
+def bench_send():
+    """Time Connection.send, with and without the trusted fast path."""
+    client = BenchClient()
+    connection = Connection(client=client, host='127.0.0.1')
+    connection.writer = NullWriter()
+    built = build_message(commands.PRIVMSG, '#channel', suffix='Hello, world!')
+    raw = bytes(built)
+    yield 'send.built', measure(lambda: connection.send(built), 20000)
+    yield 'send.raw', measure(lambda: connection.send(raw), 20000)
+
+
+def bench_chunk():
+    for name, text in [('ascii', ASCII_TEXT), ('multibyte', MULTIBYTE_TEXT)]:
+        yield 'chunk_message.' + name, measure(lambda: chunk_message(text, 400), 500)
+        yield 'make_privmsgs.' + name, measure(
+            lambda: make_privmsgs('#channel', text),
+            500,
+        )
+
+
+def bench_to_unicode():
+    yield 'to_unicode.utf8', measure(lambda: to_unicode(b'Hyl\xc3\xb4'), 20000)
+    # Not valid utf8, so falls back to cchardet.
+    latin_1 = b'Ume\xe5 is a city in northern Sweden.'
+    yield 'to_unicode.fallback', measure(lambda: to_unicode(latin_1), 2000)
+
+
+def bench_dispatch():
+    message = ReceivedMessage(RAW_LINES['privmsg'])
+
+    @filters.allow(commands.NOTICE)
+    def ignored(client, message):
+        pass
+
+    for count in (1, 10, 100):
+        client = BenchClient(handlers=(ignored,) * count)
+        yield 'dispatch.handlers_{}'.format(count), measure(
+            lambda: client.on_message(message),
+            20000 // count,
+        )
+
+
+def bench_connection(lines=50000):
+    """Time lines flowing from a local stand-in server through Connection."""
+    payload = RAW_LINES['privmsg'] * lines
+
+    async def run():
+        served = asyncio.get_event_loop().create_future()
+
+        async def serve(reader, writer):
+            writer.write(payload)
+            writer.write_eof()
+            # Wait for the client to hang up, so nothing it sent goes unread.
+            await reader.read()
+            writer.close()
+            served.set_result(None)
+
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        client = BenchClient()
+        client.connection = Connection(
+            client=client,
+            host='127.0.0.1',
+            port=port,
+            ssl=False,
+        )
+        start = time.perf_counter()
+        await client.connection.connect()
+        elapsed = time.perf_counter() - start
+        await served
+        server.close()
+        await server.wait_closed()
+        return elapsed
+
+    loop = asyncio.new_event_loop()
+    try:
+        best = min(loop.run_until_complete(run()) for _ in range(REPEAT))
+    finally:
+        loop.close()
+    yield 'connection.end_to_end', best / lines
+
+
+def bench_simulator(duration=2):
+    """Time PING round trips while the simulator streams PRIVMSGs."""
+    server = SimulatedServer(ping_interval=0.05, privmsg_rate=20000)
+
+    async def run():
+        await server.start()
+        client = BenchClient(handlers=basic_handlers)
+        client.connection = Connection(
+            client=client,
+            host=server.host,
+            port=server.port,
+            ssl=False,
+        )
+        task = asyncio.get_event_loop().create_task(client.connection.connect())
+        await asyncio.sleep(duration)
+        stats = server.stats()
+        await server.close()
+        await task
+        return stats
+
+    loop = asyncio.new_event_loop()
+    try:
+        stats = loop.run_until_complete(run())
+    finally:
+        loop.close()
+    yield 'simulator.ping_latency', stats['ping_latency']['mean']
+
+
+BENCHMARKS = (
+    bench_parse,
+    bench_build,
+    bench_send,
+    bench_chunk,
+    bench_to_unicode,
+    bench_dispatch,
+    bench_connection,
+    bench_simulator,
+)
+
+
+def run_all():
+    results = {}
+    for benchmark in BENCHMARKS:
+        for name, seconds in benchmark():
+            if name in LATENCIES:
+                results[name] = {'latency_seconds': seconds}
+                print('{:<32} {:>14,.3f} ms'.format(name, seconds * 1000))
+                continue
+            results[name] = {
+                'seconds_per_op': seconds,
+                'ops_per_second': 1 / seconds,
+            }
+            print('{:<32} {:>14,.0f} ops/s'.format(name, 1 / seconds))
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'timestamp': time.time(),
+        'results': results,
+    }
+
+
+def compare(old, new):
+    """Print the relative change in speed of each benchmark."""
+    def seconds(result):
+        # Lower is better, for time per operation and latency alike.
+        return result.get('seconds_per_op', result.get('latency_seconds'))
+
+    print('\n{:<32} {:>10}'.format('benchmark', 'change'))
+    for name, result in sorted(new['results'].items()):
+        if name not in old['results']:
+            continue
+        change = seconds(old['results'][name]) / seconds(result) - 1
+        print('{:<32} {:>+9.1%}'.format(name, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--compare', help='Compare against this JSON file.')
+    args = parser.parse_args(argv)
+
+    report = run_all()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import gzip
+import itertools
+import os
+import queue
+import struct
+import threading
+import time
+
+from . import utils
+from .messages import ReceivedMessage
+
+
+# Each record is a header of (time received, length), followed by the message.
+RECORD = struct.Struct('<dH')
+SEGMENT_SUFFIX = '.seg'
+
+
+class SegmentWriter(utils.RequiredAttributesMixin):
+    """
+    Records every message a client receives into segment files.
+
+    Add `writer.handler` to a client's handlers. The raw bytes of each message
+    are stored with the time they were received. Records are gathered in
+    memory into blocks of `block_size` bytes (or for at most `flush_interval`
+    seconds, even if no more messages arrive), and written to disk by a
+    background thread, so the event loop never waits for the disk.
+
+    A new segment file is started in `directory` whenever the current one
+    reaches `max_bytes`. When `compress` is set, segments are gzipped.
+
+    Call `close` to write out any remaining records.
+    """
+    required_attributes = ('directory',)
+    block_size = 64 * 1024
+    compress = False
+    flush_interval = 1.0
+    max_bytes = 64 * 1024 * 1024
+    prefix = 'capture'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.segments = []
+        self._block = bytearray()
+        # Guards `_block`, which the background thread flushes when idle.
+        self._lock = threading.Lock()
+        self._names = itertools.count()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_blocks, daemon=True)
+        self._thread.start()
+
+    def handler(self, client, message):
+        """Record `message`. Use this as a client handler."""
+        record = RECORD.pack(time.time(), len(message)) + message
+        with self._lock:
+            self._block += record
+            full = len(self._block) >= self.block_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Hand the records gathered so far to the background thread."""
+        with self._lock:
+            if self._block:
+                self._queue.put(bytes(self._block))
+                self._block = bytearray()
+
+    def close(self):
+        """Write any remaining records, and wait until they are on disk."""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open_segment(self):
+        name = '{}-{:.0f}-{:04d}{}'.format(
+            self.prefix,
+            time.time(),
+            next(self._names),
+            SEGMENT_SUFFIX,
+        )
+        path = os.path.join(self.directory, name)
+        if self.compress:
+            path += '.gz'
+            segment = gzip.open(path, 'wb')
+        else:
+            segment = open(path, 'wb')
+        self.segments.append(path)
+        return segment
+
+    def _write_blocks(self):
+        segment = None
+        written = 0
+        try:
+            while True:
+                try:
+                    block = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    # Nothing has filled a block for a while.
+                    self.flush()
+                    continue
+                if block is None:
+                    return
+                if segment is None or written >= self.max_bytes:
+                    if segment is not None:
+                        segment.close()
+                    segment = self._open_segment()
+                    written = 0
+                segment.write(block)
+                written += len(block)
+                if self._queue.empty():
+                    segment.flush()
+        finally:
+            if segment is not None:
+                segment.close()
+
+
+def read_records(path):
+    """Yield `(time received, raw bytes)` for each record in a segment."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        data = f.read()
+
+    offset = 0
+    end = len(data)
+    while offset < end:
+        received, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        yield received, data[offset:offset + length]
+        offset += length
+
+
+def read_segment(path):
+    """Yield `(time received, ReceivedMessage)` for each record in a segment."""
+    for received, raw_message in read_records(path):
+        yield received, ReceivedMessage(raw_message)
+
+
+def replay(client, path):
+    """Pass every message recorded in a segment to `client.on_message`."""
+    for received, message in read_segment(path):
+        client.on_message(message)
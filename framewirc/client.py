@@ -1,6 +1,6 @@
 import asyncio
 
-from . import commands, utils
+from . import commands, replies, scheduler, streams, utils
 from .connection import Connection
 from .messages import build_message, make_privmsgs
 
@@ -9,10 +9,40 @@ class Client(utils.RequiredAttributesMixin):
     """Handle events from Connection and offer methods for sending data."""
     connection_class = Connection
     required_attributes = ('handlers', 'real_name', 'nick')
+    instrumentation = None
     mask_length = None
+    # Callables taking (client, message). If any returns False, the message
+    # is dropped before it reaches the handlers.
+    message_filters = ()
+    # True between the network's welcome and the connection closing.
+    registered = False
+    spool = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Kept up to date by `handlers.track_channels`.
+        self.channels = set()
+        self.replies = replies.ReplyCollector(client=self)
+        self.scheduler = scheduler.Scheduler(client=self)
+        self.subscriptions = []
+        self._registration = None
+
+    def ban_list(self, channel):
+        """Fetch the bans on a channel (awaitable list of `replies.Ban`)."""
+        msg = build_message(commands.MODE, channel, 'b')
+        return self.replies.fetch(replies.BANS, channel, msg)
+
+    def channel_list(self, *channels):
+        """Fetch channels (awaitable list of `replies.ChannelListing`)."""
+        targets = ','.join(channels)
+        # With no channels given, every channel is listed.
+        msg = build_message(commands.LIST, *([targets] if targets else []))
+        return self.replies.fetch(replies.LIST, targets, msg)
 
     def connect_to(self, host, **kwargs):
         """Create a Connection. Handled in the event loop."""
+        kwargs.setdefault('instrumentation', self.instrumentation)
+        kwargs.setdefault('spool', self.spool)
         self.connection = self.connection_class(client=self, host=host, **kwargs)
         loop = asyncio.get_event_loop()
         return loop.create_task(self.connection.connect())
@@ -22,6 +52,55 @@ class Client(utils.RequiredAttributesMixin):
         msg = build_message(commands.JOIN, ','.join(channels))
         self.connection.send(msg)
 
+    @property
+    def backlog(self):
+        """
+        The number of messages waiting to be read by `BLOCK` subscriptions.
+
+        Subscriptions that drop messages are already kept to their `maxsize`,
+        so a slow reader of one of those never holds up the connection.
+        """
+        return sum(len(s) for s in self._blocking())
+
+    async def drained(self, backlog=None):
+        """
+        Wait until no subscription is `saturated`.
+
+        When `backlog` is given, also wait until `self.backlog` is no more
+        than that.
+        """
+        while self.saturated:
+            for subscription in self.subscriptions:
+                await subscription.wait_for_space()
+        if backlog is None:
+            return
+        while self.backlog > backlog:
+            consumed = [s.consumed() for s in self._blocking()]
+            await asyncio.wait(consumed, return_when=asyncio.FIRST_COMPLETED)
+
+    async def wait_registered(self):
+        """Wait until the client is `registered` with the network."""
+        while not self.registered:
+            if self._registration is None:
+                self._registration = asyncio.get_event_loop().create_future()
+            await asyncio.shield(self._registration)
+
+    def messages(self, filter=None, maxsize=1000, overflow=streams.DROP_OLDEST):
+        """Subscribe to incoming messages. See `streams.Subscription`."""
+        subscription = streams.Subscription(
+            client=self,
+            filter=filter,
+            maxsize=maxsize,
+            overflow=overflow,
+        )
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def names(self, channel):
+        """Fetch the nicks in a channel (awaitable list of strings)."""
+        msg = build_message(commands.NAMES, channel)
+        return self.replies.fetch(replies.NAMES, channel, msg)
+
     def on_connect(self):
         """We're connected! Send our identity to the network!"""
         nick = self.nick
@@ -29,11 +108,44 @@ class Client(utils.RequiredAttributesMixin):
         self.connection.send(msg)
         self.set_nick(nick)
 
+    def on_disconnect(self):
+        """
+        The connection has closed. Pause scheduled jobs until we're back, fail
+        queries that are waiting for replies, and forget the channels we were
+        in.
+        """
+        self.registered = False
+        self.channels.clear()
+        self.scheduler.pause()
+        self.replies.disconnected()
+
     def on_message(self, message):
         """Get a message from IRC and send it to all handlers."""
+        if message.command == commands.RPL_WELCOME:
+            self.on_register()
+        self.replies.feed(message)
+        for message_filter in self.message_filters:
+            if not message_filter(self, message):
+                return
+        for subscription in self.subscriptions:
+            subscription.put(message)
+        if self.instrumentation is not None:
+            self.instrumentation.dispatch(self, message, self.handlers)
+            return
         for handler in self.handlers:
             handler(self, message)
 
+    def on_register(self):
+        """
+        Registered with the network, so jobs can send messages again, as can
+        anything waiting in `wait_registered`.
+        """
+        self.registered = True
+        self.scheduler.resume()
+        if self._registration is not None:
+            self._registration.set_result(None)
+            self._registration = None
+
     def part(self, *channels, message=b''):
         """Part from a number of channels (message optional)."""
         msg = build_message(commands.PART, ','.join(channels), suffix=message)
@@ -48,9 +160,22 @@ class Client(utils.RequiredAttributesMixin):
         )
         self.connection.send_batch(messages)
 
+    @property
+    def saturated(self):
+        """True when a subscription is full, and reading should stop."""
+        return any(s.saturated for s in self.subscriptions)
+
     def set_nick(self, new_nick):
         """Set a nick on the network."""
         self.connection.send(build_message(commands.NICK, new_nick))
         self.nick = new_nick
         # As soon as the nick changes, reset mask_length.
         self.mask_length = None
+
+    def who(self, mask):
+        """Fetch users matching a mask (awaitable list of `replies.WhoReply`)."""
+        msg = build_message(commands.WHO, mask)
+        return self.replies.fetch(replies.WHO, mask, msg)
+
+    def _blocking(self):
+        return [s for s in self.subscriptions if s.overflow == streams.BLOCK]
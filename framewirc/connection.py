@@ -1,35 +1,313 @@
 import asyncio
+import os
 
-from . import exceptions, utils
-from .messages import MAX_LENGTH, ReceivedMessage
+from . import commands, exceptions, tls, utils
+from .keepalive import Keepalive
+from .messages import BuiltMessage, MAX_LENGTH, ReceivedMessage
+from .resolver import race, Resolver
 
 
 class Connection(utils.RequiredAttributesMixin):
     """
     Communicates with an IRC network.
 
-    Incoming data is sent to `client.on_message`.
+    Incoming data is sent to `client.on_message`. Reading from the socket is
+    paused while the client is `saturated` (see `streams.Subscription`), or
+    once its `backlog` (of messages queued for `BLOCK` subscriptions)
+    reaches `read_high_water` messages. It resumes when
+    the backlog is down to `read_low_water`, so that a flood waits in the
+    socket buffers rather than in memory.
+
+    When a `spool.Spool` is set as `spool`, messages sent while disconnected
+    are kept, and sent once the connection is remade.
+
+    With `ssl = True` (the default), connections to the same `network` (by
+    default, the host) share one `tls.ResumingContext`, so reconnects resume
+    the previous TLS session. `ssl` can also be an `SSLContext`, or `False`.
+
+    To connect, the server's addresses are looked up through `resolver`
+    (which caches them), and tried in a staggered race (see `resolver.race`)
+    for up to `connect_timeout` seconds. When `servers` lists several
+    `(host, port)` pairs for the network, each connection attempt moves on to
+    the next, until one answers.
+
+    When `keepalive_interval` is set, the network is pinged to measure `lag`,
+    and the connection is remade when it goes stale. See `keepalive.Keepalive`.
     """
     required_attributes = ('client', 'host')
+    _closed = None
+    _connected = False
+    _detached = None
+    _next_server = -1
+    _reading_paused = False  # Until the client catches up. See `_pause_reading`.
+    # While detaching, lists of what was read and what would have been sent.
+    _unread = None
+    _unsent = None
+    connect_timeout = 30
+    detach_timeout = 10  # Seconds `detach` waits for sent data to leave.
+    happy_eyeballs_delay = 0.25
+    instrumentation = None
+    keepalive = None
+    keepalive_class = Keepalive
+    keepalive_interval = None  # Seconds between PINGs. `None` to disable.
+    lag = None
+    max_lag = 30
+    max_silence = 60
+    network = None
     port = 6697
+    read_high_water = 1000
+    read_low_water = 250
+    resolver = Resolver()
+    servers = ()  # (host, port) pairs. By default, just `host` and `port`.
+    spool = None
     ssl = True
+    write_high_water = 64 * 1024
+    write_low_water = 16 * 1024
 
     async def connect(self):
-        """Connect to the server, and dispatch incoming messages."""
-        connection = asyncio.open_connection(self.host, self.port, ssl=self.ssl)
-        self.reader, self.writer = await connection
+        """
+        Connect to the server, and dispatch incoming messages.
+
+        If `reconnect` is called, the connection will be made again.
+        """
+        self._reconnect = True
+        while self._reconnect:
+            self._reconnect = False
+            await self._session()
+
+    async def _session(self):
+        ssl = self.ssl
+        if ssl is True:
+            ssl = tls.context_for(self.network or self.host)
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        reader, writer = await self._open(ssl)
+
+        ssl_object = writer.get_extra_info('ssl_object')
+        if ssl_object is not None:
+            self._save_session(ssl_object)
+            if self.instrumentation is not None:
+                self.instrumentation.handshake(
+                    loop.time() - start,
+                    resumed=ssl_object.session_reused,
+                )
+        await self._run(reader, writer)
+
+    async def _open(self, ssl):
+        servers = self.servers or [(self.host, self.port)]
+        for attempt in range(len(servers)):
+            # Carry on from where the last connection left off.
+            self._next_server += 1
+            host, port = servers[self._next_server % len(servers)]
+            try:
+                return await asyncio.wait_for(
+                    self._open_server(host, port, ssl),
+                    self.connect_timeout,
+                )
+            except (OSError, asyncio.TimeoutError):
+                self.resolver.forget(host, port)
+                if attempt == len(servers) - 1:
+                    raise
+
+    async def _open_server(self, host, port, ssl):
+        addresses = await self.resolver.resolve(host, port)
+        sock = await race(addresses, delay=self.happy_eyeballs_delay)
+        try:
+            return await asyncio.open_connection(
+                sock=sock,
+                ssl=ssl,
+                server_hostname=host if ssl else None,
+            )
+        except BaseException:
+            sock.close()
+            raise
+
+    async def _run(self, reader, writer, registered=False):
+        self.reader, self.writer = reader, writer
+        self.writer.transport.set_write_buffer_limits(
+            high=self.write_high_water,
+            low=self.write_low_water,
+        )
+        self.lag = None
+
+        if self.instrumentation is not None:
+            self.instrumentation.connected(self.writer)
 
         self._connected = True
-        self.client.on_connect()
+        # Done when the connection is closed, to end any pause in reading.
+        self._closed = asyncio.get_event_loop().create_future()
+        self._start_keepalive()
+        if not registered:
+            self.client.on_connect()
 
         while self._connected:
+            if self.client.saturated:
+                await self._pause_reading()
+            elif self.client.backlog >= self.read_high_water:
+                await self._pause_reading()
+            if not self._connected:
+                return
             raw_message = await self.reader.readline()
+            if self._unread is not None:
+                # Detaching; this is for whoever takes the socket over, unless
+                # handing it over fails, and we carry on with it.
+                self._unread.append(raw_message)
+                if not await self._detached:
+                    return
             self.handle(raw_message)
 
-    def disconnect(self):
-        """Close the connection to the server."""
+    async def adopt(self, sock, unread=b'', unsent=b''):
+        """
+        Take over a connection that is already registered with the network.
+
+        `sock` is the connected socket, `unread` is anything received on it
+        that has not been handled yet, and `unsent` is anything that should
+        have been sent on it. See `handoff`.
+        """
+        reader, writer = await asyncio.open_connection(sock=sock)
+        reader.feed_data(unread)
+        if unsent:
+            writer.write(unsent)
+        self._reconnect = False
+        await self._run(reader, writer, registered=True)
+        while self._reconnect:
+            self._reconnect = False
+            await self._session()
+
+    async def detach(self):
+        """
+        Stop using the connection, without closing the socket.
+
+        Reading stops, and waits until everything already sent has left.
+        Returns `(fd, unread, unsent)`: a duplicate of the socket's file
+        descriptor, what was received but not yet handled, and what was sent
+        after reading stopped. See `handoff`.
+
+        If what was sent hasn't left within `detach_timeout` seconds, the
+        connection carries on as before, and `CannotHandOff` is raised.
+
+        The connection then idles until the socket has been handed over, and
+        `release` lets it go, or handing it over has failed, and `reattach`
+        carries on with it.
+        """
+        if self.ssl:
+            raise exceptions.CannotHandOff('TLS connections cannot be handed off.')
+        transport = self.writer.transport
+        transport.pause_reading()
+        self._detached = asyncio.get_event_loop().create_future()
+        self._unread = []
+        self._unsent = []
+        if self.keepalive is not None:
+            self.keepalive.stop()
+            self.keepalive = None
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.detach_timeout
+        try:
+            while transport.get_write_buffer_size():
+                if loop.time() > deadline:
+                    raise exceptions.CannotHandOff('Sent data did not leave in time.')
+                await asyncio.sleep(0.01)
+        except BaseException:
+            self.reattach()
+            raise
+
+        fd = os.dup(transport.get_extra_info('socket').fileno())
+        # StreamReader has no public way to take what's in its buffer.
+        self._unread.append(bytes(self.reader._buffer))
+        unread = b''.join(self._unread)
+        return fd, unread, b''.join(self._unsent)
+
+    def reattach(self):
+        """Carry on with a connection that `detach` didn't manage to hand over."""
+        self._detached.set_result(True)
+        unsent = b''.join(self._unsent)
+        self._unread = None
+        self._unsent = None
+        if unsent:
+            self._write(unsent)
+        self._start_keepalive()
+        if not self._reading_paused:
+            self.writer.transport.resume_reading()
+        elif self.keepalive is not None:
+            # The pause that was under way resumes both when it ends.
+            self.keepalive.pause()
+
+    def release(self):
+        """Let go of a detached connection, now that it has been handed over."""
+        self._detached.set_result(False)
+        self._connected = False
+        self._reconnect = False
+        self._end_pause()
+        self.writer.transport.abort()
+
+    async def _pause_reading(self):
+        """
+        Stop reading until the client has caught up, or the connection closes.
+
+        Nothing can arrive meanwhile, so the keepalive is paused too.
+        """
+        transport = self.writer.transport
+        transport.pause_reading()
+        self._reading_paused = True
+        if self.keepalive is not None:
+            self.keepalive.pause()
+        drained = asyncio.ensure_future(self.client.drained(self.read_low_water))
+        try:
+            await asyncio.wait(
+                [drained, self._closed],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            drained.cancel()
+            self._reading_paused = False
+            # `detach` may have replaced the keepalive, or stopped it.
+            if self.keepalive is not None:
+                self.keepalive.resume()
+            # While detaching, reading stays paused until `reattach`.
+            detaching = self._unread is not None
+            if self._connected and not detaching and not transport.is_closing():
+                transport.resume_reading()
+
+    def _end_pause(self):
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def _start_keepalive(self):
+        if self.keepalive_interval is not None:
+            self.keepalive = self.keepalive_class(connection=self)
+            self.keepalive.start()
+
+    def _save_session(self, ssl_object):
+        if isinstance(ssl_object.context, tls.ResumingContext):
+            ssl_object.context.save_session(ssl_object)
+
+    def disconnect(self, abort=False):
+        """
+        Close the connection to the server.
+
+        Unless `abort` is set, anything waiting to be written is sent first.
+        Aborting doesn't wait, which matters when the server has stopped
+        answering, and would never take it.
+
+        Does nothing if already disconnected (eg: when the read that was
+        waiting ends, after something else called this).
+        """
+        if not self._connected:
+            return
         self._connected = False
-        self.writer.close()
+        self._end_pause()
+        if self.keepalive is not None:
+            self.keepalive.stop()
+            self.keepalive = None
+        ssl_object = self.writer.get_extra_info('ssl_object')
+        if ssl_object is not None:
+            # With TLS 1.3, the session may only have arrived after connecting.
+            self._save_session(ssl_object)
+        if abort:
+            self.writer.transport.abort()
+        else:
+            self.writer.close()
+        self.client.on_disconnect()
 
     def handle(self, raw_message):
         """Dispatch the message to the client."""
@@ -38,10 +316,55 @@ class Connection(utils.RequiredAttributesMixin):
             self.disconnect()
             return
 
-        self.client.on_message(ReceivedMessage(raw_message))
+        if self.instrumentation is None:
+            message = ReceivedMessage(raw_message)
+        else:
+            message = self.instrumentation.parse(raw_message, ReceivedMessage)
+        if self.keepalive is not None:
+            self.keepalive.received(message)
+        if self.spool is not None and message.command == commands.RPL_WELCOME:
+            loop = asyncio.get_event_loop()
+            self._replaying = loop.create_task(self.spool.replay(self))
+        self.client.on_message(message)
+
+    def reconnect(self, abort=False):
+        """Drop the connection to the server, and connect again."""
+        self._reconnect = True
+        self.disconnect(abort=abort)
 
     def send(self, message):
         """Dispatch a message to the IRC network."""
+        self.validate(message)
+        self._write(message)
+
+    def send_batch(self, messages):
+        """
+        Dispatch a number of messages to the IRC network in a single write.
+
+        Every message is validated before any are sent.
+        """
+        # Iterated twice, so a generator mustn't be used up by validation.
+        messages = list(messages)
+        for message in messages:
+            self.validate(message)
+        self._write(b''.join(messages))
+
+    async def send_batch_async(self, messages):
+        """
+        Dispatch a number of messages, then wait until the network catches up.
+
+        Once more than `write_high_water` bytes are waiting to be sent, this
+        waits until fewer than `write_low_water` remain.
+        """
+        self.send_batch(messages)
+        await self.writer.drain()
+
+    def validate(self, message):
+        """Raise an exception if the message cannot be sent to the network."""
+        # Already checked by build_message.
+        if type(message) is BuiltMessage:
+            return
+
         # Must be bytes.
         if not isinstance(message, bytes):
             raise exceptions.MustBeBytes
@@ -58,9 +381,18 @@ class Connection(utils.RequiredAttributesMixin):
         if message.count(utils.LINEFEED) > 1:
             raise exceptions.StrayLineEnding
 
-        # Send to network.
-        self.writer.write(message)
+    def _write(self, data):
+        # Keep for whoever takes over the socket.
+        if self._unsent is not None:
+            self._unsent.append(data)
+            return
 
-    def send_batch(self, messages):
-        for message in messages:
-            self.send(message)
+        # Keep for later if we can't send now.
+        if self.spool is not None and not self._connected:
+            self.spool.append(data)
+            return
+
+        # Send to network.
+        self.writer.write(data)
+        if self.instrumentation is not None:
+            self.instrumentation.sent(data)
@@ -1,3 +1,7 @@
+class CannotHandOff(Exception):
+    pass
+
+
 class MessageTooLong(Exception):
     pass
 
@@ -16,5 +20,12 @@ class NoLineEnding(Exception):
     pass
 
 
+class ReplyError(Exception):
+    """The network answered a request with an error numeric."""
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message.suffix.decode('utf-8', 'replace'))
+
+
 class StrayLineEnding(Exception):
     pass
@@ -1,3 +1,10 @@
+import abc
+import re
+from functools import wraps
+
+from . import masks
+
+
 def deny(blacklist):
     """
     Decorates a handler to filter out a blacklist of commands.
@@ -15,9 +22,10 @@ def deny(blacklist):
         def handle_everything_except_this(client, message):
             pass
     """
-    blacklist = [blacklist] if isinstance(blacklist, str) else blacklist
+    blacklist = frozenset([blacklist] if isinstance(blacklist, str) else blacklist)
 
     def inner_decorator(handler):
+        @wraps(handler)
         def wrapped(client, message):
             if message.command not in blacklist:
                 handler(client=client, message=message)
@@ -42,11 +50,247 @@ def allow(whitelist):
         def handle_only_this(client, message):
             pass
     """
-    whitelist = [whitelist] if isinstance(whitelist, str) else whitelist
+    whitelist = frozenset([whitelist] if isinstance(whitelist, str) else whitelist)
 
     def inner_decorator(handler):
+        @wraps(handler)
         def wrapped(client, message):
             if message.command in whitelist:
                 handler(client=client, message=message)
         return wrapped
     return inner_decorator
+
+
+def when(predicate):
+    """
+    Decorates a handler to filter out messages that don't match a predicate.
+
+    Predicates can be combined with `&` ("and"), `|` ("or") and `~` ("not"):
+
+        @when(command('PRIVMSG') & channel('#a', '#b') & ~sender('*!*@spam.*'))
+        def handle_privmsgs_in_a_or_b_not_from_spammers(client, message):
+            pass
+
+    The combination is compiled to a single test when decorating. Where it
+    can be, it is simplified (eg: `command('A') | command('B')` is tested as
+    `command('A', 'B')`).
+    """
+    test = predicate.compile()
+
+    def inner_decorator(handler):
+        @wraps(handler)
+        def wrapped(client, message):
+            if test(message):
+                handler(client=client, message=message)
+        return wrapped
+    return inner_decorator
+
+
+class Predicate(metaclass=abc.ABCMeta):
+    """
+    A test of a message. Combine with `&`, `|` and `~`; see `when`.
+
+    Predicates of names, masks or patterns match nothing when they have none
+    (eg: the intersection `command('A') & command('B')`).
+    """
+    # Lower numbers are cheaper, and are tested first.
+    cost = 10
+
+    def __and__(self, other):
+        return All([self, other])
+
+    def __or__(self, other):
+        return Any([self, other])
+
+    def __invert__(self):
+        return Not(self)
+
+    @abc.abstractmethod
+    def compile(self):
+        """Return a function that takes a message, and returns a `bool`."""
+
+
+class Command(Predicate):
+    """Matches messages with one of the `names` as their command."""
+    cost = 0
+
+    def __init__(self, names):
+        self.names = frozenset(names)
+
+    def compile(self):
+        names = self.names
+        return lambda message: message.command in names
+
+    def intersection(self, other):
+        return Command(self.names & other.names)
+
+    def union(self, other):
+        return Command(self.names | other.names)
+
+
+class Channel(Predicate):
+    """Matches messages whose first param is one of the `names`."""
+    cost = 1
+
+    def __init__(self, names):
+        self.names = frozenset(name.lower() for name in names)
+
+    def compile(self):
+        names = self.names
+
+        def test(message):
+            return bool(message.params) and message.params[0].lower() in names
+        return test
+
+    def intersection(self, other):
+        return Channel(self.names & other.names)
+
+    def union(self, other):
+        return Channel(self.names | other.names)
+
+
+class Sender(Predicate):
+    """Matches messages with a prefix like one of the `*` and `?` `masks`."""
+    cost = 2
+
+    def __init__(self, masks):
+        self.masks = tuple(masks)
+
+    def compile(self):
+        if not self.masks:
+            return lambda message: False
+        pattern = '|'.join(masks.translate(mask) for mask in self.masks)
+        match = re.compile(pattern, re.DOTALL | re.IGNORECASE).match
+        return lambda message: match(message.prefix) is not None
+
+    def union(self, other):
+        return Sender(self.masks + other.masks)
+
+
+class Body(Predicate):
+    """
+    Matches messages whose suffix contains a match for one of `patterns`.
+
+    Each pattern is compiled on its own, so may start with inline flags (eg:
+    `(?i)`) that apply to it alone.
+    """
+    cost = 3
+
+    def __init__(self, patterns):
+        self.patterns = tuple(
+            pattern.encode() if isinstance(pattern, str) else pattern
+            for pattern in patterns
+        )
+
+    def compile(self):
+        searches = [re.compile(pattern).search for pattern in self.patterns]
+        if len(searches) == 1:
+            search, = searches
+            return lambda message: search(message.suffix) is not None
+
+        def test(message):
+            suffix = message.suffix
+            return any(search(suffix) is not None for search in searches)
+        return test
+
+    def union(self, other):
+        return Body(self.patterns + other.patterns)
+
+
+class Not(Predicate):
+    def __init__(self, predicate):
+        self.predicate = predicate
+        self.cost = predicate.cost
+
+    def __invert__(self):
+        return self.predicate
+
+    def compile(self):
+        if isinstance(self.predicate, Command):
+            names = self.predicate.names
+            return lambda message: message.command not in names
+        test = self.predicate.compile()
+        return lambda message: not test(message)
+
+
+class _Combination(Predicate):
+    combine = None  # Name of the method that merges two alike predicates.
+
+    def __init__(self, predicates):
+        self.predicates = []
+        for predicate in predicates:
+            if type(predicate) is type(self):
+                self.predicates.extend(predicate.predicates)
+            else:
+                self.predicates.append(predicate)
+        self.cost = max(predicate.cost for predicate in self.predicates)
+
+    def simplified(self):
+        """Merge predicates of the same kind, and put the cheapest first."""
+        merged = {}
+        others = []
+        for predicate in self.predicates:
+            if not hasattr(predicate, self.combine):
+                others.append(predicate)
+            elif type(predicate) in merged:
+                existing = merged[type(predicate)]
+                merged[type(predicate)] = getattr(existing, self.combine)(predicate)
+            else:
+                merged[type(predicate)] = predicate
+        predicates = list(merged.values()) + others
+        return sorted(predicates, key=lambda predicate: predicate.cost)
+
+
+class All(_Combination):
+    combine = 'intersection'
+
+    def compile(self):
+        tests = [predicate.compile() for predicate in self.simplified()]
+        if len(tests) == 1:
+            return tests[0]
+        if len(tests) == 2:
+            first, second = tests
+            return lambda message: first(message) and second(message)
+        return lambda message: all(test(message) for test in tests)
+
+
+class Any(_Combination):
+    combine = 'union'
+
+    def compile(self):
+        tests = [predicate.compile() for predicate in self.simplified()]
+        if len(tests) == 1:
+            return tests[0]
+        if len(tests) == 2:
+            first, second = tests
+            return lambda message: first(message) or second(message)
+        return lambda message: any(test(message) for test in tests)
+
+
+def _require(name, values):
+    if not values:
+        raise TypeError('{}() needs at least one argument'.format(name))
+
+
+def body(*patterns):
+    """Predicate matching messages whose suffix matches a regex."""
+    _require('body', patterns)
+    return Body(patterns)
+
+
+def channel(*names):
+    """Predicate matching messages to (or about) one of the channels."""
+    _require('channel', names)
+    return Channel(names)
+
+
+def command(*names):
+    """Predicate matching messages with one of the commands."""
+    _require('command', names)
+    return Command(names)
+
+
+def sender(*masks):
+    """Predicate matching messages from `nick!ident@host` masks."""
+    _require('sender', masks)
+    return Sender(masks)
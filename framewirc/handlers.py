@@ -1,5 +1,6 @@
 from . import commands, filters, parsers
 from .messages import build_message
+from .strings import to_unicode
 
 
 @filters.allow([commands.PRIVMSG, commands.NOTICE, commands.RPL_WHOISUSER])
@@ -19,6 +20,27 @@ def capture_mask_length(client, message):
             client.mask_length = len(' '.join(message.params[:-1]))
 
 
+@filters.allow([commands.JOIN, commands.KICK, commands.PART])
+def track_channels(client, message):
+    """
+    Keep `client.channels` up to date with the channels we're in.
+
+    Channel names are case-insensitive, so they are kept in lower case.
+    """
+    if message.command == commands.KICK:
+        channel, nick = message.params[:2]
+    else:
+        nick = parsers.nick(message.prefix)['nick']
+        channel = message.params[0] if message.params else to_unicode(message.suffix)
+    if nick != client.nick:
+        return
+    channel = channel.lower()
+    if message.command == commands.JOIN:
+        client.channels.add(channel)
+    else:
+        client.channels.discard(channel)
+
+
 @filters.allow(commands.PING)
 def ping(client, message):
     """On recieving PING, repond with PONG."""
@@ -32,4 +54,4 @@ def nickname_in_use(client, message):
     client.set_nick(client.nick + '^')
 
 
-basic_handlers = (capture_mask_length, ping, nickname_in_use)
+basic_handlers = (capture_mask_length, ping, nickname_in_use, track_channels)
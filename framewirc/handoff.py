@@ -0,0 +1,153 @@
+"""
+Hand live connections over to a new process, without reconnecting.
+
+In the new process, wait for the connections:
+
+    tasks = await handoff.take_over(path, {'freenode': client})
+
+Then, in the old process, give them up:
+
+    await handoff.hand_over(path, {'freenode': old_client})
+
+The sockets are passed over the Unix socket at `path` (with `SCM_RIGHTS`),
+along with each client's nick, channels and `mask_length`, and anything that
+had been received but not handled, or sent but not yet written. The network
+doesn't see a thing.
+
+Clients are matched up by name. Only connections without TLS can be handed
+over, as the TLS session can't be moved to another process.
+"""
+import array
+import asyncio
+import json
+import os
+import socket
+import struct
+
+
+# Sent (with the file descriptors) before the state: (state length, fd count).
+HEADER = struct.Struct('<II')
+MAX_FDS = 1024
+
+
+def client_state(client, unread, unsent):
+    """The state of `client` to pass on, as something JSON can encode."""
+    return {
+        'channels': sorted(client.channels),
+        'host': client.connection.host,
+        'mask_length': client.mask_length,
+        'nick': client.nick,
+        'port': client.connection.port,
+        # Latin-1 maps each byte to one character, so nothing is lost.
+        'unread': unread.decode('latin-1'),
+        'unsent': unsent.decode('latin-1'),
+    }
+
+
+async def hand_over(path, clients):
+    """
+    Give up the connections of `clients` (a dict of names to clients).
+
+    If they can't be handed over (eg: nothing is listening at `path`), the
+    clients carry on with their connections, and the error is raised.
+    """
+    connections = []
+    fds = []
+    states = {}
+    try:
+        for name, client in clients.items():
+            fd, unread, unsent = await client.connection.detach()
+            connections.append(client.connection)
+            fds.append(fd)
+            states[name] = client_state(client, unread, unsent)
+            states[name]['fd'] = len(fds) - 1
+        payload = json.dumps(states).encode()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, send_fds, path, payload, fds)
+    except BaseException:
+        for connection in connections:
+            connection.reattach()
+        raise
+    else:
+        for connection in connections:
+            connection.release()
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+
+async def take_over(path, clients):
+    """
+    Wait for connections to be handed over, and give them to `clients`.
+
+    Returns the tasks running the connections (see `Client.connect_to`).
+    """
+    loop = asyncio.get_event_loop()
+    payload, fds = await loop.run_in_executor(None, receive_fds, path)
+    states = json.loads(payload.decode())
+
+    tasks = []
+    for name, state in states.items():
+        fd = fds[state['fd']]
+        if name not in clients:
+            os.close(fd)
+            continue
+        client = clients[name]
+        client.nick = state['nick']
+        client.mask_length = state['mask_length']
+        client.channels = set(state['channels'])
+        client.connection = client.connection_class(
+            client=client,
+            host=state['host'],
+            port=state['port'],
+            ssl=False,
+            instrumentation=client.instrumentation,
+            spool=client.spool,
+        )
+        adopt = client.connection.adopt(
+            socket.socket(fileno=fd),
+            unread=state['unread'].encode('latin-1'),
+            unsent=state['unsent'].encode('latin-1'),
+        )
+        tasks.append(loop.create_task(adopt))
+        # Already registered, so there's no welcome to wait for.
+        client.on_register()
+    return tasks
+
+
+def receive_fds(path):
+    """Listen on `path`, and return the payload and fds sent by `send_fds`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        try:
+            server.listen(1)
+            sock, _ = server.accept()
+        finally:
+            os.unlink(path)
+
+    with sock:
+        fds = array.array('i')
+        ancillary_size = socket.CMSG_SPACE(MAX_FDS * fds.itemsize)
+        header, ancillary, _, _ = sock.recvmsg(HEADER.size, ancillary_size)
+        for level, kind, data in ancillary:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+        length, count = HEADER.unpack(header)
+
+        payload = bytearray()
+        while len(payload) < length:
+            chunk = sock.recv(length - len(payload))
+            if not chunk:
+                raise EOFError('Connection closed during handoff.')
+            payload += chunk
+    return bytes(payload), list(fds)
+
+
+def send_fds(path, payload, fds):
+    """Connect to `path`, and send `payload` along with the `fds`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        header = HEADER.pack(len(payload), len(fds))
+        rights = (socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))
+        sock.sendmsg([header], [rights])
+        sock.sendall(payload)
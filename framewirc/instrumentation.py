@@ -0,0 +1,103 @@
+import weakref
+from collections import Counter, defaultdict
+from time import perf_counter
+
+
+def _name(handler):
+    qualname = getattr(handler, '__qualname__', None)
+    if qualname is None:
+        return repr(handler)
+    return '{}.{}'.format(handler.__module__, qualname)
+
+
+class Instrumentation:
+    """
+    Counts and times the work done for a Client.
+
+    Instrumentation is opt-in. Set it on a client to enable it:
+
+        client = MyClient(instrumentation=Instrumentation())
+
+    Connections made with `Client.connect_to` report to the same instance.
+    When a client's `instrumentation` is `None` (the default), nothing is
+    measured. An instance set on a `Client` subclass is shared by every
+    instance of that class, and so aggregates their figures (including the
+    `send_queue_depth` of every connection).
+
+    `snapshot` returns the current figures as a dictionary, ready for polling
+    by a metrics exporter.
+    """
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.commands = Counter()
+        self.handler_calls = Counter()
+        self.handler_time = defaultdict(float)
+        # Time taken to connect, including the TLS handshake.
+        self.handshake_time = 0.0
+        self.handshakes = 0
+        self.handshakes_resumed = 0
+        self.parse_time = 0.0
+        # Forgotten once their connections are gone.
+        self.writers = weakref.WeakSet()
+
+    def connected(self, writer):
+        """Include `writer` (a `StreamWriter`) in the `send_queue_depth`."""
+        self.writers.add(writer)
+
+    def dispatch(self, client, message, handlers):
+        """Pass `message` to each of the `handlers`, timing each one."""
+        for handler in handlers:
+            start = perf_counter()
+            try:
+                handler(client, message)
+            finally:
+                self.handler_time[handler] += perf_counter() - start
+                self.handler_calls[handler] += 1
+
+    def handshake(self, duration, resumed=False):
+        """Record a TLS connection that took `duration` seconds to make."""
+        self.handshake_time += duration
+        self.handshakes += 1
+        if resumed:
+            self.handshakes_resumed += 1
+
+    def parse(self, raw_message, parser):
+        """Parse `raw_message` with `parser`, timing and counting it."""
+        start = perf_counter()
+        message = parser(raw_message)
+        self.parse_time += perf_counter() - start
+        self.bytes_in += len(raw_message)
+        self.commands[message.command] += 1
+        return message
+
+    def send_queue_depth(self):
+        """The number of bytes waiting to be sent, over every connection."""
+        depth = 0
+        for writer in list(self.writers):
+            transport = writer.transport
+            if transport is not None and not transport.is_closing():
+                depth += transport.get_write_buffer_size()
+        return depth
+
+    def sent(self, message):
+        self.bytes_out += len(message)
+
+    def snapshot(self):
+        handlers = defaultdict(lambda: {'calls': 0, 'time': 0.0})
+        for handler, calls in self.handler_calls.items():
+            figures = handlers[_name(handler)]
+            figures['calls'] += calls
+            figures['time'] += self.handler_time[handler]
+        return {
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'commands': dict(self.commands),
+            'handlers': dict(handlers),
+            'handshake_time': self.handshake_time,
+            'handshakes': self.handshakes,
+            'handshakes_resumed': self.handshakes_resumed,
+            'messages': sum(self.commands.values()),
+            'parse_time': self.parse_time,
+            'send_queue_depth': self.send_queue_depth(),
+        }
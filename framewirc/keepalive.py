@@ -0,0 +1,103 @@
+import asyncio
+import itertools
+from collections import deque
+
+from . import commands
+from .messages import build_message
+
+
+TOKEN_PREFIX = b'framewirc-'
+
+
+class Keepalive:
+    """
+    Measures the lag of a Connection, and reconnects when it goes stale.
+
+    Every `connection.keepalive_interval` seconds, a PING carrying a token is
+    sent. When the matching PONG arrives, the round trip time is added to a
+    rolling window of `samples`, and their mean is stored as `connection.lag`.
+
+    If a PING goes unanswered for `connection.max_lag` seconds, or nothing at
+    all is received for `connection.max_silence` seconds, the connection is
+    considered dead, and `connection.reconnect` is called.
+
+    While the connection has paused reading on purpose (see `pause`), nothing
+    can arrive, so no PINGs are sent and the connection isn't judged stale.
+    """
+    samples = 5
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.loop = asyncio.get_event_loop()
+        self.last_read = self.loop.time()
+        self.pending = {}  # token -> time sent
+        self.round_trips = deque(maxlen=self.samples)
+        self._paused_at = None
+        self._tokens = itertools.count()
+        self._task = None
+
+    def start(self):
+        self._task = self.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def pause(self):
+        """Stop judging the connection, because it has stopped reading."""
+        if self._paused_at is None:
+            self._paused_at = self.loop.time()
+
+    def resume(self):
+        """Carry on judging the connection, without counting the pause."""
+        if self._paused_at is None:
+            return
+        paused = self.loop.time() - self._paused_at
+        self._paused_at = None
+        self.last_read += paused
+        for token in self.pending:
+            self.pending[token] += paused
+
+    def received(self, message):
+        """Note that the connection is alive, and check for PONGs."""
+        self.last_read = self.loop.time()
+        if message.command == commands.PONG:
+            self.pong(message)
+
+    def pong(self, message):
+        """Record the round trip of a PONG that answers one of our PINGs."""
+        # Usually the token is the suffix, but some servers send it as a
+        # plain param (`PONG server token`).
+        token = message.suffix
+        if not token and message.params:
+            token = message.params[-1].encode()
+        sent = self.pending.pop(token, None)
+        if sent is None:
+            return
+        self.round_trips.append(self.loop.time() - sent)
+        self.connection.lag = sum(self.round_trips) / len(self.round_trips)
+
+    def stale(self):
+        """Has the connection gone quiet for longer than is acceptable?"""
+        now = self.loop.time()
+        if self.pending and now - min(self.pending.values()) > self.connection.max_lag:
+            return True
+        return now - self.last_read > self.connection.max_silence
+
+    def ping(self):
+        token = TOKEN_PREFIX + str(next(self._tokens)).encode()
+        self.pending[token] = self.loop.time()
+        self.connection.send(build_message(commands.PING, suffix=token))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.connection.keepalive_interval)
+            if self._paused_at is not None:
+                continue
+            if self.stale():
+                self._task = None
+                # Don't wait to flush output that a dead peer won't read.
+                self.connection.reconnect(abort=True)
+                return
+            self.ping()
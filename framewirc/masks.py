@@ -0,0 +1,165 @@
+import re
+from collections import OrderedDict
+
+from . import parsers
+
+
+WILDCARDS = frozenset('*?')
+
+
+def translate(mask):
+    """
+    Convert a mask to a regex.
+
+    Unlike `fnmatch.translate`, only `*` and `?` are special (nicks often
+    contain `[` and `]`).
+    """
+    parts = (
+        '.*' if char == '*' else '.' if char == '?' else re.escape(char)
+        for char in mask
+    )
+    return '(?:{})\\Z'.format(''.join(parts))
+
+
+def _host_suffix(mask):
+    """
+    Find the literal end of a mask's host, if it starts on a label boundary.
+
+    For example, `*!*@*.example.com` has the suffix `.example.com`, and
+    `nick!*@host.example.com` has the suffix `host.example.com`. Masks
+    without such a suffix (eg: `*!*@*ample.com`) return `None`.
+    """
+    if '@' not in mask:
+        return None
+    host = mask.rsplit('@', 1)[1]
+    last_wildcard = max(host.rfind('*'), host.rfind('?'))
+    suffix = host[last_wildcard + 1:]
+    if last_wildcard == -1 or suffix.startswith('.'):
+        return suffix or None
+    return None
+
+
+def _host_suffixes(host):
+    """All the suffixes of a host that start on a label boundary."""
+    yield host
+    index = host.find('.')
+    while index != -1:
+        yield host[index:]
+        index = host.find('.', index + 1)
+
+
+class MaskSet:
+    """
+    A set of `nick!ident@host` masks, which may use `*` and `?` wildcards.
+
+    `match` checks a message prefix against every mask at once:
+
+    - Masks without wildcards are looked up in a set.
+    - Masks whose host ends with a literal (eg: `*!*@*.example.com`) are
+      grouped by that host suffix, so only groups that could match the
+      prefix's host are tested.
+    - All other masks are compiled into a single regex.
+
+    Results are cached for the last `cache_size` prefixes seen. Matching is
+    not case sensitive.
+    """
+    cache_size = 1024
+
+    def __init__(self, masks=()):
+        self._masks = set()
+        self._cache = OrderedDict()
+        self._compiled = None
+        for mask in masks:
+            self.add(mask)
+
+    def __contains__(self, mask):
+        return mask.lower() in self._masks
+
+    def __iter__(self):
+        return iter(self._masks)
+
+    def __len__(self):
+        return len(self._masks)
+
+    def add(self, mask):
+        self._masks.add(mask.lower())
+        self._changed()
+
+    def discard(self, mask):
+        self._masks.discard(mask.lower())
+        self._changed()
+
+    def match(self, prefix):
+        """Determine if a prefix (`nick!ident@host`) matches any mask."""
+        prefix = prefix.lower()
+        try:
+            self._cache.move_to_end(prefix)
+            return self._cache[prefix]
+        except KeyError:
+            pass
+
+        result = self._match(prefix)
+        self._cache[prefix] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _changed(self):
+        self._cache.clear()
+        self._compiled = None
+
+    def _compile(self):
+        literals = set()
+        by_suffix = {}
+        others = []
+        for mask in self._masks:
+            if not WILDCARDS.intersection(mask):
+                literals.add(mask)
+                continue
+            suffix = _host_suffix(mask)
+            if suffix is None:
+                others.append(mask)
+            else:
+                by_suffix.setdefault(suffix, []).append(mask)
+
+        groups = {
+            suffix: self._compile_masks(masks)
+            for suffix, masks in by_suffix.items()
+        }
+        return literals, groups, self._compile_masks(others)
+
+    def _compile_masks(self, masks):
+        if not masks:
+            return None
+        pattern = '|'.join(translate(mask) for mask in masks)
+        return re.compile(pattern, re.DOTALL).match
+
+    def _match(self, prefix):
+        if self._compiled is None:
+            self._compiled = self._compile()
+        literals, groups, others = self._compiled
+
+        if prefix in literals:
+            return True
+        try:
+            host = parsers.nick(prefix)['host']
+        except ValueError:  # Not in a format we can split.
+            host = None
+        if host is not None and groups:
+            for suffix in _host_suffixes(host):
+                match = groups.get(suffix)
+                if match is not None and match(prefix):
+                    return True
+        return others is not None and others(prefix) is not None
+
+
+def ignore(mask_set):
+    """
+    Make a message filter that drops messages from senders in `mask_set`.
+
+    Add it to `Client.message_filters`, so that ignored senders are dropped
+    before any handler sees them.
+    """
+    def message_filter(client, message):
+        return not (message.prefix and mask_set.match(message.prefix))
+    return message_filter
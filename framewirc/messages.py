@@ -9,6 +9,22 @@ ACTION_START = b'\1ACTION '
 ACTION_END = b'\1'
 MAX_LENGTH = 512  # The largest legal size of an IRC command.
 
+# Known commands (as bytes) mapped to their constants, to save decoding them.
+_KNOWN_COMMANDS = {
+    value.encode(): value
+    for name, value in vars(commands).items()
+    if name.isupper()
+}
+
+
+class BuiltMessage(bytes):
+    """
+    A message made by `build_message`, and so known to be valid.
+
+    `Connection.send` trusts these, and skips checking them again. Operations
+    on them (eg: concatenation) return plain `bytes`, which will be checked.
+    """
+
 
 class ReceivedMessage(bytes):
     """A message recieved from the IRC network."""
@@ -38,8 +54,15 @@ class ReceivedMessage(bytes):
         command, *params = message.split()
         params = tuple(to_unicode(p) for p in params if p)
 
+        # Known commands are the very same strings as the constants in
+        # `commands`, so comparisons with them are as fast as possible.
+        try:
+            command = _KNOWN_COMMANDS[command]
+        except KeyError:
+            command = to_unicode(command)
+
         # Suffix not yet turned to unicode to allow more complex encoding logic
-        return to_unicode(prefix), to_unicode(command), params, suffix
+        return to_unicode(prefix), command, params, suffix
 
 
 def build_message(command, *args, prefix=b'', suffix=b''):
@@ -71,7 +94,7 @@ def build_message(command, *args, prefix=b'', suffix=b''):
     if len(message) > MAX_LENGTH:
         raise exceptions.MessageTooLong
 
-    return message
+    return BuiltMessage(message)
 
 
 def _chunk_message(message, max_length):
@@ -150,24 +173,48 @@ def make_privmsgs(target, message, third_person=False, mask_length=None):
 
     When the `mask_length` is `None`, we allow a default of 100 chars.
     """
-    # If we don't know exactly how long the mask will be, make a guess.
-    # I can't find a maximum length in the spec; 100 chars seems safe.
-    if mask_length is None:
-        mask_length = 100
-
-    # Three spaces, two colons, \r, and \n makes 7:
-    #     :mask PRIVMSG target :message\r\n
-    #     ^    ^       ^      ^^        ^ ^
-    overhead = mask_length + len(commands.PRIVMSG) + len(target) + 7
-
-    # Third person messages (ie: /me) have a few extra chars.
-    if third_person:
-        overhead += len(ACTION_START) + len(ACTION_END)
-
-    max_length = MAX_LENGTH - overhead
-    messages = []
-    for line in chunk_message(message, max_length=max_length):
+    template = MessageTemplate(target)
+    return template.render(message, third_person=third_person, mask_length=mask_length)
+
+
+class MessageTemplate:
+    """
+    Builds messages to a `target`, reusing the parts that don't change.
+
+    `render` makes the same messages as `make_privmsgs` (or NOTICEs, if that
+    is the `command`), without rebuilding and checking the command and target
+    each time. Keep one around when sending many messages to one place.
+    """
+    def __init__(self, target, command=commands.PRIVMSG):
+        # Also checks that the command and target are fit to send.
+        self.empty = build_message(command, target)
+        self.head = self.empty[:-len(LINEFEED)] + b' :'
+
+        # A colon and space around the mask, and the line ending:
+        #     :mask PRIVMSG target :message\r\n
+        #     ^    ^                       ^ ^
+        self.overhead = len(self.head) + 4
+
+    def render(self, message, third_person=False, mask_length=None):
+        """Turn `message` into a list of messages. See `make_privmsgs`."""
+        # If we don't know exactly how long the mask will be, make a guess.
+        # I can't find a maximum length in the spec; 100 chars seems safe.
+        if mask_length is None:
+            mask_length = 100
+
+        max_length = MAX_LENGTH - self.overhead - mask_length
+
+        # Third person messages (ie: /me) have a few extra chars.
         if third_person:
-            line = ACTION_START + line + ACTION_END
-        messages.append(build_message(commands.PRIVMSG, target, suffix=line))
-    return messages
+            max_length -= len(ACTION_START) + len(ACTION_END)
+
+        messages = []
+        for line in chunk_message(message, max_length=max_length):
+            if third_person:
+                line = ACTION_START + line + ACTION_END
+            if line:
+                # The chunks are short enough, and have no line feeds.
+                messages.append(BuiltMessage(self.head + line + LINEFEED))
+            else:
+                messages.append(self.empty)
+        return messages
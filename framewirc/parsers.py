@@ -1,3 +1,6 @@
+from functools import wraps
+
+
 def is_channel(name):
     """
     Determine if a string is a valid channel name.
@@ -93,6 +96,7 @@ def apply_kwargs_parser(parser):
     otherwise have received.
     """
     def inner_decorator(handler):
+        @wraps(handler)
         def wrapped(**kwargs):
             parser_result = parser(**kwargs)
             kwargs.update(parser_result)
@@ -108,6 +112,7 @@ def apply_message_parser(parser):
     The parser will only be passed a `message` kwarg.
     """
     def inner_decorator(handler):
+        @wraps(handler)
         def wrapped(client, message):
             parser_result = parser(message=message)
             handler(client=client, message=message, **parser_result)
@@ -0,0 +1,103 @@
+import asyncio
+import importlib
+import importlib.util
+import os
+import sys
+
+
+class HandlerRegistry:
+    """
+    Handlers collected from modules, which can be reloaded while connected.
+
+    Each module lists its handlers in a module-level `handlers` tuple (or in
+    the attribute named after a colon, as below). Use the registry in place of
+    a tuple of handlers:
+
+        class MyClient(Client):
+            handlers = HandlerRegistry([
+                'framewirc.handlers:basic_handlers',
+                'mybot.quips',
+            ])
+
+    `reload` loads fresh copies of the modules, and builds a new table of
+    handlers from them. Only once every module has loaded are they put in
+    `sys.modules`, and the new table swapped in with a single assignment, so
+    each message is passed to either the old handlers or the new ones, never
+    a mix. If any module fails to load, nothing changes, and the error is
+    raised.
+
+    `watch` reloads whenever a module's file changes. Errors are passed to
+    the event loop's exception handler, and the old handlers kept.
+    """
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.attributes = []
+        self.modules = []
+        for name in self.names:
+            module_name, _, attribute = name.partition(':')
+            self.attributes.append(attribute or 'handlers')
+            self.modules.append(importlib.import_module(module_name))
+        self.handlers = self._collect()
+
+    def __iter__(self):
+        return iter(self.handlers)
+
+    def __len__(self):
+        return len(self.handlers)
+
+    def reload(self):
+        """Load every module afresh, and swap in their handlers."""
+        fresh = {}
+        for module in self.modules:
+            if module.__name__ not in fresh:
+                fresh[module.__name__] = _load(module.__spec__)
+        modules = [fresh[module.__name__] for module in self.modules]
+        handlers = self._collect(modules)
+        sys.modules.update(fresh)
+        self.modules = modules
+        self.handlers = handlers
+
+    async def watch(self, interval=1):
+        """Check the modules' files every `interval` seconds, and reload."""
+        mtimes = self._mtimes()
+        while True:
+            await asyncio.sleep(interval)
+            latest = self._mtimes()
+            if latest == mtimes:
+                continue
+            mtimes = latest
+            try:
+                self.reload()
+            except Exception as exception:
+                # Keep watching, so that the mistake can be fixed.
+                asyncio.get_event_loop().call_exception_handler({
+                    'message': 'Failed to reload handlers',
+                    'exception': exception,
+                })
+
+    def _collect(self, modules=None):
+        handlers = []
+        for module, attribute in zip(modules or self.modules, self.attributes):
+            handlers.extend(getattr(module, attribute))
+        return tuple(handlers)
+
+    def _mtimes(self):
+        mtimes = []
+        for module in self.modules:
+            try:
+                mtimes.append(os.stat(module.__file__).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+
+def _load(spec):
+    """A new module from the file `spec` was loaded from, outside `sys.modules`."""
+    spec = importlib.util.spec_from_file_location(
+        spec.name,
+        spec.origin,
+        submodule_search_locations=spec.submodule_search_locations,
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
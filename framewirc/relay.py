@@ -0,0 +1,123 @@
+import asyncio
+from collections import defaultdict
+
+from . import commands, filters, parsers
+from .messages import MessageTemplate
+from .strings import to_unicode
+
+
+class Destination:
+    """
+    A channel that relayed messages are sent to, with its own queue.
+
+    Each destination sends from its own queue, so a slow network only holds up
+    its own messages. Messages are sent in batches of up to `batch_size`, and
+    the next batch waits until the network has caught up. When the queue holds
+    `queue_size` lines, new lines are dropped (and counted in `dropped`), as
+    are batches that fail to send. Nothing is sent until the client is
+    registered with the network, so lines queue up while it (re)connects.
+    """
+    batch_size = 20
+    queue_size = 1000
+
+    def __init__(self, client, target):
+        self.client = client
+        self.target = target
+        self.template = MessageTemplate(target)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.dropped = 0
+        self.task = None
+
+    def put(self, text):
+        """Queue `text` to be sent to the target."""
+        lines = self.template.render(text, mask_length=self.client.mask_length)
+        for line in lines:
+            try:
+                self.queue.put_nowait(line)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        if self.task is None:
+            self.task = asyncio.get_event_loop().create_task(self._run())
+            self.task.add_done_callback(self._finished)
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def _finished(self, task):
+        # Let the next `put` start a fresh task.
+        if self.task is task:
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            await self.client.wait_registered()
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self.client.connection.send_batch_async(batch)
+            except ConnectionError:
+                # Carry on, so the queue is still sent once reconnected.
+                self.dropped += len(batch)
+            except Exception as exception:
+                self.dropped += len(batch)
+                loop.call_exception_handler({
+                    'message': 'Exception relaying messages',
+                    'exception': exception,
+                    'destination': self,
+                })
+
+
+class Relay:
+    """
+    Copies messages from channels on one network to channels on others.
+
+    Add `relay.handler` to the handlers of the source client, then route its
+    channels to their destinations:
+
+        relay = Relay()
+        relay.route('#source', other_client, '#destination')
+
+    PRIVMSGs, NOTICEs and ACTIONs are reformatted with `template`,
+    `notice_template` and `action_template` before being sent on.
+    """
+    action_template = '* {nick} {body}'
+    notice_template = '-{nick}- {body}'
+    template = '<{nick}> {body}'
+
+    def __init__(self):
+        self.routes = defaultdict(list)  # source channel -> [Destination]
+        self.handler = filters.allow([commands.PRIVMSG, commands.NOTICE])(
+            parsers.apply_message_parser(parsers.privmsg)(self._relay),
+        )
+
+    def route(self, source_channel, client, target):
+        """Relay messages in `source_channel` to `target` via `client`."""
+        destination = Destination(client, target)
+        self.routes[source_channel.lower()].append(destination)
+        return destination
+
+    def stop(self):
+        """Stop sending queued messages."""
+        for destinations in self.routes.values():
+            for destination in destinations:
+                destination.stop()
+
+    def _relay(self, message, channel, raw_body, sender_nick, third_person, **kwargs):
+        destinations = self.routes.get(channel.lower())
+        if not destinations:
+            return
+
+        if third_person:
+            template = self.action_template
+        elif message.command == commands.NOTICE:
+            template = self.notice_template
+        else:
+            template = self.template
+        text = template.format(nick=sender_nick, body=to_unicode(raw_body))
+
+        for destination in destinations:
+            destination.put(text)
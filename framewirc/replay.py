@@ -0,0 +1,130 @@
+"""
+Drive a Client's handlers with captured traffic, without a network.
+
+Usage:
+
+    python -m framewirc.replay CAPTURE CLIENT_CLASS [--speed SPEED]
+
+CAPTURE is a segment written by `capture.SegmentWriter`, or a file of raw IRC
+lines. CLIENT_CLASS is a dotted path, such as `mybot.client.MyClient`.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import time
+
+from . import capture
+from .connection import Connection
+from .instrumentation import Instrumentation
+
+
+def read_capture(path):
+    """
+    Yield `(time received, raw bytes)` for each message in a capture file.
+
+    Segments are recognised by their suffix. Anything else is read as raw IRC
+    lines, which have no time received (`None`). Blank lines are skipped.
+    """
+    if path.endswith((capture.SEGMENT_SUFFIX, capture.SEGMENT_SUFFIX + '.gz')):
+        yield from capture.read_records(path)
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield None, line
+
+
+class RecordingConnection(Connection):
+    """A Connection that keeps everything sent to it, instead of sending it."""
+    host = 'replay.invalid'
+    _connected = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = []
+
+    def _write(self, data):
+        self.sent.append(data)
+
+
+class Replayer:
+    """
+    Passes captured messages through a Client, as if they came from a network.
+
+    Messages are parsed and dispatched by a `RecordingConnection`, which keeps
+    whatever the handlers send in `sent`.
+
+    By default, messages are replayed as fast as possible. With a `speed`, the
+    time between captured messages is kept, divided by `speed` (so `1` is real
+    time, and `10` is ten times faster).
+
+    `run` returns the throughput, and the instrumentation of each handler.
+    """
+    # How often to let other tasks (eg: those started by handlers) run.
+    yield_every = 1000
+
+    def __init__(self, client, path, speed=None):
+        self.client = client
+        self.path = path
+        self.speed = speed
+        if client.instrumentation is None:
+            client.instrumentation = Instrumentation()
+        self.connection = RecordingConnection(
+            client=client,
+            instrumentation=client.instrumentation,
+        )
+        client.connection = self.connection
+
+    async def run(self):
+        first_received = None
+        count = 0
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        for received, raw_message in read_capture(self.path):
+            if self.speed is not None and received is not None:
+                if first_received is None:
+                    first_received = received
+                due = start + (received - first_received) / self.speed
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            self.connection.handle(raw_message)
+            count += 1
+            if count % self.yield_every == 0:
+                await asyncio.sleep(0)
+
+        elapsed = loop.time() - start
+        return {
+            'elapsed': elapsed,
+            'messages': count,
+            'messages_per_second': count / elapsed if elapsed else None,
+            'sent': len(self.connection.sent),
+            'instrumentation': self.client.instrumentation.snapshot(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('capture', help='Segment or raw IRC lines to replay.')
+    parser.add_argument('client_class', help='Dotted path to a Client subclass.')
+    parser.add_argument('--speed', type=float, help='Multiple of real time.')
+    args = parser.parse_args(argv)
+
+    module_name, class_name = args.client_class.rsplit('.', 1)
+    client_class = getattr(importlib.import_module(module_name), class_name)
+    replayer = Replayer(client_class(), args.capture, speed=args.speed)
+
+    loop = asyncio.new_event_loop()
+    try:
+        report = loop.run_until_complete(replayer.run())
+    finally:
+        loop.close()
+    report['time'] = time.time()
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import asyncio
+import itertools
+import time
+from collections import deque, namedtuple
+
+from . import commands, exceptions
+from .strings import to_unicode
+
+
+Ban = namedtuple('Ban', 'mask setter timestamp')
+ChannelListing = namedtuple('ChannelListing', 'channel users topic')
+WhoReply = namedtuple(
+    'WhoReply',
+    'channel ident host server nick flags hops real_name',
+)
+
+
+def _parse_ban(message):
+    # params: me channel mask [setter timestamp]
+    mask, *extra = message.params[2:]
+    setter, timestamp = (extra + [None, None])[:2]
+    if timestamp is not None:
+        timestamp = int(timestamp)
+    return [Ban(mask, setter, timestamp)]
+
+
+def _parse_list(message):
+    # params: me channel users, suffix: topic
+    channel, users = message.params[1:3]
+    return [ChannelListing(channel, int(users), to_unicode(message.suffix))]
+
+
+def _parse_names(message):
+    # params: me symbol channel, suffix: space separated nicks
+    return to_unicode(message.suffix).split()
+
+
+def _parse_who(message):
+    # params: me channel ident host server nick flags, suffix: hops real_name
+    hops, _, real_name = to_unicode(message.suffix).partition(' ')
+    return [WhoReply(*message.params[1:7], hops=int(hops), real_name=real_name)]
+
+
+class Query:
+    """
+    A request answered by a flood of `reply` numerics, closed by `end`.
+
+    `reply_target` and `end_target` are the indexes of the params naming the
+    channel or mask that was asked about. Replies are matched to the request
+    for that target, so floods nobody asked for (eg: the NAMES sent on JOIN)
+    are ignored. When a numeric doesn't name its target (`None`), it belongs
+    to the oldest request.
+
+    An `errors` numeric naming the target fails the request (or, where
+    several requests could be the one it answers, the oldest of them).
+    """
+    def __init__(self, reply, end, parse, reply_target=None, end_target=None,
+                 errors=()):
+        self.reply = reply
+        self.end = end
+        self.parse = parse
+        self.reply_target = reply_target
+        self.end_target = end_target
+        self.errors = frozenset(errors)
+
+
+BANS = Query(
+    commands.RPL_BANLIST,
+    commands.RPL_ENDOFBANLIST,
+    _parse_ban,
+    reply_target=1,
+    end_target=1,
+    errors=(
+        commands.ERR_CHANOPRIVSNEEDED,
+        commands.ERR_NOSUCHCHANNEL,
+        commands.ERR_NOTONCHANNEL,
+    ),
+)
+# LIST replies name the listed channels, not the (possibly empty) request.
+LIST = Query(commands.RPL_LIST, commands.RPL_LISTEND, _parse_list)
+NAMES = Query(
+    commands.RPL_NAMREPLY,
+    commands.RPL_ENDOFNAMES,
+    _parse_names,
+    reply_target=2,
+    end_target=1,
+    errors=(commands.ERR_NOSUCHCHANNEL,),
+)
+# WHO replies name a channel the user is in, not the mask that matched them.
+WHO = Query(
+    commands.RPL_WHOREPLY,
+    commands.RPL_ENDOFWHO,
+    _parse_who,
+    end_target=1,
+    errors=(commands.ERR_NOSUCHCHANNEL,),
+)
+
+_queries_by_numeric = {}
+_errors = set()
+for _query in (BANS, LIST, NAMES, WHO):
+    _errors.update(_query.errors)
+    for _numeric in (_query.reply, _query.end) + tuple(_query.errors):
+        _queries_by_numeric.setdefault(_numeric, []).append(_query)
+
+
+class _Request:
+    __slots__ = ('key', 'error', 'future', 'items', 'order', 'timeout')
+
+    def __init__(self, key, future, order):
+        self.key = key
+        self.error = None
+        self.future = future
+        self.items = []
+        self.order = order
+        self.timeout = None
+
+
+class ReplyCollector:
+    """
+    Gathers numeric reply floods into single results that can be awaited.
+
+    Replies are matched to the outstanding request for the channel or mask
+    they name (see `Query`). Identical requests made while one is in flight
+    share its result, and results are cached for `cache_ttl` seconds.
+    Requests that see no end numeric within `timeout` seconds raise
+    `asyncio.TimeoutError`, and those answered by an error numeric raise
+    `exceptions.ReplyError`. If a reply can't be parsed, only the request it
+    belongs to fails (with the parsing error). Requests still in flight when
+    the connection closes raise `ConnectionError` (see `disconnected`).
+    """
+    cache_ttl = 10
+    timeout = 30
+
+    def __init__(self, client):
+        self.client = client
+        self._cache = {}  # key -> (expiry, result)
+        self._in_flight = {}  # key -> _Request
+        self._queues = {}  # Query -> deque of _Request
+        self._order = itertools.count()
+
+    def disconnected(self):
+        """Fail the requests in flight, as their replies won't come now."""
+        for request in list(self._in_flight.values()):
+            error = ConnectionError('Disconnected before the reply arrived.')
+            self._finish(request, exception=error)
+
+    def feed(self, message):
+        """Add a message to the outstanding request it answers (if any)."""
+        if message.command in _errors:
+            self._fail(message)
+            return
+        for query in _queries_by_numeric.get(message.command, ()):
+            queue = self._queues.get(query)
+            if queue:
+                self._feed(query, queue, message)
+
+    async def fetch(self, query, key, message):
+        """
+        Send `message`, and return the list of replies that answer it.
+
+        `key` identifies requests that are identical to one another.
+        """
+        key = (query, key.lower())
+        loop = asyncio.get_event_loop()
+        self._forget_expired(time.monotonic())
+
+        if key in self._cache:
+            return list(self._cache[key][1])
+
+        request = self._in_flight.get(key)
+        if request is None:
+            request = _Request(key, loop.create_future(), next(self._order))
+            request.timeout = loop.call_later(self.timeout, self._expire, request)
+            self._in_flight[key] = request
+            self._queues.setdefault(query, deque()).append(request)
+            try:
+                self.client.connection.send(message)
+            except BaseException:
+                self._remove(request)
+                raise
+
+        # Shielded, so one cancelled caller doesn't cancel the others.
+        return list(await asyncio.shield(request.future))
+
+    def _expire(self, request):
+        self._finish(request, exception=request.error or asyncio.TimeoutError())
+
+    def _fail(self, message):
+        # Several kinds of request may be waiting on the same target; as the
+        # network answers in order, the error is for the oldest of them.
+        target = self._target(message, 1)
+        waiting = [
+            request
+            for query in _queries_by_numeric[message.command]
+            for request in self._queues.get(query, ())
+            if request.key[1] == target
+        ]
+        if waiting:
+            request = min(waiting, key=lambda request: request.order)
+            self._finish(request, exception=exceptions.ReplyError(message))
+
+    def _feed(self, query, queue, message):
+        if message.command == query.reply:
+            index = query.reply_target
+        else:
+            index = query.end_target
+        if index is None:
+            request = queue[0]
+        else:
+            target = self._target(message, index)
+            request = next((r for r in queue if r.key[1] == target), None)
+            if request is None:
+                return
+
+        if message.command != query.reply:
+            self._finish(request, exception=request.error)
+        elif request.error is None:
+            try:
+                request.items.extend(query.parse(message))
+            except (IndexError, TypeError, ValueError) as error:
+                # Kept until the end numeric, so the rest of its replies
+                # aren't mistaken for another request's.
+                request.error = error
+
+    def _finish(self, request, exception=None):
+        self._remove(request)
+        if exception is not None:
+            request.future.set_exception(exception)
+            return
+        result = tuple(request.items)
+        self._cache[request.key] = (time.monotonic() + self.cache_ttl, result)
+        request.future.set_result(result)
+
+    def _remove(self, request):
+        self._queues[request.key[0]].remove(request)
+        request.timeout.cancel()
+        del self._in_flight[request.key]
+
+    def _forget_expired(self, now):
+        expired = [key for key, (expiry, _) in self._cache.items() if expiry <= now]
+        for key in expired:
+            del self._cache[key]
+
+    @staticmethod
+    def _target(message, index):
+        if len(message.params) <= index:
+            return None
+        return message.params[index].lower()
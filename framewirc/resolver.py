@@ -0,0 +1,117 @@
+import asyncio
+import socket
+import time
+
+
+class Resolver:
+    """
+    Looks up the addresses of hosts, and remembers them for `ttl` seconds.
+
+    Addresses are returned as `(family, sockaddr)` pairs, alternating between
+    address families (IPv6 and IPv4), as RFC 8305 suggests, so that a dead
+    family doesn't hold up a connection for long.
+
+    `lookup` does the actual resolving; override it to stub out DNS.
+    """
+    ttl = 300
+
+    def __init__(self, ttl=None):
+        if ttl is not None:
+            self.ttl = ttl
+        self._cache = {}
+
+    def forget(self, host, port):
+        """Drop the cached addresses of `host`, so it is looked up again."""
+        self._cache.pop((host, port), None)
+
+    async def lookup(self, host, port):
+        loop = asyncio.get_event_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return [(family, sockaddr) for family, _, _, _, sockaddr in infos]
+
+    async def resolve(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        try:
+            expires, addresses = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            if expires > now:
+                return addresses
+
+        addresses = interleave(await self.lookup(host, port))
+        self._cache[key] = (now + self.ttl, addresses)
+        return addresses
+
+
+def interleave(addresses):
+    """Reorder addresses to alternate between families, first family first."""
+    by_family = {}
+    for family, sockaddr in addresses:
+        by_family.setdefault(family, []).append((family, sockaddr))
+    queues = list(by_family.values())
+    interleaved = []
+    while queues:
+        for queue in list(queues):
+            interleaved.append(queue.pop(0))
+            if not queue:
+                queues.remove(queue)
+    return interleaved
+
+
+async def _connect_one(family, sockaddr):
+    loop = asyncio.get_event_loop()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        await loop.sock_connect(sock, sockaddr)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+async def race(addresses, delay=0.25):
+    """
+    Connect to the first of `addresses` to answer, and return its socket.
+
+    Attempts are started `delay` seconds apart (or as soon as the previous
+    one fails), and run at the same time, so one unresponsive address doesn't
+    hold up the rest ("Happy Eyeballs", RFC 8305).
+    """
+    addresses = list(addresses)
+    pending = set()
+    errors = []
+    winner = None
+    try:
+        while winner is None and (addresses or pending):
+            if addresses:
+                pending.add(asyncio.ensure_future(_connect_one(*addresses.pop(0))))
+            timeout = delay if addresses else None
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for attempt in done:
+                if attempt.exception() is not None:
+                    errors.append(attempt.exception())
+                elif winner is None:
+                    winner = attempt.result()
+                else:
+                    attempt.result().close()
+    finally:
+        for attempt in pending:
+            attempt.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        for attempt in pending:
+            if not attempt.cancelled() and attempt.exception() is None:
+                attempt.result().close()
+
+    if winner is None:
+        raise OSError('Could not connect to any address: {}'.format(
+            ', '.join(str(error) for error in errors) or 'none found',
+        ))
+    return winner
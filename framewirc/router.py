@@ -0,0 +1,140 @@
+from . import commands, filters, parsers, utils
+from .strings import to_unicode
+
+
+class Command:
+    """A registered bot command, with its argument splitting worked out."""
+    def __init__(self, name, handler, nargs=None, usage='', help=''):
+        self.name = name
+        self.handler = handler
+        self.nargs = nargs
+        # With a fixed number of arguments, the last one takes the remainder.
+        self.maxsplit = -1 if nargs is None else max(nargs - 1, 0)
+        self.usage = usage
+        self.help = help
+
+    def split(self, text):
+        """Split the text after the command word into arguments."""
+        if self.nargs == 0:
+            return ()
+        return tuple(text.split(None, self.maxsplit))
+
+
+class _Node:
+    __slots__ = ('children', 'command', 'count')
+
+    def __init__(self):
+        self.children = {}
+        self.command = None
+        # The number of commands at or below this node.
+        self.count = 0
+
+
+class CommandRouter(utils.RequiredAttributesMixin):
+    """
+    Dispatches `!command arg ...` PRIVMSGs to the matching handler.
+
+    Register handlers with the `command` decorator:
+
+        router = CommandRouter()
+
+        @router.command('say', nargs=2, usage='<target> <message>')
+        def say(client, args, **kwargs):
+            target, text = args
+            client.privmsg(target, text)
+
+    Then add `router.handler` to a client's handlers. Each PRIVMSG is parsed
+    once, and the command word is looked up in a trie, so only the handler
+    of the matching command is called. Handlers get the same kwargs as those
+    decorated with `parsers.apply_message_parser(parsers.privmsg)`, plus
+    `args`: a tuple of the words after the command. When `nargs` is given,
+    the last argument takes the rest of the line, and a reply with the usage
+    is sent when there are too few.
+
+    When `abbreviations` is set, any unambiguous start of a command name
+    (eg: `!he` for `!help`) also works.
+
+    A `help` command, listing all the commands, is registered automatically.
+    """
+    required_attributes = ()
+    abbreviations = False
+    prefix = '!'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.commands = {}
+        self._root = _Node()
+        self._help_lines = ()
+        self.handler = filters.allow(commands.PRIVMSG)(
+            parsers.apply_message_parser(parsers.privmsg)(self._dispatch)
+        )
+        self.add('help', self._help, nargs=0, help='List the commands.')
+
+    def add(self, name, handler, nargs=None, usage='', help=''):
+        """Register `handler` for the command `name`."""
+        command = Command(name, handler, nargs=nargs, usage=usage, help=help)
+        replaced = name in self.commands
+        self.commands[name] = command
+
+        node = self._root
+        if not replaced:
+            node.count += 1
+        for char in name:
+            node = node.children.setdefault(char, _Node())
+            if not replaced:
+                node.count += 1
+        node.command = command
+
+        self._help_lines = tuple(
+            self.describe(self.commands[key]) for key in sorted(self.commands)
+        )
+
+    def command(self, name, nargs=None, usage='', help=''):
+        """Decorator to register a handler for the command `name`."""
+        def inner_decorator(handler):
+            self.add(name, handler, nargs=nargs, usage=usage, help=help)
+            return handler
+        return inner_decorator
+
+    def describe(self, command):
+        """A line of help for `command`."""
+        line = self.prefix + command.name
+        if command.usage:
+            line += ' ' + command.usage
+        if command.help:
+            line += ' - ' + command.help
+        return line
+
+    def lookup(self, word):
+        """Find the command for `word`, or `None` if there isn't one."""
+        node = self._root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        if node.command is not None:
+            return node.command
+        if not self.abbreviations or node.count != 1:
+            return None
+        while node.command is None:
+            node, = node.children.values()
+        return node.command
+
+    def _dispatch(self, client, raw_body, **kwargs):
+        if not raw_body.startswith(self.prefix.encode()):
+            return
+        body = to_unicode(raw_body)[len(self.prefix):]
+        word, _, rest = body.partition(' ')
+        command = self.lookup(word) if word else None
+        if command is None:
+            return
+
+        args = command.split(rest)
+        if command.nargs is not None and len(args) < command.nargs:
+            client.privmsg(kwargs['channel'], 'Usage: ' + self.describe(command))
+            return
+        command.handler(client=client, raw_body=raw_body, args=args, **kwargs)
+
+    def _help(self, client, channel, **kwargs):
+        for line in self._help_lines:
+            client.privmsg(channel, line)
@@ -0,0 +1,212 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+
+
+class Cron:
+    """
+    A cron-like schedule: `minute hour day-of-month month day-of-week`.
+
+    Each field is `*`, or a comma separated list of numbers and ranges (eg:
+    `1-5`), and any of those may have a step (eg: `*/15`). A number with a
+    step runs to the end of the range (eg: `5/15` is `5-59/15`). Days of the
+    week run from 0 (Sunday) to 6, and 7 is Sunday too. As with cron, when
+    both days are restricted, a time matching either will do.
+    """
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, spec):
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError('Cron specs need five fields: {!r}'.format(spec))
+        self.spec = spec
+        parsed = [
+            self._parse(field, low, high)
+            for field, (low, high) in zip(fields, self.RANGES)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(weekday % 7 for weekday in weekdays)
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _parse(self, field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = map(int, part.split('-'))
+            elif step:
+                start, end = int(part), high
+            else:
+                start = end = int(part)
+            if not low <= start <= end <= high:
+                raise ValueError('Out of range in cron spec: {!r}'.format(field))
+            values.update(range(start, end + 1, int(step or 1)))
+        return frozenset(values)
+
+    def _day_matches(self, when):
+        day = when.day in self.days
+        weekday = (when.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, when):
+        """The first matching minute after the `datetime` `when`."""
+        when = when.replace(second=0, microsecond=0)
+        when += datetime.timedelta(minutes=1)
+        # Five years is long enough to find any day that can be matched.
+        end = when + datetime.timedelta(days=366 * 5)
+        while when < end:
+            if when.month not in self.months:
+                month = when.month % 12 + 1
+                year = when.year + (month == 1)
+                when = when.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(when):
+                when = when.replace(hour=0, minute=0)
+                when += datetime.timedelta(days=1)
+            elif when.hour not in self.hours:
+                when = when.replace(minute=0) + datetime.timedelta(hours=1)
+            elif when.minute not in self.minutes:
+                when += datetime.timedelta(minutes=1)
+            else:
+                return when
+        raise ValueError('Cron spec never matches: {!r}'.format(self.spec))
+
+
+class Job:
+    """A scheduled call of `callback(client, *args)`. See `Scheduler`."""
+    def __init__(self, callback, args, interval=None, cron=None):
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.cron = cron
+        self.cancelled = False
+        self.due = None
+        self.scheduled = None  # For cron jobs, the `datetime` of this run.
+
+    def cancel(self):
+        self.cancelled = True
+
+    def next_due(self, now):
+        """When to run again after running at `now`, or `None` for never."""
+        if self.interval is not None:
+            due = self.due + self.interval
+            # Runs missed while paused are skipped, rather than caught up.
+            return due if due > now else now + self.interval
+        if self.cron is not None:
+            wall_now = datetime.datetime.now()
+            # Counting from this run, so a timer that fires a little early
+            # doesn't run it again. Missed runs are skipped, as above.
+            self.scheduled = self.cron.next_after(max(self.scheduled, wall_now))
+            return now + (self.scheduled - wall_now).total_seconds()
+        return None
+
+
+class Scheduler:
+    """
+    Runs jobs for a Client: once, at intervals, or on a cron-like schedule.
+
+    Every Client has one, as `client.scheduler`:
+
+        def announce(client):
+            client.privmsg('#channel', 'Remember to hydrate!')
+
+        client.scheduler.every(3600, announce)
+
+    Jobs are called with the client, and should send through its methods
+    (eg: `client.privmsg`), like handlers do.
+
+    All jobs are kept in a heap, and only the earliest has a timer in the
+    event loop. The scheduler is paused until the client has registered with
+    the network, and while it is disconnected. Jobs that fall due while
+    paused run once it resumes; missed runs of repeating jobs are skipped.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.paused = True
+        self._counter = itertools.count()
+        self._handle = None
+        self._heap = []
+
+    def __len__(self):
+        return sum(not job.cancelled for _, _, job in self._heap)
+
+    def call_later(self, delay, callback, *args):
+        """Run `callback(client, *args)` once, in `delay` seconds."""
+        return self._add(Job(callback, args), delay)
+
+    def cron(self, spec, callback, *args):
+        """Run `callback(client, *args)` on a cron-like schedule (see `Cron`)."""
+        job = Job(callback, args, cron=Cron(spec))
+        wall_now = datetime.datetime.now()
+        job.scheduled = job.cron.next_after(wall_now)
+        return self._add(job, (job.scheduled - wall_now).total_seconds())
+
+    def every(self, interval, callback, *args, delay=None):
+        """
+        Run `callback(client, *args)` every `interval` seconds.
+
+        The first run is after `delay` seconds (by default, `interval`).
+        """
+        job = Job(callback, args, interval=interval)
+        return self._add(job, interval if delay is None else delay)
+
+    def pause(self):
+        """Stop running jobs until `resume` is called."""
+        self.paused = True
+        self._cancel_timer()
+
+    def resume(self):
+        """Start running jobs again, starting with any that are overdue."""
+        self.paused = False
+        self._set_timer()
+
+    def _add(self, job, delay):
+        job.due = self._loop().time() + delay
+        heapq.heappush(self._heap, (job.due, next(self._counter), job))
+        if not self.paused and self._heap[0][2] is job:
+            self._set_timer()
+        return job
+
+    def _cancel_timer(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _loop(self):
+        return asyncio.get_event_loop()
+
+    def _run(self):
+        self._handle = None
+        loop = self._loop()
+        now = loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now and not self.paused:
+            _, _, job = heapq.heappop(heap)
+            if job.cancelled:
+                continue
+            try:
+                job.callback(self.client, *job.args)
+            except Exception as exception:
+                loop.call_exception_handler({
+                    'message': 'Exception in scheduled job',
+                    'exception': exception,
+                    'job': job,
+                })
+            job.due = job.next_due(now)
+            if job.due is not None and not job.cancelled:
+                heapq.heappush(heap, (job.due, next(self._counter), job))
+        if not self.paused:
+            self._set_timer()
+
+    def _set_timer(self):
+        self._cancel_timer()
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        if heap:
+            self._handle = self._loop().call_at(heap[0][0], self._run)
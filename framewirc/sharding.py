@@ -0,0 +1,273 @@
+"""
+Spread many clients over a pool of worker processes, each with its own loop.
+
+    specs = [
+        ClientSpec('freenode', MyClient, 'irc.freenode.net'),
+        ClientSpec('oftc', MyClient, 'irc.oftc.net', {'nick': 'other'}),
+    ]
+    Supervisor(specs).run()
+
+Each client gets its worker's `Shard` as `client.shard`, which can send
+messages through clients in other processes, and publish events to them.
+
+Client classes must be importable (not defined in `__main__` or a function),
+so that they can be passed to the workers.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from multiprocessing.connection import wait
+
+
+ClientSpec = namedtuple(
+    'ClientSpec',
+    'name client_class host client_kwargs connect_kwargs',
+)
+ClientSpec.__new__.__defaults__ = (None, None)
+
+# Commands sent between the supervisor and the shards.
+CONNECT = 'connect'
+PUBLISH = 'publish'
+SEND = 'send'
+
+
+class Outbox:
+    """
+    Sends objects down a `multiprocessing.Connection` from a background thread.
+
+    `Connection.send` blocks while the pipe is full. If the processes at both
+    ends did that at once, neither would read again, so each end queues what
+    it sends, and carries on reading.
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self.closed = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._send_queued, daemon=True)
+        self._thread.start()
+
+    def send(self, obj):
+        """Queue `obj` to be sent."""
+        if not self.closed:
+            self._queue.put(obj)
+
+    def close(self):
+        """Stop sending, once what is already queued has gone."""
+        self.closed = True
+        self._queue.put(None)
+
+    def _send_queued(self):
+        while True:
+            obj = self._queue.get()
+            if obj is None:
+                return
+            try:
+                self.channel.send(obj)
+            except OSError:
+                # The other end has gone, so nothing more can be sent.
+                self.closed = True
+                return
+
+
+def assign(specs, count):
+    """Deal `specs` out across `count` shards, as evenly as possible."""
+    shards = [[] for _ in range(count)]
+    for n, spec in enumerate(specs):
+        shards[n % count].append(spec)
+    return shards
+
+
+class Shard:
+    """
+    The clients running in one worker process.
+
+    Commands from the supervisor arrive on `channel`, a
+    `multiprocessing.Connection`, which is watched by the event loop. Those to
+    the supervisor are sent through `outbox`.
+    """
+    def __init__(self, index, channel):
+        self.index = index
+        self.channel = channel
+        self.outbox = Outbox(channel)
+        self.clients = {}
+        self.subscribers = []
+
+    def connect(self, spec):
+        """Create the client described by `spec`, and connect it."""
+        client = spec.client_class(shard=self, **(spec.client_kwargs or {}))
+        self.clients[spec.name] = client
+        client.connect_to(spec.host, **(spec.connect_kwargs or {}))
+
+    def publish(self, event, data=None):
+        """Pass `event` to the subscribers of every shard (this one too)."""
+        self.outbox.send((PUBLISH, event, data))
+        self._deliver(event, data)
+
+    def send(self, name, message):
+        """Send `message` (bytes) through the client called `name`."""
+        if name in self.clients:
+            self.clients[name].connection.send(message)
+        else:
+            self.outbox.send((SEND, name, bytes(message)))
+
+    def start(self):
+        loop = asyncio.get_event_loop()
+        loop.add_reader(self.channel.fileno(), self.receive)
+
+    def stop(self):
+        """Stop watching the channel, and stop the event loop."""
+        loop = asyncio.get_event_loop()
+        loop.remove_reader(self.channel.fileno())
+        self.outbox.close()
+        loop.stop()
+
+    def subscribe(self, callback):
+        """Call `callback(event, data)` for every event published."""
+        self.subscribers.append(callback)
+
+    def receive(self):
+        """Act on the commands waiting on the channel."""
+        while self.channel.poll():
+            try:
+                command, *args = self.channel.recv()
+            except EOFError:
+                # The supervisor has gone, so there's no one to work for.
+                self.stop()
+                return
+            if command == CONNECT:
+                self.connect(*args)
+            elif command == PUBLISH:
+                self._deliver(*args)
+            elif command == SEND:
+                self.send(*args)
+
+    def _deliver(self, event, data):
+        for callback in self.subscribers:
+            callback(event, data)
+
+
+def run_shard(index, channel, specs):
+    """The entry point of each worker process."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    shard = Shard(index, channel)
+    for spec in specs:
+        shard.connect(spec)
+    shard.start()
+    loop.run_forever()
+
+
+class Supervisor:
+    """
+    Runs `processes` worker processes (by default, one per CPU), and spreads
+    the clients described by `specs` between them.
+
+    Sends and events between shards are routed through the supervisor. When
+    a worker dies it is restarted, unless it has died `max_restarts` times
+    within `restart_window` seconds. Then it is given up on, and its clients
+    are rebalanced onto the remaining workers.
+    """
+    max_restarts = 5
+    restart_window = 60
+
+    def __init__(self, specs, processes=None):
+        count = min(processes or os.cpu_count() or 1, len(specs)) or 1
+        self.assignments = assign(specs, count)
+        self.channels = [None] * count
+        self.outboxes = [None] * count  # `Outbox`es of the channels.
+        self.processes = [None] * count
+        self.restarts = [deque() for _ in range(count)]
+        self.stopped = False
+
+    def live(self):
+        """The indexes of the shards that have not been given up on."""
+        return [n for n, channel in enumerate(self.channels) if channel is not None]
+
+    def run(self):
+        """Start the workers, and supervise them until `stop` is called."""
+        for index in range(len(self.assignments)):
+            self.start_shard(index)
+        while not self.stopped and self.live():
+            self.poll()
+
+    def poll(self, timeout=1):
+        """Route waiting commands, and deal with any dead workers."""
+        channels = {self.channels[n]: n for n in self.live()}
+        sentinels = {self.processes[n].sentinel: n for n in self.live()}
+        for ready in wait(list(channels) + list(sentinels), timeout):
+            if ready in channels:
+                index = channels[ready]
+                try:
+                    self.route(index, ready.recv())
+                except EOFError:
+                    pass  # Dead; dealt with through its sentinel.
+            elif self.processes[sentinels[ready]].exitcode is not None:
+                self.shard_died(sentinels[ready])
+
+    def route(self, index, command):
+        """Pass on a command that came from the shard at `index`."""
+        kind, *args = command
+        if kind == PUBLISH:
+            for other in self.live():
+                if other != index:
+                    self.outboxes[other].send(command)
+        elif kind == SEND:
+            name = args[0]
+            for other in self.live():
+                if any(spec.name == name for spec in self.assignments[other]):
+                    self.outboxes[other].send(command)
+                    return
+
+    def shard_died(self, index):
+        now = time.monotonic()
+        restarts = self.restarts[index]
+        while restarts and restarts[0] < now - self.restart_window:
+            restarts.popleft()
+        if len(restarts) < self.max_restarts:
+            restarts.append(now)
+            self.start_shard(index)
+        else:
+            self.rebalance(index)
+
+    def rebalance(self, index):
+        """Give up on the shard at `index`, and move its clients elsewhere."""
+        specs = self.assignments[index]
+        self.assignments[index] = []
+        self.outboxes[index].close()
+        self.outboxes[index] = None
+        self.channels[index].close()
+        self.channels[index] = None
+        live = self.live()
+        if not live:
+            return
+        for spec in specs:
+            other = min(live, key=lambda n: len(self.assignments[n]))
+            self.assignments[other].append(spec)
+            self.outboxes[other].send((CONNECT, spec))
+
+    def start_shard(self, index):
+        if self.channels[index] is not None:
+            self.outboxes[index].close()
+            self.channels[index].close()
+        ours, theirs = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=run_shard,
+            args=(index, theirs, self.assignments[index]),
+            daemon=True,
+        )
+        process.start()
+        theirs.close()
+        self.channels[index] = ours
+        self.outboxes[index] = Outbox(ours)
+        self.processes[index] = process
+
+    def stop(self):
+        """Stop supervising, and end the workers."""
+        self.stopped = True
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
@@ -0,0 +1,318 @@
+import asyncio
+import itertools
+import math
+from collections import Counter
+
+from . import commands, utils
+from .messages import build_message, ReceivedMessage
+
+
+# The same greeting in several encodings, as seen on real networks.
+MIXED_ENCODING_BODIES = (
+    'Hello there!'.encode('ascii'),
+    'Grüße aus Köln'.encode('utf8'),
+    'Grüße aus Köln'.encode('latin-1'),
+    'Привет всем'.encode('cp1251'),
+    'こんにちは'.encode('shift_jis'),
+    '\1ACTION waves ☺\1'.encode('utf8'),
+)
+
+
+class Histogram:
+    """Counts durations in power-of-two buckets of microseconds."""
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        micros = max(int(seconds * 1e6), 1)
+        self.buckets[1 << (micros.bit_length() - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Upper bound (in seconds) of the bucket holding the percentile."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return bucket * 2 / 1e6
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'buckets_us': dict(self.buckets),
+        }
+
+
+def names_flood(server_name, nick, channel, count):
+    """The replies to a NAMES query on a channel with `count` users."""
+    nicks = ['user{}'.format(n) for n in range(count)]
+    # Keep well clear of the 512 byte limit.
+    for start in range(0, count, 40):
+        chunk = ' '.join(nicks[start:start + 40])
+        yield build_message(
+            commands.RPL_NAMREPLY, nick, '=', channel,
+            prefix=server_name,
+            suffix=chunk,
+        )
+    yield build_message(
+        commands.RPL_ENDOFNAMES, nick, channel,
+        prefix=server_name,
+        suffix='End of /NAMES list.',
+    )
+
+
+def netsplit(servers, count):
+    """QUIT messages from `count` users lost behind a netsplit."""
+    reason = ' '.join(servers)
+    for n in range(count):
+        mask = 'split{0}!~split{0}@split{0}.example.com'.format(n)
+        yield build_message(commands.QUIT, prefix=mask, suffix=reason)
+
+
+class _Session:
+    """The server's view of a single connected client."""
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.nick = None
+        self.flood_timer = 0.0
+        self.pings = {}  # token -> time sent
+        self.tasks = []
+        self.hung_up = asyncio.get_event_loop().create_future()
+
+
+class SimulatedServer(utils.RequiredAttributesMixin):
+    """
+    A local IRC server that generates realistic traffic for load testing.
+
+    Once a client registers, it is sent PINGs every `ping_interval` seconds,
+    and PRIVMSGs in a mix of encodings at `privmsg_rate` lines per second.
+    Joining a channel triggers a flood of `names_count` NAMES replies. When
+    `netsplit_interval` is set, storms of `netsplit_size` QUITs are sent.
+
+    Like most networks, excess flood from clients is not tolerated: each line
+    received (except PONG) costs `flood_penalty` seconds, and a client more than
+    `flood_limit` seconds in debt is disconnected.
+
+    Round trip times of PINGs are collected in `ping_latency`, and traffic in
+    both directions is counted. See `stats`.
+    """
+    required_attributes = ()
+    host = '127.0.0.1'
+    port = 0
+    server_name = 'irc.simulator.example.com'
+    channel = '#load'
+    ping_interval = 1.0
+    privmsg_rate = 100.0
+    names_count = 1000
+    netsplit_interval = None
+    netsplit_size = 500
+    flood_penalty = 2.0
+    flood_limit = 10.0
+    tick = 0.01
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ping_latency = Histogram()
+        self.counters = Counter()
+        self.sessions = set()
+        self._ping_tokens = itertools.count()
+        self._loop = None
+        self._server = None
+        self._started = None
+
+    async def start(self):
+        """Start listening. Returns the port that clients should connect to."""
+        self._loop = asyncio.get_event_loop()
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self._started = self._loop.time()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self, timeout=1):
+        """
+        Disconnect every client, and stop listening.
+
+        Clients are sent EOF, and given `timeout` seconds to hang up. Closing
+        with what they sent still unread would reset their connections.
+        """
+        for session in self.sessions:
+            for task in session.tasks:
+                task.cancel()
+            session.writer.write_eof()
+        hanging_up = [session.hung_up for session in self.sessions]
+        if hanging_up:
+            await asyncio.wait(hanging_up, timeout=timeout)
+        for session in list(self.sessions):
+            self._hang_up(session)
+        self._server.close()
+        await self._server.wait_closed()
+
+    def stats(self):
+        """Traffic totals and rates, and the PING round trip histogram."""
+        elapsed = self._loop.time() - self._started
+        stats = dict(self.counters)
+        stats['elapsed'] = elapsed
+        for direction in ('in', 'out'):
+            for unit in ('bytes', 'lines'):
+                key = '{}_{}'.format(unit, direction)
+                stats[key + '_per_second'] = self.counters[key] / elapsed
+        stats['ping_latency'] = self.ping_latency.snapshot()
+        return stats
+
+    def send(self, session, messages):
+        """Send a number of messages to a client in a single write."""
+        data = b''.join(messages)
+        if not data or session.writer.transport.is_closing():
+            return
+        session.writer.write(data)
+        self.counters['bytes_out'] += len(data)
+        self.counters['lines_out'] += data.count(utils.LINEFEED)
+
+    async def send_drained(self, session, messages):
+        """
+        Send messages, then wait until the client has taken them.
+
+        The generators send through this, so a slow client slows them down,
+        rather than filling the write buffer (and the outbound rates count
+        what was delivered, not what was queued).
+        """
+        self.send(session, messages)
+        try:
+            await session.writer.drain()
+        except ConnectionError:
+            pass  # `_serve` hangs up.
+
+    async def _serve(self, reader, writer):
+        session = _Session(reader, writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.counters['bytes_in'] += len(line)
+                self.counters['lines_in'] += 1
+                message = ReceivedMessage(line)
+                if self._flooded(session, message):
+                    self.counters['flood_disconnects'] += 1
+                    msg = build_message(commands.ERROR, suffix='Excess Flood')
+                    self.send(session, [msg])
+                    break
+                self._handle(session, message)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._hang_up(session)
+
+    def _flooded(self, session, message):
+        # Answering our own PINGs shouldn't count against a client.
+        if message.command == commands.PONG:
+            return False
+        now = asyncio.get_event_loop().time()
+        session.flood_timer = max(session.flood_timer, now) + self.flood_penalty
+        return session.flood_timer - now > self.flood_limit
+
+    def _handle(self, session, message):
+        if message.command == commands.NICK:
+            registering = session.nick is None
+            session.nick = message.params[0]
+            if registering:
+                self._welcome(session)
+        elif message.command == commands.PONG:
+            sent = session.pings.pop(message.suffix, None)
+            if sent is not None:
+                now = asyncio.get_event_loop().time()
+                self.ping_latency.add(now - sent)
+        elif message.command == commands.JOIN:
+            for channel in message.params[0].split(','):
+                self._join(session, channel)
+        elif message.command == commands.QUIT:
+            self._hang_up(session)
+
+    def _hang_up(self, session):
+        for task in session.tasks:
+            task.cancel()
+        session.writer.close()
+        self.sessions.discard(session)
+        if not session.hung_up.done():
+            session.hung_up.set_result(None)
+
+    def _join(self, session, channel):
+        mask = '{0}!~{0}@simulated.example.com'.format(session.nick)
+        messages = [build_message(commands.JOIN, channel, prefix=mask)]
+        messages.extend(names_flood(
+            self.server_name,
+            session.nick,
+            channel,
+            self.names_count,
+        ))
+        self.send(session, messages)
+
+    def _welcome(self, session):
+        nick, server = session.nick, self.server_name
+        self.send(session, [
+            build_message(commands.RPL_WELCOME, nick, prefix=server, suffix='Welcome'),
+            build_message(
+                commands.RPL_BOUNCE, nick,
+                'CHANTYPES=#&', 'PREFIX=(ov)@+', 'NETWORK=Simulator', 'NICKLEN=30',
+                prefix=server,
+                suffix='are supported by this server',
+            ),
+            build_message(commands.RPL_ENDOFMOTD, nick, prefix=server, suffix='End'),
+        ])
+        loop = asyncio.get_event_loop()
+        session.tasks.append(loop.create_task(self._ping(session)))
+        session.tasks.append(loop.create_task(self._chatter(session)))
+        if self.netsplit_interval:
+            session.tasks.append(loop.create_task(self._netsplits(session)))
+
+    async def _chatter(self, session):
+        loop = asyncio.get_event_loop()
+        bodies = itertools.cycle(MIXED_ENCODING_BODIES)
+        senders = itertools.cycle(range(50))
+        owed = 0.0
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = loop.time()
+            owed += (now - last) * self.privmsg_rate
+            last = now
+            count, owed = int(owed), owed % 1
+            await self.send_drained(session, [
+                build_message(
+                    commands.PRIVMSG, self.channel,
+                    prefix='user{0}!~user{0}@host{0}.example.com'.format(next(senders)),
+                    suffix=next(bodies),
+                )
+                for _ in range(count)
+            ])
+            # Time spent waiting on a slow client isn't owed as a burst.
+            last = loop.time()
+
+    async def _netsplits(self, session):
+        while True:
+            await asyncio.sleep(self.netsplit_interval)
+            servers = (self.server_name, 'hub.simulator.example.com')
+            await self.send_drained(session, netsplit(servers, self.netsplit_size))
+
+    async def _ping(self, session):
+        loop = asyncio.get_event_loop()
+        while True:
+            token = 'sim-{}'.format(next(self._ping_tokens)).encode()
+            session.pings[token] = loop.time()
+            await self.send_drained(session, [build_message(commands.PING, suffix=token)])
+            await asyncio.sleep(self.ping_interval)
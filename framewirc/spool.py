@@ -0,0 +1,88 @@
+import os
+import struct
+import time
+
+from .utils import LINEFEED
+
+
+# Each record is a header of (time spooled, length), followed by the message.
+HEADER = struct.Struct('<dH')
+
+
+class Spool:
+    """
+    Keeps outgoing messages on disk while a Connection is disconnected.
+
+    Messages are appended to the file at `path` with buffered sequential
+    writes, so a large backlog doesn't need to be held in memory. Once the
+    connection has reconnected and registered, the backlog is sent on in
+    batches of `batch_size`, waiting for the network to catch up after each.
+
+    Messages older than `max_age` seconds are discarded rather than sent.
+    """
+    batch_size = 20
+    max_age = 300
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def append(self, data):
+        """Add the message(s) in `data` to the spool."""
+        now = time.time()
+        for message in data.split(LINEFEED)[:-1]:
+            self._write(now, message + LINEFEED)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read(self):
+        """Yield the messages in the spool that have not expired."""
+        for spooled, message in self._records(self.path):
+            yield message
+
+    async def replay(self, connection):
+        """Send the backlog to `connection`, emptying the spool."""
+        self.close()
+        if not os.path.exists(self.path):
+            return
+
+        # Anything spooled while replaying goes into a fresh file.
+        replaying = self.path + '.replaying'
+        os.replace(self.path, replaying)
+        records = self._records(replaying)
+        try:
+            batch = []
+            for spooled, message in records:
+                batch.append(message)
+                if len(batch) == self.batch_size:
+                    await connection.send_batch_async(batch)
+                    batch = []
+            if batch:
+                await connection.send_batch_async(batch)
+        except ConnectionError:
+            # Keep what's left for next time.
+            for spooled, message in records:
+                self._write(spooled, message)
+        finally:
+            records.close()
+            os.remove(replaying)
+
+    def _records(self, path):
+        oldest = time.time() - self.max_age
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                spooled, length = HEADER.unpack(header)
+                message = f.read(length)
+                if spooled >= oldest:
+                    yield spooled, message
+
+    def _write(self, spooled, message):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(HEADER.pack(spooled, len(message)) + message)
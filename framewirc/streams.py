@@ -0,0 +1,114 @@
+import asyncio
+from collections import deque
+
+
+# What to do with a message when a subscription is full.
+DROP_OLDEST = 'drop oldest'
+DROP_NEWEST = 'drop newest'
+BLOCK = 'block'  # Keep it, and stop reading from the network until there's room.
+
+
+class Subscription:
+    """
+    An async iterator over the messages a Client receives.
+
+    Create one with `Client.messages`:
+
+        async for message in client.messages(filter=filters.channel('#a')):
+            ...
+
+    Messages are queued until they are read. `filter` can be a predicate from
+    `filters` (or any callable taking a message), so only matching messages
+    are kept.
+
+    At most `maxsize` messages are queued. Beyond that, `overflow` decides
+    what happens to new messages: with `DROP_OLDEST` or `DROP_NEWEST`, one
+    is thrown away and counted in `dropped`. With `BLOCK`, the message is
+    kept, but the Connection stops reading until there's room again.
+
+    Call `close` to stop receiving messages; iteration then ends once the
+    queue is empty.
+    """
+    def __init__(self, client, filter=None, maxsize=1000, overflow=DROP_OLDEST):
+        if hasattr(filter, 'compile'):
+            filter = filter.compile()
+        self.client = client
+        self.filter = filter
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.closed = False
+        self.dropped = 0
+        self._messages = deque()
+        self._consumed = None
+        self._getter = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._messages:
+            if self.closed:
+                raise StopAsyncIteration
+            self._getter = asyncio.get_event_loop().create_future()
+            try:
+                await self._getter
+            finally:
+                self._getter = None
+
+        message = self._messages.popleft()
+        self._resolve_consumed()
+        return message
+
+    def __len__(self):
+        return len(self._messages)
+
+    def close(self):
+        """Stop receiving messages."""
+        self.closed = True
+        if self in self.client.subscriptions:
+            self.client.subscriptions.remove(self)
+        self._wake()
+        # It no longer counts towards the client's backlog.
+        self._resolve_consumed()
+
+    def put(self, message):
+        """Queue `message`, if it passes the filter."""
+        if self.filter is not None and not self.filter(message):
+            return
+        if len(self._messages) >= self.maxsize:
+            if self.overflow == DROP_NEWEST:
+                self.dropped += 1
+                return
+            if self.overflow == DROP_OLDEST:
+                self._messages.popleft()
+                self.dropped += 1
+        self._messages.append(message)
+        self._wake()
+
+    @property
+    def saturated(self):
+        """True when full, and new messages would block the reader."""
+        if self.closed:
+            # Nothing will read the rest, so it mustn't hold up the reader.
+            return False
+        return self.overflow == BLOCK and len(self._messages) >= self.maxsize
+
+    def consumed(self):
+        """A future that is done when a message is next read (or on close)."""
+        if self._consumed is None:
+            self._consumed = asyncio.get_event_loop().create_future()
+        return self._consumed
+
+    async def wait_for_space(self):
+        """Wait until this subscription is no longer `saturated`."""
+        while self.saturated:
+            await asyncio.shield(self.consumed())
+
+    def _resolve_consumed(self):
+        if self._consumed is not None:
+            self._consumed.set_result(None)
+            self._consumed = None
+
+    def _wake(self):
+        if self._getter is not None and not self._getter.done():
+            self._getter.set_result(None)
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from . import commands, parsers, utils
+
+
+class Throttle(utils.RequiredAttributesMixin):
+    """
+    Limits how fast each sender may send messages to each channel.
+
+    Add it to `Client.message_filters`, so that floods are stopped before any
+    handler runs:
+
+        class MyClient(Client):
+            message_filters = (Throttle(rate=0.5, burst=3),)
+
+    Each (sender nick, channel) pair has a token bucket holding up to `burst`
+    tokens, which refills at `rate` tokens per second. Every message takes a
+    token. Messages that find the bucket empty are dropped (and counted in
+    `dropped`), unless `defer` is set: then up to `max_deferred` of them are
+    held back, and passed to the client again once the bucket has refilled.
+
+    Only the last `max_keys` buckets are kept. Buckets that have refilled
+    (so have been idle for a while) are thrown away as they're found.
+    """
+    required_attributes = ()
+    burst = 5
+    commands = frozenset([commands.NOTICE, commands.PRIVMSG])
+    defer = False
+    max_deferred = 5
+    max_keys = 10000
+    rate = 1.0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.deferred = 0
+        self.dropped = 0
+        # Maps keys to (tokens, time updated), oldest first.
+        self._buckets = OrderedDict()
+        self._released = set()
+
+    def __call__(self, client, message):
+        """Determine if `message` may be passed to the handlers."""
+        if message.command not in self.commands or not message.prefix:
+            return True
+        if id(message) in self._released:
+            self._released.remove(id(message))
+            return True
+
+        now = time.monotonic()
+        key = self.key(message)
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        elif self.defer and tokens - 1 >= -self.max_deferred:
+            # Take a token from the future, and wait until it's due.
+            tokens -= 1
+            self.deferred += 1
+            loop = asyncio.get_event_loop()
+            loop.call_later(-tokens / self.rate, self._release, client, message)
+        else:
+            self.dropped += 1
+
+        self._buckets[key] = (tokens, now)
+        self._evict(now)
+        return allowed
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def key(self, message):
+        """The (sender nick, channel) that `message` is counted against."""
+        nick = parsers.nick(message.prefix)['nick']
+        channel = message.params[0] if message.params else ''
+        return nick.lower(), channel.lower()
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+        # A bucket that has refilled is the same as no bucket at all.
+        while buckets:
+            key, (tokens, updated) = next(iter(buckets.items()))
+            if updated + (self.burst - tokens) / self.rate > now:
+                break
+            del buckets[key]
+
+    def _release(self, client, message):
+        # Only while it's dispatched: another filter may drop it before it
+        # gets here, and once it's gone, its id may be reused.
+        self._released.add(id(message))
+        try:
+            client.on_message(message)
+        finally:
+            self._released.discard(id(message))
@@ -0,0 +1,67 @@
+import ssl
+
+
+class ResumingContext(ssl.SSLContext):
+    """
+    An `SSLContext` that resumes TLS sessions with servers it has seen before.
+
+    asyncio doesn't pass a session when it wraps a connection, so this keeps
+    the last session for each server name, and offers it in `wrap_bio`. A
+    resumed session skips most of the work of a full handshake.
+
+    Call `save_session` with the `ssl_object` of a connection, once it is
+    established, to keep its session for next time.
+    """
+    def __new__(cls, protocol=ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        return super().__new__(cls, protocol, *args, **kwargs)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sessions = {}
+
+    def save_session(self, ssl_object):
+        session = ssl_object.session
+        if session is not None:
+            self.sessions[ssl_object.server_hostname] = session
+
+    def wrap_bio(self, incoming, outgoing, server_side=False,
+                 server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming,
+            outgoing,
+            server_side=server_side,
+            server_hostname=server_hostname,
+            session=session,
+        )
+
+
+def create_context():
+    """A `ResumingContext` with the same settings as the `ssl` defaults."""
+    context = ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_default_certs()
+    return context
+
+
+_contexts = {}
+
+
+def context_for(network):
+    """
+    The shared context for connections to `network` (usually the host).
+
+    Building a context (and loading its certificates) is costly, so every
+    connection to a network uses the same one. Use `set_context` to configure
+    it (eg: for client certificates).
+    """
+    try:
+        return _contexts[network]
+    except KeyError:
+        context = _contexts[network] = create_context()
+        return context
+
+
+def set_context(network, context):
+    """Use `context` for connections to `network`."""
+    _contexts[network] = context
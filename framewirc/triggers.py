@@ -0,0 +1,185 @@
+import re
+
+from . import commands, filters, parsers
+from .strings import to_unicode
+
+
+def _trie_pattern(keywords):
+    """
+    A regex matching the longest of `keywords` at a position.
+
+    Keywords are arranged as a trie (`cat(?:egory)?|dog`), so at each
+    position the regex engine only follows the branches that match, rather
+    than trying every keyword in turn.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True  # The end of a keyword.
+
+    def pattern(node):
+        branches = []
+        for char, child in sorted(node.items()):
+            if not char:
+                continue
+            # Follow chains with a single branch, to keep the nesting shallow.
+            text = char
+            while len(child) == 1 and '' not in child:
+                (char, child), = child.items()
+                text += char
+            branches.append(re.escape(text) + pattern(child))
+        if not branches:
+            return ''
+        alternation = '|'.join(branches)
+        if '' in node:
+            return '(?:{})?'.format(alternation)
+        if len(branches) == 1:
+            return alternation
+        return '(?:{})'.format(alternation)
+
+    return pattern(trie)
+
+
+class TriggerMatcher:
+    """
+    Finds which of many triggers appear in a message body, in a single pass.
+
+    Triggers are keywords (found anywhere in the body, like `trigger in body`)
+    or regexes (found with `search`). Each has a value, such as a reply:
+
+        matcher = TriggerMatcher()
+        matcher.add('shame', 'https://example.com/shame-bell.gif')
+        matcher.add(r'\\byolo\\b', 'https://example.com/yolo.gif', regex=True)
+
+    Keywords are compiled into one regex shaped like a trie, and regexes into
+    one alternation. Both are wrapped in a lookahead, so the body is scanned
+    once (in C), however many triggers there are, and a match at one position
+    doesn't hide overlapping matches at the next. At each position the
+    longest keyword is found, along with the keywords that are prefixes of
+    it, so overlapping keywords are all found. Where regexes match at the
+    same position, only the first added is found. Regexes must not use named
+    groups.
+
+    With `ignore_case`, keywords are compared casefolded (see `str.casefold`),
+    and regexes are compiled with `re.IGNORECASE`.
+
+    Triggers added after matching has begun are compiled into a separate,
+    smaller regex, rather than rebuilding everything. When there are more
+    than `max_segments` of these, they are compacted back into one.
+
+    Add `matcher.handler` to a client's handlers to reply to PRIVMSGs with
+    the value of each trigger found.
+    """
+    max_segments = 8
+
+    def __init__(self, triggers=(), ignore_case=False):
+        self.ignore_case = ignore_case
+        self.handler = filters.allow(commands.PRIVMSG)(
+            parsers.apply_message_parser(parsers.privmsg)(self._reply)
+        )
+        self._keywords = {}
+        self._prefixes = {}  # keyword -> the keywords it starts with
+        self._regexes = {}
+        self._pending_keywords = []
+        self._pending_regexes = []
+        self._segments = []
+        for trigger, value in dict(triggers).items():
+            self.add(trigger, value)
+
+    def __len__(self):
+        return len(self._keywords) + len(self._regexes)
+
+    def add(self, trigger, value, regex=False):
+        """Add a keyword (or regex, when `regex` is set) with a value."""
+        if regex:
+            name = 't{}'.format(len(self._regexes))
+            pattern = '(?P<{}>{})'.format(name, trigger)
+            self._regexes[name] = (pattern, value)
+            self._pending_regexes.append(pattern)
+        else:
+            keyword = self._fold(trigger)
+            self._keywords[keyword] = value
+            self._pending_keywords.append(keyword)
+            self._prefixes.clear()
+
+    def match(self, body):
+        """Return the value of each trigger found in `body`, in order."""
+        if self._pending_keywords or self._pending_regexes:
+            self._compile_pending()
+
+        found = sorted(self._find(body), key=lambda found_match: found_match[:2])
+
+        seen = set()
+        values = []
+        for _, _, keyword, name in found:
+            key = (keyword, name)
+            if key in seen:
+                continue
+            seen.add(key)
+            if name is None:
+                values.append(self._keywords[keyword])
+            else:
+                values.append(self._regexes[name][1])
+        return values
+
+    def _compile(self, keywords, regexes):
+        keywords_finditer = regexes_finditer = None
+        if keywords:
+            pattern = '(?=({}))'.format(_trie_pattern(keywords))
+            keywords_finditer = re.compile(pattern).finditer
+        if regexes:
+            flags = re.IGNORECASE if self.ignore_case else 0
+            pattern = '(?={})'.format('|'.join(regexes))
+            regexes_finditer = re.compile(pattern, flags).finditer
+        return keywords_finditer, regexes_finditer
+
+    def _compile_pending(self):
+        if len(self._segments) < self.max_segments:
+            segment = self._compile(self._pending_keywords, self._pending_regexes)
+            self._segments.append(segment)
+        else:
+            regexes = [pattern for pattern, _ in self._regexes.values()]
+            self._segments = [self._compile(self._keywords, regexes)]
+        self._pending_keywords = []
+        self._pending_regexes = []
+
+    def _find(self, body):
+        """Yield `(start, length, keyword, regex name)` for each match."""
+        folded = self._fold(body)
+        # Casefolding can lengthen the body; map positions back, for order.
+        offsets = None
+        if len(folded) != len(body):
+            offsets = [n for n, char in enumerate(body) for _ in self._fold(char)]
+
+        for keywords, regexes in self._segments:
+            if keywords is not None:
+                for match in keywords(folded):
+                    start = match.start()
+                    if offsets is not None:
+                        start = offsets[start]
+                    for keyword in self._prefixes_of(match.group(1)):
+                        yield start, len(keyword), keyword, None
+            if regexes is not None:
+                for match in regexes(body):
+                    name = match.lastgroup
+                    yield match.start(), len(match.group(name)), None, name
+
+    def _fold(self, text):
+        return text.casefold() if self.ignore_case else text
+
+    def _prefixes_of(self, keyword):
+        try:
+            return self._prefixes[keyword]
+        except KeyError:
+            prefixes = self._prefixes[keyword] = tuple(
+                keyword[:n]
+                for n in range(1, len(keyword) + 1)
+                if keyword[:n] in self._keywords
+            )
+            return prefixes
+
+    def _reply(self, client, channel, raw_body, **kwargs):
+        for value in self.match(to_unicode(raw_body)):
+            client.privmsg(channel, value)
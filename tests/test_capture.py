@@ -0,0 +1,97 @@
+import os
+import time
+from unittest import mock
+
+from framewirc import capture
+from framewirc.messages import ReceivedMessage
+
+from .utils import BlankClient
+
+
+MESSAGES = [
+    ReceivedMessage(b':nick!~user@host PRIVMSG #chan :Hello\r\n'),
+    ReceivedMessage(b'PING :server\r\n'),
+    ReceivedMessage(b':nick!~user@host PRIVMSG #chan :Ume\xe5\r\n'),
+]
+
+
+def capture_messages(directory, messages, **kwargs):
+    writer = capture.SegmentWriter(directory=str(directory), **kwargs)
+    for message in messages:
+        writer.handler(None, message)
+    writer.close()
+    return writer
+
+
+class TestSegmentWriter:
+    def test_round_trip(self, tmpdir):
+        """Messages read back are identical to those captured."""
+        start = time.time()
+        writer = capture_messages(tmpdir, MESSAGES)
+
+        records = list(capture.read_segment(writer.segments[0]))
+
+        assert [message for _, message in records] == MESSAGES
+        assert all(start <= received <= time.time() for received, _ in records)
+
+    def test_compressed(self, tmpdir):
+        writer = capture_messages(tmpdir, MESSAGES, compress=True)
+
+        assert writer.segments[0].endswith('.seg.gz')
+        records = list(capture.read_segment(writer.segments[0]))
+        assert [message for _, message in records] == MESSAGES
+
+    def test_parsed(self, tmpdir):
+        """Messages read back are ReceivedMessages."""
+        writer = capture_messages(tmpdir, MESSAGES[:1])
+        _, message = next(capture.read_segment(writer.segments[0]))
+        assert message.command == 'PRIVMSG'
+
+    def test_rotation(self, tmpdir):
+        """New segments are started when they grow too large."""
+        writer = capture_messages(tmpdir, MESSAGES, block_size=1, max_bytes=1)
+
+        assert len(writer.segments) == 3
+        assert sorted(os.listdir(str(tmpdir))) == sorted(
+            os.path.basename(path) for path in writer.segments
+        )
+        records = [next(capture.read_segment(path)) for path in writer.segments]
+        assert [message for _, message in records] == MESSAGES
+
+    def test_buffered(self, tmpdir):
+        """Small numbers of messages are gathered before being written."""
+        writer = capture.SegmentWriter(directory=str(tmpdir))
+        with mock.patch.object(writer, 'flush') as flush:
+            writer.handler(None, MESSAGES[0])
+        assert flush.called is False
+        writer.close()
+
+    def test_flushed_when_idle(self, tmpdir):
+        """Records are written after `flush_interval`, without more messages."""
+        writer = capture.SegmentWriter(directory=str(tmpdir), flush_interval=0.01)
+        writer.handler(None, MESSAGES[0])
+
+        records = []
+        deadline = time.monotonic() + 1
+        while not records and time.monotonic() < deadline:
+            time.sleep(0.01)
+            if writer.segments:
+                records = list(capture.read_segment(writer.segments[0]))
+        writer.close()
+
+        assert [message for _, message in records] == MESSAGES[:1]
+
+    def test_nothing_captured(self, tmpdir):
+        writer = capture_messages(tmpdir, [])
+        assert writer.segments == []
+
+
+def test_replay(tmpdir):
+    """Replayed messages are passed to the client's handlers."""
+    writer = capture_messages(tmpdir, MESSAGES)
+    handler = mock.Mock()
+    client = BlankClient(handlers=[handler])
+
+    capture.replay(client, writer.segments[0])
+
+    assert handler.mock_calls == [mock.call(client, m) for m in MESSAGES]
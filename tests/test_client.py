@@ -3,14 +3,45 @@ from unittest import mock
 
 import pytest
 
-from framewirc import exceptions
+from framewirc import exceptions, replies
 from framewirc.client import Client
 from framewirc.connection import Connection
+from framewirc.instrumentation import Instrumentation
 from framewirc.messages import ReceivedMessage
+from framewirc.spool import Spool
 
 from .utils import BlankClient
 
 
+class TestBanList:
+    def test_query_sent(self):
+        client = BlankClient()
+        client.replies = mock.MagicMock()
+
+        client.ban_list('#chan')
+
+        expected = (replies.BANS, '#chan', b'MODE #chan b\r\n')
+        client.replies.fetch.assert_called_once_with(*expected)
+
+
+class TestChannelList:
+    def setup_method(self, method):
+        self.client = BlankClient()
+        self.client.replies = mock.MagicMock()
+
+    def test_all_channels(self):
+        self.client.channel_list()
+
+        expected = (replies.LIST, '', b'LIST\r\n')
+        self.client.replies.fetch.assert_called_once_with(*expected)
+
+    def test_some_channels(self):
+        self.client.channel_list('#a', '#b')
+
+        expected = (replies.LIST, '#a,#b', b'LIST #a,#b\r\n')
+        self.client.replies.fetch.assert_called_once_with(*expected)
+
+
 class TestConnectTo:
     def test_connection_stored(self):
         """Has "connection" been stored on the client?"""
@@ -20,6 +51,24 @@ class TestConnectTo:
             client.connect_to('irc.example.com')
         assert isinstance(client.connection, Connection)
 
+    def test_instrumentation_shared(self):
+        """The connection reports to the client's instrumentation."""
+        instrumentation = Instrumentation()
+        client = BlankClient(instrumentation=instrumentation)
+        mock_path = 'asyncio.BaseEventLoop.create_task'
+        with mock.patch(mock_path, spec=asyncio.Task):
+            client.connect_to('irc.example.com')
+        assert client.connection.instrumentation is instrumentation
+
+    def test_spool_shared(self):
+        """The connection spools messages to the client's spool."""
+        spool = Spool(path='unused')
+        client = BlankClient(spool=spool)
+        mock_path = 'asyncio.BaseEventLoop.create_task'
+        with mock.patch(mock_path, spec=asyncio.Task):
+            client.connect_to('irc.example.com')
+        assert client.connection.spool is spool
+
     def test_task_returned(self):
         """Is the correct "Task" created and returned?"""
         client = BlankClient()
@@ -47,6 +96,32 @@ class TestJoin:
         self.client.connection.send.assert_called_with(b'JOIN #framewirc,#meshy\r\n')
 
 
+class TestNames:
+    def test_query_sent(self):
+        client = BlankClient()
+        client.replies = mock.MagicMock()
+
+        client.names('#chan')
+
+        expected = (replies.NAMES, '#chan', b'NAMES #chan\r\n')
+        client.replies.fetch.assert_called_once_with(*expected)
+
+
+class TestOnDisconnect:
+    def test_replies_failed(self):
+        """Queries waiting for replies are told the connection has gone."""
+        client = BlankClient()
+        client.replies = mock.MagicMock()
+        client.on_disconnect()
+        client.replies.disconnected.assert_called_once_with()
+
+    def test_channels_forgotten(self):
+        client = BlankClient()
+        client.channels = {'#chan'}
+        client.on_disconnect()
+        assert client.channels == set()
+
+
 class TestOnMessage:
     def test_handlers_called(self):
         """When a message comes in, it should be passed to the handlers."""
@@ -58,6 +133,50 @@ class TestOnMessage:
 
         handler.assert_called_with(client, message)
 
+    def test_instrumented(self):
+        """When instrumented, handler calls are counted."""
+        handler = mock.MagicMock()
+        instrumentation = Instrumentation()
+        client = BlankClient(handlers=[handler], instrumentation=instrumentation)
+        message = ReceivedMessage(b'TEST message\r\n')
+
+        client.on_message(message)
+
+        handler.assert_called_with(client, message)
+        assert instrumentation.handler_calls == {handler: 1}
+
+    def test_replies_fed(self):
+        """Messages are offered to the reply collector."""
+        client = BlankClient()
+        client.replies = mock.MagicMock()
+        message = ReceivedMessage(b'TEST message\r\n')
+
+        client.on_message(message)
+
+        client.replies.feed.assert_called_once_with(message)
+
+    def test_filtered_out(self):
+        """Messages rejected by a message filter don't reach the handlers."""
+        handler = mock.MagicMock()
+        message_filter = mock.MagicMock(return_value=False)
+        client = BlankClient(handlers=[handler], message_filters=[message_filter])
+        message = ReceivedMessage(b'TEST message\r\n')
+
+        client.on_message(message)
+
+        message_filter.assert_called_once_with(client, message)
+        assert handler.called is False
+
+    def test_filtered_in(self):
+        handler = mock.MagicMock()
+        message_filter = mock.MagicMock(return_value=True)
+        client = BlankClient(handlers=[handler], message_filters=[message_filter])
+        message = ReceivedMessage(b'TEST message\r\n')
+
+        client.on_message(message)
+
+        handler.assert_called_with(client, message)
+
 
 class TestOnConnect:
     def setup_method(self, method):
@@ -187,3 +306,14 @@ class TestSetNick:
         """When the nick changes, reset the mask_length."""
         self.client.set_nick('meshy')
         assert self.client.mask_length is None
+
+
+class TestWho:
+    def test_query_sent(self):
+        client = BlankClient()
+        client.replies = mock.MagicMock()
+
+        client.who('*.example.com')
+
+        expected = (replies.WHO, '*.example.com', b'WHO *.example.com\r\n')
+        client.replies.fetch.assert_called_once_with(*expected)
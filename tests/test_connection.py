@@ -1,17 +1,23 @@
+import asyncio
 from asyncio import StreamWriter
 from unittest import mock
 
 import pytest
 
+from framewirc import streams
 from framewirc.client import Client
 from framewirc.connection import Connection
 from framewirc.exceptions import (
+    CannotHandOff,
     MessageTooLong,
     MustBeBytes,
     NoLineEnding,
     StrayLineEnding,
 )
-from framewirc.messages import ReceivedMessage
+from framewirc.instrumentation import Instrumentation
+from framewirc.keepalive import Keepalive
+from framewirc.messages import build_message, BuiltMessage, ReceivedMessage
+from framewirc.spool import Spool
 
 from .utils import BlankClient
 
@@ -54,6 +60,41 @@ class TestHandle(ConnectionTestCase):
         expected = ReceivedMessage(raw_message)
         self.connection.client.on_message.assert_called_with(expected)
 
+    def test_instrumented(self):
+        """When instrumented, parsing is measured."""
+        raw_message = b'PRIVMSG meshy :You should really see this!\r\n'
+        self.connection.client = mock.MagicMock(spec=Client)
+        self.connection.instrumentation = Instrumentation()
+        self.connection.handle(raw_message)
+
+        expected = ReceivedMessage(raw_message)
+        self.connection.client.on_message.assert_called_with(expected)
+        assert self.connection.instrumentation.commands == {'PRIVMSG': 1}
+
+    def test_keepalive(self):
+        """Messages are passed to the keepalive, to detect dead connections."""
+        raw_message = b'PONG server :framewirc-0\r\n'
+        self.connection.keepalive = mock.MagicMock(spec=Keepalive)
+        self.connection.handle(raw_message)
+
+        expected = ReceivedMessage(raw_message)
+        self.connection.keepalive.received.assert_called_once_with(expected)
+
+    def test_spool_replayed_when_registered(self):
+        """Once the network welcomes us, the spool is replayed."""
+        self.connection.spool = mock.MagicMock(spec=Spool)
+        loop = asyncio.new_event_loop()
+
+        async def welcome():
+            self.connection.handle(b':server 001 test_nick :Welcome\r\n')
+            await self.connection._replaying
+        try:
+            loop.run_until_complete(welcome())
+        finally:
+            loop.close()
+
+        self.connection.spool.replay.assert_called_once_with(self.connection)
+
     def test_empty_message_does_not_call_on_message(self):
         """Do not pass empty messages through to client.on_message()."""
         self.connection.client = mock.MagicMock(spec=Client)
@@ -73,12 +114,151 @@ class TestHandle(ConnectionTestCase):
         self.connection.disconnect.assert_called_with()
 
 
+class ConnectedTestCase(ConnectionTestCase):
+    """Base TestCase for tests that want a connected Connection."""
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.connection._connected = True
+
+
+class TestDisconnect(ConnectedTestCase):
+    def test_writer_closed(self):
+        self.connection.disconnect()
+        self.connection.writer.close.assert_called_once_with()
+
+    def test_abort(self):
+        """Aborting drops the connection without flushing the write buffer."""
+        self.connection.disconnect(abort=True)
+        self.connection.writer.transport.abort.assert_called_once_with()
+        assert self.connection.writer.close.called is False
+
+    def test_keepalive_stopped(self):
+        keepalive = self.connection.keepalive = mock.MagicMock(spec=Keepalive)
+        self.connection.disconnect()
+        keepalive.stop.assert_called_once_with()
+        assert self.connection.keepalive is None
+
+    def test_client_told(self):
+        self.connection.client = mock.MagicMock(spec=Client)
+        self.connection.disconnect()
+        self.connection.client.on_disconnect.assert_called_once_with()
+
+    def test_already_disconnected(self):
+        """The read that ends after disconnecting doesn't disconnect again."""
+        self.connection.client = mock.MagicMock(spec=Client)
+        self.connection.disconnect()
+        self.connection.handle(b'')
+        self.connection.writer.close.assert_called_once_with()
+        self.connection.client.on_disconnect.assert_called_once_with()
+
+
+class TestReattach(ConnectedTestCase):
+    def test_held_back_sent(self):
+        """What was sent while detached is written once reattached."""
+        loop = asyncio.new_event_loop()
+        self.connection._detached = loop.create_future()
+        self.connection._unread = []
+        self.connection._unsent = []
+        self.connection.send(b'PRIVMSG meshy :Held back\r\n')
+        assert self.connection.writer.write.called is False
+
+        self.connection.reattach()
+        loop.close()
+
+        self.connection.writer.write.assert_called_once_with(
+            b'PRIVMSG meshy :Held back\r\n',
+        )
+        self.connection.writer.transport.resume_reading.assert_called_once_with()
+        assert self.connection._unsent is None
+
+
+class TestDetach(ConnectedTestCase):
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.connection.ssl = False
+        self.transport = self.connection.writer.transport
+        self.transport.is_closing.return_value = False
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def test_timeout(self):
+        """If what was sent doesn't leave in time, the connection carries on."""
+        self.transport.get_write_buffer_size.return_value = 1
+        self.connection.detach_timeout = 0
+
+        with pytest.raises(CannotHandOff):
+            self.loop.run_until_complete(self.connection.detach())
+
+        assert self.connection._detached.result() is True
+        assert self.connection._unread is None
+        self.transport.resume_reading.assert_called_once_with()
+
+    def test_pause_ends_while_detaching(self):
+        """Reading stays paused when a pause ends while detaching."""
+        async def scenario():
+            self.connection._closed = self.loop.create_future()
+            self.connection._unread = []
+            await self.connection._pause_reading()
+
+        self.loop.run_until_complete(scenario())
+
+        self.transport.resume_reading.assert_not_called()
+
+    def test_reattach_while_paused(self):
+        """Reattaching leaves a pause under way to resume reading."""
+        self.connection._detached = self.loop.create_future()
+        self.connection._unread = []
+        self.connection._unsent = []
+        self.connection._reading_paused = True
+
+        self.connection.reattach()
+
+        self.transport.resume_reading.assert_not_called()
+
+
+class TestReconnect(ConnectedTestCase):
+    def test_reconnect(self):
+        """Disconnects, and flags that the connection should be remade."""
+        self.connection.reconnect()
+        self.connection.writer.close.assert_called_once_with()
+        assert self.connection._reconnect is True
+
+    def test_abort(self):
+        self.connection.reconnect(abort=True)
+        self.connection.writer.transport.abort.assert_called_once_with()
+        assert self.connection._reconnect is True
+
+
 class TestSend(ConnectionTestCase):
     def test_ideal_case(self):
         message = b'PRIVMSG meshy :Nice IRC lib you have there\r\n'
         self.connection.send(message)
         self.connection.writer.write.assert_called_with(message)
 
+    def test_instrumented(self):
+        """When instrumented, bytes sent are counted."""
+        message = b'PRIVMSG meshy :Nice IRC lib you have there\r\n'
+        self.connection.instrumentation = Instrumentation()
+        self.connection.send(message)
+        assert self.connection.instrumentation.bytes_out == len(message)
+
+    def test_spooled_when_disconnected(self):
+        message = b'PRIVMSG meshy :Are you there?\r\n'
+        self.connection.spool = mock.MagicMock(spec=Spool)
+        self.connection.send(message)
+        self.connection.spool.append.assert_called_once_with(message)
+        assert self.connection.writer.write.called is False
+
+    def test_not_spooled_when_connected(self):
+        message = b'PRIVMSG meshy :Are you there?\r\n'
+        self.connection.spool = mock.MagicMock(spec=Spool)
+        self.connection._connected = True
+        self.connection.send(message)
+        assert self.connection.spool.append.called is False
+        self.connection.writer.write.assert_called_with(message)
+
     def test_not_bytes(self):
         message = 'PRIVMSG meshy :What µŋhandłed µŋicode yoµ ħave!\r\n'
         with pytest.raises(MustBeBytes):
@@ -103,6 +283,22 @@ class TestSend(ConnectionTestCase):
             self.connection.send(message)
         assert self.connection.writer.write.called is False
 
+    def test_built_message_trusted(self):
+        """Messages from build_message are not checked again."""
+        message = build_message('PRIVMSG', 'meshy', suffix='Already checked')
+        with mock.patch('framewirc.connection.len') as mock_len:
+            self.connection.send(message)
+        assert mock_len.called is False
+        self.connection.writer.write.assert_called_with(message)
+
+    def test_built_message_subclass_checked(self):
+        """Only BuiltMessage itself is trusted, not subclasses."""
+        class Sneaky(BuiltMessage):
+            pass
+
+        with pytest.raises(NoLineEnding):
+            self.connection.send(Sneaky(b'PRIVMSG meshy :Sneaky'))
+
     def test_message_just_right(self):
         message = b'FIFTEEN chars :' + 495 * b'a' + b'\r\n'  # 512 chars
         self.connection.send(message)
@@ -111,10 +307,247 @@ class TestSend(ConnectionTestCase):
 
 class TestSendBatch(ConnectionTestCase):
     def test_send_batch(self):
+        """Messages are sent in a single write."""
         messages = [
             b'PRIVMSG meshy :Getting there\r\n',
             b'PRIVMSG meshy :It is almost usable!\r\n',
         ]
         self.connection.send_batch(messages)
-        calls = self.connection.writer.write.mock_calls
-        assert calls == list(map(mock.call, messages))
+        self.connection.writer.write.assert_called_once_with(b''.join(messages))
+
+    def test_all_validated_first(self):
+        """If any message is invalid, nothing is sent."""
+        messages = [
+            b'PRIVMSG meshy :This one is fine\r\n',
+            b'PRIVMSG meshy :This one has no line ending',
+        ]
+        with pytest.raises(NoLineEnding):
+            self.connection.send_batch(messages)
+        assert self.connection.writer.write.called is False
+
+    def test_generator(self):
+        messages = [
+            b'PRIVMSG meshy :Getting there\r\n',
+            b'PRIVMSG meshy :It is almost usable!\r\n',
+        ]
+        self.connection.send_batch(message for message in messages)
+        self.connection.writer.write.assert_called_once_with(b''.join(messages))
+
+
+class TestSendBatchAsync(ConnectionTestCase):
+    def test_drained(self):
+        """Messages are sent in a single write, then the writer is drained."""
+        messages = [
+            b'PRIVMSG meshy :Getting there\r\n',
+            b'PRIVMSG meshy :It is almost usable!\r\n',
+        ]
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.connection.send_batch_async(messages))
+        finally:
+            loop.close()
+
+        self.connection.writer.write.assert_called_once_with(b''.join(messages))
+        self.connection.writer.drain.assert_called_once_with()
+
+
+class TestWriteBufferLimits:
+    def test_limits_set(self):
+        """The transport's buffer limits are set from the water marks."""
+        limits = []
+
+        async def serve(reader, writer):
+            await reader.read()
+
+        async def scenario():
+            server = await asyncio.start_server(serve, '127.0.0.1', 0)
+            client = BlankClient()
+            client.connection = Connection(
+                client=client,
+                host='127.0.0.1',
+                port=server.sockets[0].getsockname()[1],
+                ssl=False,
+                write_high_water=4096,
+                write_low_water=1024,
+            )
+            client.on_connect = lambda: client.connection.disconnect()
+            await client.connection.connect()
+            transport = client.connection.writer.transport
+            limits.append(transport.get_write_buffer_limits())
+            server.close()
+            await server.wait_closed()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+        assert limits == [(1024, 4096)]
+
+
+class TestSaturated:
+    def test_reading_waits(self):
+        """While the client is saturated, no more lines are read."""
+        lines = [b'PRIVMSG #chan :1\r\n', b'PRIVMSG #chan :2\r\n', b'']
+        reader = mock.MagicMock(spec=asyncio.StreamReader)
+        reader.readline.side_effect = lines
+        writer = mock.MagicMock(spec=StreamWriter)
+        client = BlankClient()
+        client.on_connect = mock.Mock()
+        subscription = client.messages(maxsize=1, overflow=streams.BLOCK)
+        client.connection = Connection(client=client, host='example.com')
+
+        async def scenario():
+            opened = (reader, writer)
+            with mock.patch.object(Connection, '_open', return_value=opened):
+                task = asyncio.ensure_future(client.connection.connect())
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                assert reader.readline.call_count == 1
+
+                await subscription.__anext__()
+                await subscription.__anext__()
+                await task
+            assert reader.readline.call_count == 3
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+
+    def test_high_water(self):
+        """Reading pauses at the high water mark, until the low water mark."""
+        lines = [b'PRIVMSG #chan :%d\r\n' % n for n in range(4)] + [b'']
+        reader = mock.MagicMock(spec=asyncio.StreamReader)
+        reader.readline.side_effect = lines
+        writer = mock.MagicMock(spec=StreamWriter)
+        writer.transport.is_closing.return_value = False
+        client = BlankClient()
+        client.on_connect = mock.Mock()
+        subscription = client.messages(overflow=streams.BLOCK)
+        client.connection = Connection(
+            client=client,
+            host='example.com',
+            read_high_water=3,
+            read_low_water=1,
+        )
+
+        async def scenario():
+            opened = (reader, writer)
+            with mock.patch.object(Connection, '_open', return_value=opened):
+                task = asyncio.ensure_future(client.connection.connect())
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                assert reader.readline.call_count == 3
+                writer.transport.pause_reading.assert_called_once_with()
+
+                await subscription.__anext__()
+                await asyncio.sleep(0)
+                assert reader.readline.call_count == 3
+
+                await subscription.__anext__()
+                await task
+            writer.transport.resume_reading.assert_called_once_with()
+            assert reader.readline.call_count == 5
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+
+    def test_disconnect_while_paused(self):
+        """Disconnecting ends a pause in reading, and the connection with it."""
+        reader = mock.MagicMock(spec=asyncio.StreamReader)
+        reader.readline.side_effect = [b'PRIVMSG #chan :1\r\n', b'PRIVMSG #chan :2\r\n']
+        writer = mock.MagicMock(spec=StreamWriter)
+        writer.get_extra_info.return_value = None
+        client = BlankClient()
+        client.on_connect = mock.Mock()
+        client.messages(maxsize=1, overflow=streams.BLOCK)
+        client.connection = Connection(client=client, host='example.com')
+
+        async def scenario():
+            opened = (reader, writer)
+            with mock.patch.object(Connection, '_open', return_value=opened):
+                task = asyncio.ensure_future(client.connection.connect())
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                client.connection.disconnect(abort=True)
+                await asyncio.wait_for(task, 1)
+            assert reader.readline.call_count == 1
+            writer.transport.resume_reading.assert_not_called()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+
+    def test_keepalive_paused(self):
+        """The keepalive doesn't count time spent not reading."""
+        reader = mock.MagicMock(spec=asyncio.StreamReader)
+        reader.readline.side_effect = [b'PRIVMSG #chan :1\r\n', b'']
+        writer = mock.MagicMock(spec=StreamWriter)
+        writer.transport.is_closing.return_value = False
+        client = BlankClient()
+        client.on_connect = mock.Mock()
+        subscription = client.messages(maxsize=1, overflow=streams.BLOCK)
+        keepalive = mock.Mock()
+        client.connection = Connection(
+            client=client,
+            host='example.com',
+            keepalive_class=mock.Mock(return_value=keepalive),
+            keepalive_interval=60,
+        )
+
+        async def scenario():
+            opened = (reader, writer)
+            with mock.patch.object(Connection, '_open', return_value=opened):
+                task = asyncio.ensure_future(client.connection.connect())
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                keepalive.pause.assert_called_once_with()
+                assert keepalive.resume.called is False
+
+                await subscription.__anext__()
+                await task
+            keepalive.resume.assert_called_once_with()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+
+    def test_dropping_subscription_ignored(self):
+        """An unread subscription that drops messages doesn't pause reading."""
+        lines = [b'PRIVMSG #chan :%d\r\n' % n for n in range(10)] + [b'']
+        reader = mock.MagicMock(spec=asyncio.StreamReader)
+        reader.readline.side_effect = lines
+        writer = mock.MagicMock(spec=StreamWriter)
+        received = []
+        client = BlankClient(handlers=[lambda client, message: received.append(message)])
+        client.on_connect = mock.Mock()
+        client.messages(maxsize=2)
+        client.messages(maxsize=2, overflow=streams.DROP_NEWEST)
+        client.connection = Connection(
+            client=client,
+            host='example.com',
+            read_high_water=3,
+            read_low_water=1,
+        )
+
+        async def scenario():
+            opened = (reader, writer)
+            with mock.patch.object(Connection, '_open', return_value=opened):
+                await asyncio.wait_for(client.connection.connect(), 1)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+        assert len(received) == 10
+        assert writer.transport.pause_reading.called is False
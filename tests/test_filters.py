@@ -1,5 +1,7 @@
 from unittest import mock
 
+import pytest
+
 from framewirc import filters
 from framewirc.messages import ReceivedMessage
 
@@ -107,3 +109,137 @@ class TestAllow:
         wrapped(self.client, message)
 
         assert self.handler.called is False
+
+
+def test_handler_name_kept():
+    """Filtered handlers keep the name of the handler they wrap."""
+    def my_handler(client, message):
+        pass
+
+    assert filters.allow('A')(my_handler).__name__ == 'my_handler'
+    assert filters.deny('A')(my_handler).__name__ == 'my_handler'
+
+
+class TestWhen:
+    def setup_method(self, method):
+        self.client = object()
+        self.handler = mock.Mock()
+
+    def test_match(self):
+        message = ReceivedMessage(b'COMMAND\r\n')
+        wrapped = filters.when(filters.command('COMMAND'))(self.handler)
+
+        wrapped(self.client, message)
+
+        self.handler.assert_called_once_with(
+            client=self.client,
+            message=message,
+        )
+
+    def test_no_match(self):
+        message = ReceivedMessage(b'WRONG_COMMAND\r\n')
+        wrapped = filters.when(filters.command('COMMAND'))(self.handler)
+
+        wrapped(self.client, message)
+
+        assert self.handler.called is False
+
+    def test_wraps(self):
+        def handler(client, message):
+            pass
+
+        wrapped = filters.when(filters.command('COMMAND'))(handler)
+
+        assert wrapped.__name__ == 'handler'
+
+
+class TestPredicates:
+    message = ReceivedMessage(b':nick!~user@spam.example PRIVMSG #Chan :Buy now\r\n')
+
+    def matches(self, predicate, message=None):
+        return predicate.compile()(message or self.message)
+
+    def test_command(self):
+        assert self.matches(filters.command('NOTICE', 'PRIVMSG'))
+        assert not self.matches(filters.command('NOTICE'))
+
+    def test_channel(self):
+        """Channel names are not case sensitive."""
+        assert self.matches(filters.channel('#chan'))
+        assert not self.matches(filters.channel('#other'))
+
+    def test_channel_no_params(self):
+        message = ReceivedMessage(b'PING :server\r\n')
+        assert not self.matches(filters.channel('#chan'), message)
+
+    def test_sender(self):
+        assert self.matches(filters.sender('*!*@SPAM.*'))
+        assert self.matches(filters.sender('other!*@*', 'nic?!*@*'))
+        assert not self.matches(filters.sender('*!*@example.com'))
+
+    def test_body(self):
+        assert self.matches(filters.body(r'buy|sell', r'\bnow\b'))
+        assert not self.matches(filters.body(r'^now'))
+
+    def test_body_inline_flags(self):
+        """Inline flags apply to their own pattern only."""
+        assert self.matches(filters.body(r'(?i)BUY', r'never'))
+        assert not self.matches(filters.body(r'(?i)sell', r'NOW'))
+
+    def test_empty_rejected(self):
+        for factory in filters.body, filters.channel, filters.command, filters.sender:
+            with pytest.raises(TypeError):
+                factory()
+
+    def test_empty_matches_nothing(self):
+        predicates = filters.Body([]), filters.Channel([]), filters.Command([])
+        for predicate in predicates + (filters.Sender([]),):
+            assert not self.matches(predicate)
+
+    def test_compile_required(self):
+        class Incomplete(filters.Predicate):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_and(self):
+        assert self.matches(filters.command('PRIVMSG') & filters.channel('#chan'))
+        assert not self.matches(filters.command('PRIVMSG') & filters.channel('#a'))
+
+    def test_or(self):
+        assert self.matches(filters.command('NOTICE') | filters.channel('#chan'))
+        assert not self.matches(filters.command('NOTICE') | filters.channel('#a'))
+
+    def test_not(self):
+        assert not self.matches(~filters.command('PRIVMSG'))
+        assert self.matches(~filters.command('NOTICE'))
+        assert self.matches(~filters.channel('#other'))
+        assert self.matches(~~filters.command('PRIVMSG'))
+
+    def test_combined(self):
+        predicate = (
+            filters.command('PRIVMSG') &
+            filters.channel('#chan', '#other') &
+            ~filters.sender('*!*@spam.*')
+        )
+        assert not self.matches(predicate)
+
+    def test_or_merges_alike(self):
+        predicate = filters.command('A') | filters.body('x') | filters.command('B')
+        simplified = predicate.simplified()
+        assert len(simplified) == 2
+        assert simplified[0].names == {'A', 'B'}
+
+    def test_and_intersects_alike(self):
+        predicate = filters.command('A', 'B') & filters.command('B', 'C')
+        assert predicate.simplified()[0].names == {'B'}
+
+    def test_cheapest_first(self):
+        predicate = filters.body('x') & filters.sender('*') & filters.command('A')
+        kinds = [type(p) for p in predicate.simplified()]
+        assert kinds == [filters.Command, filters.Sender, filters.Body]
+
+    def test_nested_flattened(self):
+        a, b, c = (filters.command(name) for name in 'ABC')
+        assert len((a | (b | c)).predicates) == 3
@@ -105,3 +105,57 @@ class TestCaptureMaskLength:
         handlers.capture_mask_length(client, message)
 
         assert client.mask_length is None
+
+
+class TestTrackChannels:
+    def test_join(self):
+        client = BlankClient()
+        message = ReceivedMessage(b':test_nick!~u@host JOIN #chan\r\n')
+
+        handlers.track_channels(client, message)
+
+        assert client.channels == {'#chan'}
+
+    def test_join_suffix(self):
+        """Some servers send the channel as the suffix."""
+        client = BlankClient()
+        message = ReceivedMessage(b':test_nick!~u@host JOIN :#chan\r\n')
+
+        handlers.track_channels(client, message)
+
+        assert client.channels == {'#chan'}
+
+    def test_case_insensitive(self):
+        client = BlankClient()
+        client.channels = {'#chan'}
+        message = ReceivedMessage(b':test_nick!~u@host PART #Chan :Bye\r\n')
+
+        handlers.track_channels(client, message)
+
+        assert client.channels == set()
+
+    def test_part(self):
+        client = BlankClient()
+        client.channels = {'#chan', '#other'}
+        message = ReceivedMessage(b':test_nick!~u@host PART #chan :Bye\r\n')
+
+        handlers.track_channels(client, message)
+
+        assert client.channels == {'#other'}
+
+    def test_kicked(self):
+        client = BlankClient()
+        client.channels = {'#chan'}
+        message = ReceivedMessage(b':op!~u@host KICK #chan test_nick :Out\r\n')
+
+        handlers.track_channels(client, message)
+
+        assert client.channels == set()
+
+    def test_someone_else(self):
+        client = BlankClient()
+        message = ReceivedMessage(b':other!~u@host JOIN #chan\r\n')
+
+        handlers.track_channels(client, message)
+
+        assert client.channels == set()
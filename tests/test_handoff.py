@@ -0,0 +1,166 @@
+import asyncio
+import os
+from unittest import mock
+
+import pytest
+
+from framewirc import handoff
+from framewirc.connection import Connection
+from framewirc.exceptions import CannotHandOff
+from framewirc.messages import ReceivedMessage
+
+from .utils import BlankClient
+
+
+def test_send_receive_fds(tmpdir):
+    path = str(tmpdir.join('handoff.sock'))
+    read_fd, write_fd = os.pipe()
+
+    async def scenario():
+        loop = asyncio.get_event_loop()
+        receiving = loop.run_in_executor(None, handoff.receive_fds, path)
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        await loop.run_in_executor(None, handoff.send_fds, path, b'state', [write_fd])
+        return await receiving
+
+    loop = asyncio.new_event_loop()
+    try:
+        payload, fds = loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+    assert payload == b'state'
+    os.write(fds[0], b'through the pipe')
+    assert os.read(read_fd, 100) == b'through the pipe'
+    for fd in fds + [read_fd, write_fd]:
+        os.close(fd)
+
+
+def test_tls_refused():
+    connection = Connection(client=BlankClient(), host='example.com')
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(CannotHandOff):
+            loop.run_until_complete(connection.detach())
+    finally:
+        loop.close()
+
+
+def test_hand_over(tmpdir):
+    """The new client carries on with the same socket and state."""
+    path = str(tmpdir.join('handoff.sock'))
+    accepted = []
+    received = []
+
+    async def serve(reader, writer):
+        accepted.append(writer)
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            received.append(line)
+
+    async def scenario():
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        old = BlankClient()
+        old.connect_to('127.0.0.1', port=port, ssl=False)
+        while not received:
+            await asyncio.sleep(0.01)
+        old.channels = {'#chan'}
+        old.mask_length = 20
+
+        new = BlankClient(handlers=[mock.Mock()])
+        taking_over = asyncio.ensure_future(handoff.take_over(path, {'bot': new}))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        await handoff.hand_over(path, {'bot': old})
+        tasks = await taking_over
+        # Checked now, because disconnecting forgets them.
+        assert new.channels == {'#chan'}
+
+        accepted[0].write(b'PRIVMSG test_nick :Still there?\r\n')
+        while not new.handlers[0].called:
+            await asyncio.sleep(0.01)
+        new.connection.send(b'PRIVMSG someone :Yes\r\n')
+        while len(received) < 3:
+            await asyncio.sleep(0.01)
+
+        new.connection.disconnect()
+        await asyncio.gather(*tasks)
+        server.close()
+        await server.wait_closed()
+        return new
+
+    loop = asyncio.new_event_loop()
+    try:
+        new = loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+    assert len(accepted) == 1
+    assert received[-1] == b'PRIVMSG someone :Yes\r\n'
+    assert new.mask_length == 20
+    message = new.handlers[0].call_args[0][1]
+    assert message == ReceivedMessage(b'PRIVMSG test_nick :Still there?\r\n')
+
+
+def test_hand_over_failed(tmpdir):
+    """If nobody takes the connections, the old client carries on with them."""
+    path = str(tmpdir.join('nobody-listening.sock'))
+    accepted = []
+    received = []
+
+    async def serve(reader, writer):
+        accepted.append(writer)
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            received.append(line)
+
+    async def scenario():
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        old = BlankClient(handlers=[mock.Mock()])
+        task = old.connect_to('127.0.0.1', port=port, ssl=False)
+        while not received:
+            await asyncio.sleep(0.01)
+
+        with pytest.raises(OSError):
+            await handoff.hand_over(path, {'bot': old})
+
+        accepted[0].write(b'PRIVMSG test_nick :Still there?\r\n')
+        while not old.handlers[0].called:
+            await asyncio.sleep(0.01)
+        old.connection.send(b'PRIVMSG someone :Yes\r\n')
+        while received[-1] != b'PRIVMSG someone :Yes\r\n':
+            await asyncio.sleep(0.01)
+
+        old.connection.disconnect()
+        await task
+        server.close()
+        await server.wait_closed()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(asyncio.wait_for(scenario(), 5))
+    finally:
+        loop.close()
+
+    assert len(accepted) == 1
+
+
+def test_client_state():
+    client = BlankClient(mask_length=10)
+    client.channels = {'#b', '#a'}
+    client.connection = Connection(client=client, host='example.com', port=6667)
+
+    state = handoff.client_state(client, b'\xff unread', b'unsent')
+
+    assert state['channels'] == ['#a', '#b']
+    assert state['unread'].encode('latin-1') == b'\xff unread'
+    assert state['port'] == 6667
@@ -0,0 +1,97 @@
+from asyncio import StreamWriter, Transport
+from unittest import mock
+
+from framewirc import filters
+from framewirc.instrumentation import Instrumentation
+from framewirc.messages import ReceivedMessage
+
+
+@filters.allow('PRIVMSG')
+def named_handler(client, message):
+    pass
+
+
+class TestDispatch:
+    def test_handlers_called(self):
+        handler = mock.Mock()
+        client = object()
+        message = ReceivedMessage(b'PRIVMSG #chan :Hi\r\n')
+
+        Instrumentation().dispatch(client, message, [handler])
+
+        handler.assert_called_once_with(client, message)
+
+    def test_calls_and_time(self):
+        instrumentation = Instrumentation()
+        message = ReceivedMessage(b'PRIVMSG #chan :Hi\r\n')
+
+        instrumentation.dispatch(None, message, [named_handler, named_handler])
+
+        handlers = instrumentation.snapshot()['handlers']
+        figures = handlers['tests.test_instrumentation.named_handler']
+        assert figures['calls'] == 2
+        assert figures['time'] > 0
+
+
+class TestParse:
+    def test_counters(self):
+        instrumentation = Instrumentation()
+        raw_message = b'PING :server\r\n'
+
+        message = instrumentation.parse(raw_message, ReceivedMessage)
+
+        assert message.command == 'PING'
+        snapshot = instrumentation.snapshot()
+        assert snapshot['bytes_in'] == len(raw_message)
+        assert snapshot['commands'] == {'PING': 1}
+        assert snapshot['messages'] == 1
+        assert snapshot['parse_time'] > 0
+
+
+class TestSendQueueDepth:
+    def test_not_connected(self):
+        assert Instrumentation().send_queue_depth() == 0
+
+    def writer(self, depth):
+        writer = mock.MagicMock(spec=StreamWriter)
+        writer.transport = mock.MagicMock(spec=Transport)
+        writer.transport.is_closing.return_value = False
+        writer.transport.get_write_buffer_size.return_value = depth
+        return writer
+
+    def test_buffered(self):
+        instrumentation = Instrumentation()
+        writer = self.writer(42)
+        instrumentation.connected(writer)
+
+        assert instrumentation.snapshot()['send_queue_depth'] == 42
+
+    def test_shared(self):
+        """An instance shared by connections counts all of their buffers."""
+        instrumentation = Instrumentation()
+        first, second = self.writer(1), self.writer(2)
+        instrumentation.connected(first)
+        instrumentation.connected(second)
+
+        assert instrumentation.send_queue_depth() == 3
+
+        second.transport.is_closing.return_value = True
+        assert instrumentation.send_queue_depth() == 1
+
+
+def test_sent():
+    instrumentation = Instrumentation()
+    instrumentation.sent(b'PONG :server\r\n')
+    assert instrumentation.snapshot()['bytes_out'] == 14
+
+
+def test_handshake():
+    instrumentation = Instrumentation()
+    instrumentation.handshake(0.5, resumed=True)
+    instrumentation.handshake(0.25)
+
+    snapshot = instrumentation.snapshot()
+
+    assert snapshot['handshakes'] == 2
+    assert snapshot['handshakes_resumed'] == 1
+    assert snapshot['handshake_time'] == 0.75
@@ -0,0 +1,165 @@
+import asyncio
+from unittest import mock
+
+from framewirc.connection import Connection
+from framewirc.keepalive import Keepalive
+from framewirc.messages import ReceivedMessage
+
+from .utils import BlankClient
+
+
+class KeepaliveTestCase:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+        self.connection = mock.MagicMock(
+            spec=Connection,
+            keepalive_interval=0.01,
+            lag=None,
+            max_lag=30,
+            max_silence=60,
+        )
+
+        async def make_keepalive():
+            return Keepalive(connection=self.connection)
+        self.keepalive = self.loop.run_until_complete(make_keepalive())
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+
+class TestPing(KeepaliveTestCase):
+    def test_sent(self):
+        self.keepalive.ping()
+        self.connection.send.assert_called_once_with(b'PING :framewirc-0\r\n')
+
+    def test_tokens_unique(self):
+        self.keepalive.ping()
+        self.keepalive.ping()
+        assert len(self.keepalive.pending) == 2
+
+
+class TestPong(KeepaliveTestCase):
+    def test_lag(self):
+        """The round trip time is stored on the connection as its lag."""
+        self.keepalive.pending[b'framewirc-0'] = self.loop.time() - 2
+        message = ReceivedMessage(b':server PONG server :framewirc-0\r\n')
+
+        self.keepalive.received(message)
+
+        assert 2 <= self.connection.lag < 3
+        assert not self.keepalive.pending
+
+    def test_token_as_param(self):
+        """Some servers send the token back as a param, not a suffix."""
+        self.keepalive.pending[b'framewirc-0'] = self.loop.time() - 2
+        self.keepalive.received(ReceivedMessage(b':server PONG server framewirc-0\r\n'))
+
+        assert 2 <= self.connection.lag < 3
+        assert not self.keepalive.pending
+
+    def test_rolling_mean(self):
+        """Lag is the mean of recent round trips."""
+        now = self.loop.time()
+        self.keepalive.pending[b'framewirc-0'] = now - 4
+        self.keepalive.pending[b'framewirc-1'] = now - 2
+        self.keepalive.received(ReceivedMessage(b'PONG server :framewirc-0\r\n'))
+        self.keepalive.received(ReceivedMessage(b'PONG server :framewirc-1\r\n'))
+
+        assert 3 <= self.connection.lag < 4
+
+    def test_other_pong(self):
+        """PONGs that don't answer our PINGs are ignored."""
+        self.keepalive.received(ReceivedMessage(b'PONG server :other\r\n'))
+        assert self.connection.lag is None
+
+
+class TestStale(KeepaliveTestCase):
+    def test_fresh(self):
+        assert self.keepalive.stale() is False
+
+    def test_unanswered_ping(self):
+        self.keepalive.pending[b'framewirc-0'] = self.loop.time() - 31
+        assert self.keepalive.stale() is True
+
+    def test_silence(self):
+        self.keepalive.last_read = self.loop.time() - 61
+        assert self.keepalive.stale() is True
+
+    def test_received_resets_silence(self):
+        self.keepalive.last_read = self.loop.time() - 61
+        self.keepalive.received(ReceivedMessage(b'PRIVMSG #chan :Hi\r\n'))
+        assert self.keepalive.stale() is False
+
+
+class TestPause(KeepaliveTestCase):
+    def test_pause_not_counted(self):
+        """Time spent paused doesn't count towards silence or lag."""
+        self.keepalive.pending[b'framewirc-0'] = self.loop.time() - 20
+        self.keepalive.last_read = self.loop.time() - 50
+        self.keepalive._paused_at = self.loop.time() - 20
+
+        self.keepalive.resume()
+
+        assert self.keepalive.stale() is False
+        assert self.keepalive.last_read > self.loop.time() - 50
+
+    def test_paused_not_stale(self):
+        """While paused, no PINGs are sent, and the connection is kept."""
+        self.connection.max_silence = 0
+        self.keepalive.pause()
+        self.keepalive.start()
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.keepalive.stop()
+        assert self.connection.reconnect.called is False
+        assert self.connection.send.called is False
+
+
+class TestRun(KeepaliveTestCase):
+    def test_pings_sent(self):
+        self.keepalive.start()
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.keepalive.stop()
+        assert self.connection.send.call_count >= 2
+
+    def test_reconnect_when_stale(self):
+        self.connection.max_silence = 0
+        self.keepalive.start()
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.connection.reconnect.assert_called_once_with(abort=True)
+        assert self.connection.send.called is False
+
+
+class TestReconnect:
+    def test_dead_server(self):
+        """A server that stops answering gets connected to again."""
+        connections = []
+
+        async def serve(reader, writer):
+            connections.append(writer)
+            await reader.read()  # Never answer.
+
+        async def scenario():
+            server = await asyncio.start_server(serve, '127.0.0.1', 0)
+            client = BlankClient()
+            client.connection = Connection(
+                client=client,
+                host='127.0.0.1',
+                port=server.sockets[0].getsockname()[1],
+                ssl=False,
+                keepalive_interval=0.01,
+                max_lag=0.02,
+            )
+            task = asyncio.get_event_loop().create_task(client.connection.connect())
+            while len(connections) < 2:
+                await asyncio.sleep(0.01)
+            client.connection.disconnect()
+            await task
+            server.close()
+            await server.wait_closed()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(asyncio.wait_for(scenario(), 5))
+        finally:
+            loop.close()
+        assert len(connections) >= 2
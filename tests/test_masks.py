@@ -0,0 +1,73 @@
+from framewirc.masks import ignore, MaskSet
+from framewirc.messages import ReceivedMessage
+
+
+class TestMaskSet:
+    def test_literal(self):
+        masks = MaskSet(['Nick!~user@host.example.com'])
+        assert masks.match('nick!~user@HOST.example.com')
+        assert not masks.match('nick!~user@host.example.org')
+
+    def test_host_suffix(self):
+        masks = MaskSet(['*!*@*.example.com'])
+        assert masks.match('nick!~user@a.b.example.com')
+        assert not masks.match('nick!~user@example.com')
+        assert not masks.match('nick!~user@a.example.com.evil')
+
+    def test_literal_host(self):
+        masks = MaskSet(['bad*!*@example.com'])
+        assert masks.match('badnick!~user@example.com')
+        assert not masks.match('goodnick!~user@example.com')
+
+    def test_other(self):
+        masks = MaskSet(['*!~us?r@*ample.com', '*bot!*@*'])
+        assert masks.match('nick!~user@example.com')
+        assert masks.match('nick!~usar@sample.com')
+        assert masks.match('mybot!~x@y')
+        assert not masks.match('nick!~ussr@examples.com')
+
+    def test_brackets_literal(self):
+        """Only `*` and `?` are wildcards."""
+        masks = MaskSet(['[bot]*!*@*'])
+        assert masks.match('[bot]nick!~user@host')
+        assert not masks.match('bnick!~user@host')
+
+    def test_server_prefix(self):
+        masks = MaskSet(['*.example.com', '*!*@*.example.com'])
+        assert masks.match('irc.example.com')
+        assert not masks.match('irc.example.org')
+
+    def test_add_discard(self):
+        masks = MaskSet()
+        assert not masks.match('nick!~user@host')
+
+        masks.add('nick!*@*')
+        assert masks.match('nick!~user@host')
+        assert 'NICK!*@*' in masks
+
+        masks.discard('nick!*@*')
+        assert not masks.match('nick!~user@host')
+        assert len(masks) == 0
+
+    def test_cache_bounded(self):
+        masks = MaskSet(['*!*@*.example.com'])
+        masks.cache_size = 2
+        for n in range(5):
+            masks.match('nick{}!~user@example.com'.format(n))
+        assert len(masks._cache) == 2
+
+
+class TestIgnore:
+    def test_ignored(self):
+        message_filter = ignore(MaskSet(['*!*@spam.example.com']))
+        message = ReceivedMessage(b':nick!~u@spam.example.com PRIVMSG #a :hi\r\n')
+        assert message_filter(None, message) is False
+
+    def test_not_ignored(self):
+        message_filter = ignore(MaskSet(['*!*@spam.example.com']))
+        message = ReceivedMessage(b':nick!~u@example.com PRIVMSG #a :hi\r\n')
+        assert message_filter(None, message) is True
+
+    def test_no_prefix(self):
+        message_filter = ignore(MaskSet(['*']))
+        assert message_filter(None, ReceivedMessage(b'PING :server\r\n')) is True
@@ -4,11 +4,13 @@ from unittest import mock
 import pytest
 from hypothesis import given, strategies
 
-from framewirc import exceptions
+from framewirc import commands, exceptions
 from framewirc.messages import (
     build_message,
+    BuiltMessage,
     chunk_message,
     make_privmsgs,
+    MessageTemplate,
     ReceivedMessage,
 )
 from framewirc.strings import to_bytes
@@ -46,6 +48,22 @@ def test_received_message(prefix, params, suffix):
     assert message.suffix == expected_suffix
 
 
+def test_received_message_known_command():
+    """Known commands are the constants from the commands module."""
+    message = ReceivedMessage(b':nick!~user@host PRIVMSG #chan :Hi\r\n')
+    assert message.command is commands.PRIVMSG
+
+
+def test_received_message_numeric():
+    message = ReceivedMessage(b':server 353 me = #chan :nick\r\n')
+    assert message.command is commands.RPL_NAMREPLY
+
+
+def test_received_message_unknown_command():
+    message = ReceivedMessage(b':server CUSTOM thing\r\n')
+    assert message.command == 'CUSTOM'
+
+
 class TestBuildMessage:
     """Make sure that build_message correctly builds bytes objects."""
     def test_basic(self):
@@ -53,6 +71,11 @@ class TestBuildMessage:
         message = build_message(b'COMMAND')
         assert message == b'COMMAND\r\n'
 
+    def test_built_message(self):
+        """Built messages are marked as already checked."""
+        message = build_message(b'COMMAND')
+        assert type(message) is BuiltMessage
+
     def test_prefix(self):
         """Command with prefix."""
         message = build_message(b'COMMAND', prefix=b'something')
@@ -298,3 +321,32 @@ class TestMakePrivMsgs:
 
         # 384 = 512 - len(b': PRIVMSG meshy :\1ACTION \1\r\n') - 100
         chunk_message.assert_called_with(msg, max_length=384)
+
+
+class TestMessageTemplate:
+    def test_render(self):
+        """Renders the same messages as make_privmsgs."""
+        template = MessageTemplate('meshy')
+        msg = 'Multi\r\nline\r\n\r\nmessage'
+        assert template.render(msg) == make_privmsgs('meshy', msg)
+
+    def test_trusted(self):
+        """Rendered messages are marked as already checked."""
+        messages = MessageTemplate('meshy').render('Message')
+        assert type(messages[0]) is BuiltMessage
+
+    def test_command(self):
+        messages = MessageTemplate('meshy', command='NOTICE').render('Message')
+        assert messages == [b'NOTICE meshy :Message\r\n']
+
+    def test_max_length(self):
+        msg = 'A test message'
+        with mock.patch('framewirc.messages.chunk_message') as chunk_message:
+            MessageTemplate('meshy', command='NOTICE').render(msg, mask_length=50)
+
+        # 444 = 512 - len(b': NOTICE meshy :\r\n') - 50
+        chunk_message.assert_called_with(msg, max_length=444)
+
+    def test_bad_target(self):
+        with pytest.raises(exceptions.StrayLineEnding):
+            MessageTemplate('meshy\r\n')
@@ -0,0 +1,116 @@
+import asyncio
+import importlib
+import sys
+from unittest import mock
+
+import pytest
+
+from framewirc.messages import ReceivedMessage
+from framewirc.registry import HandlerRegistry
+
+from .utils import BlankClient
+
+
+MODULE = 'framewirc_registry_test_handlers'
+SOURCE = '''
+calls = []
+
+
+def {name}(client, message):
+    calls.append(({name!r}, message))
+
+
+handlers = ({name},)
+'''
+
+
+@pytest.fixture
+def module_file(tmpdir, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    path = tmpdir.join(MODULE + '.py')
+
+    def write(name):
+        path.write(SOURCE.format(name=name))
+    write('first')
+    importlib.invalidate_caches()
+    yield write
+    sys.modules.pop(MODULE, None)
+
+
+def test_collected(module_file):
+    registry = HandlerRegistry(['framewirc.handlers:basic_handlers', MODULE])
+    names = [handler.__name__ for handler in registry]
+    assert names[-1] == 'first'
+    assert 'ping' in names
+
+
+def test_dispatch(module_file):
+    client = BlankClient(handlers=HandlerRegistry([MODULE]))
+    message = ReceivedMessage(b'PRIVMSG #chan :Hi\r\n')
+
+    client.on_message(message)
+
+    assert sys.modules[MODULE].calls == [('first', message)]
+
+
+def test_reload(module_file):
+    registry = HandlerRegistry([MODULE])
+    module_file('second')
+
+    registry.reload()
+
+    assert [handler.__name__ for handler in registry] == ['second']
+    assert sys.modules[MODULE].second in registry
+
+
+def test_reload_fails(module_file, tmpdir):
+    """When a module can't be loaded, the old handlers are kept."""
+    registry = HandlerRegistry([MODULE])
+    old_handlers = registry.handlers
+    tmpdir.join(MODULE + '.py').write('handlers = (')
+
+    with pytest.raises(SyntaxError):
+        registry.reload()
+
+    assert registry.handlers is old_handlers
+
+
+def test_reload_fails_partway(module_file, tmpdir):
+    """When one module can't be loaded, the others are left as they were."""
+    other = tmpdir.join(MODULE + '_other.py')
+    other.write(SOURCE.format(name='other'))
+    try:
+        registry = HandlerRegistry([MODULE, MODULE + '_other'])
+        original = sys.modules[MODULE]
+        module_file('second')
+        other.write('handlers = (')
+
+        with pytest.raises(SyntaxError):
+            registry.reload()
+
+        assert sys.modules[MODULE] is original
+        assert not hasattr(original, 'second')
+    finally:
+        sys.modules.pop(MODULE + '_other', None)
+
+
+def test_watch(module_file):
+    registry = HandlerRegistry([MODULE])
+
+    async def scenario():
+        watching = asyncio.ensure_future(registry.watch(interval=0.01))
+        await asyncio.sleep(0.02)
+        with mock.patch('os.stat') as stat:
+            stat.return_value.st_mtime_ns = 1
+            module_file('second')
+            await asyncio.sleep(0.03)
+        watching.cancel()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+    assert [handler.__name__ for handler in registry] == ['second']
@@ -0,0 +1,182 @@
+import asyncio
+from unittest import mock
+
+from framewirc.connection import Connection
+from framewirc.messages import ReceivedMessage
+from framewirc.relay import Destination, Relay
+
+from .utils import BlankClient
+
+
+class RelayTestCase:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+        self.source = BlankClient()
+        self.target = BlankClient(mask_length=20, registered=True)
+        self.target.connection = mock.MagicMock(spec=Connection)
+        self.sent = self.target.connection.send_batch_async.call_args_list
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def run(self, function, *args):
+        """Call `function` inside the loop, then let queued messages send."""
+        async def call():
+            function(*args)
+            await asyncio.sleep(0.01)
+        self.loop.run_until_complete(call())
+
+
+class TestRelay(RelayTestCase):
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.relay = Relay()
+        self.destination = self.relay.route('#Source', self.target, '#target')
+
+    def teardown_method(self, method):
+        self.relay.stop()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        super().teardown_method(method)
+
+    def relay_message(self, raw_message):
+        self.run(self.relay.handler, self.source, ReceivedMessage(raw_message))
+
+    def test_privmsg(self):
+        self.relay_message(b':nick!~user@host PRIVMSG #source :Hello\r\n')
+        assert self.sent == [mock.call([b'PRIVMSG #target :<nick> Hello\r\n'])]
+
+    def test_notice(self):
+        self.relay_message(b':nick!~user@host NOTICE #source :Hello\r\n')
+        assert self.sent == [mock.call([b'PRIVMSG #target :-nick- Hello\r\n'])]
+
+    def test_action(self):
+        self.relay_message(b':nick!~user@host PRIVMSG #source :\1ACTION waves\1\r\n')
+        assert self.sent == [mock.call([b'PRIVMSG #target :* nick waves\r\n'])]
+
+    def test_unrouted_channel(self):
+        self.relay_message(b':nick!~user@host PRIVMSG #other :Hello\r\n')
+        assert self.sent == []
+
+    def test_other_commands_ignored(self):
+        self.relay_message(b':nick!~user@host TOPIC #source :Hello\r\n')
+        assert self.sent == []
+
+    def test_custom_template(self):
+        self.relay.template = '[{nick}] {body}'
+        self.relay_message(b':nick!~user@host PRIVMSG #source :Hello\r\n')
+        assert self.sent == [mock.call([b'PRIVMSG #target :[nick] Hello\r\n'])]
+
+
+class TestDestination(RelayTestCase):
+    def test_batched(self):
+        """Queued lines are sent together."""
+        destination = Destination(self.target, '#target')
+        self.run(destination.put, 'one\ntwo\nthree')
+        destination.stop()
+
+        expected = [
+            b'PRIVMSG #target :one\r\n',
+            b'PRIVMSG #target :two\r\n',
+            b'PRIVMSG #target :three\r\n',
+        ]
+        assert self.sent == [mock.call(expected)]
+
+    def test_batch_size(self):
+        destination = Destination(self.target, '#target')
+        destination.batch_size = 2
+        self.run(destination.put, 'one\ntwo\nthree')
+        destination.stop()
+
+        assert [len(call[0][0]) for call in self.sent] == [2, 1]
+
+    def test_full_queue(self):
+        """When the queue is full, new lines are dropped."""
+        destination = Destination(self.target, '#target')
+        destination.queue = asyncio.Queue(maxsize=1)
+        destination.task = mock.Mock()  # Nothing is sending.
+
+        destination.put('one\ntwo\nthree')
+
+        assert destination.dropped == 2
+        assert destination.queue.get_nowait() == b'PRIVMSG #target :one\r\n'
+
+    def test_connection_lost(self):
+        """A batch that fails to send is dropped, and sending carries on."""
+        sent = []
+
+        async def send_batch_async(batch):
+            if not sent:
+                sent.append(None)
+                raise ConnectionResetError
+            sent.append(batch)
+        self.target.connection.send_batch_async.side_effect = send_batch_async
+        destination = Destination(self.target, '#target')
+
+        self.run(destination.put, 'lost')
+        self.run(destination.put, 'sent')
+        destination.stop()
+
+        assert destination.dropped == 1
+        assert sent[1:] == [[b'PRIVMSG #target :sent\r\n']]
+
+    def test_unexpected_error(self):
+        """Other errors are reported, and sending carries on."""
+        handler = mock.Mock()
+        self.loop.set_exception_handler(handler)
+        self.target.connection.send_batch_async.side_effect = [ValueError, None]
+        destination = Destination(self.target, '#target')
+
+        self.run(destination.put, 'broken')
+        self.run(destination.put, 'sent')
+        destination.stop()
+
+        assert destination.dropped == 1
+        assert isinstance(handler.call_args[0][1]['exception'], ValueError)
+        assert self.sent[1] == mock.call([b'PRIVMSG #target :sent\r\n'])
+
+    def test_wait_until_registered(self):
+        """Nothing is sent until the client has registered."""
+        self.target.registered = False
+        destination = Destination(self.target, '#target')
+
+        self.run(destination.put, 'early')
+        assert self.sent == []
+
+        self.run(self.target.on_register)
+        destination.stop()
+        assert self.sent == [mock.call([b'PRIVMSG #target :early\r\n'])]
+
+    def test_restarted(self):
+        """A task that has ended is replaced by the next `put`."""
+        destination = Destination(self.target, '#target')
+        self.run(destination.put, 'one')
+        destination.task.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        assert destination.task is None
+
+        self.run(destination.put, 'two')
+        destination.stop()
+        assert len(self.sent) == 2
+
+    def test_slow_destination_independent(self):
+        """A destination that is slow to send does not hold up another."""
+        async def never_sent(batch):
+            await asyncio.Future()
+
+        slow = BlankClient(registered=True)
+        slow.connection = mock.MagicMock(spec=Connection)
+        slow.connection.send_batch_async.side_effect = never_sent
+        slow_destination = Destination(slow, '#slow')
+        fast_destination = Destination(self.target, '#fast')
+
+        def put_both(text):
+            slow_destination.put(text)
+            fast_destination.put(text)
+
+        self.run(put_both, 'one')
+        self.run(put_both, 'two')
+        slow_destination.stop()
+        fast_destination.stop()
+
+        assert slow.connection.send_batch_async.call_count == 1
+        assert len(self.sent) == 2
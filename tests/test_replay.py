@@ -0,0 +1,104 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from framewirc import capture, handlers
+from framewirc.replay import main, read_capture, RecordingConnection, Replayer
+
+from .utils import BlankClient
+
+
+RAW_LINES = [
+    b':nick!~user@host PRIVMSG #chan :Hello\r\n',
+    b'PING :server\r\n',
+]
+
+
+class ReplayClient(BlankClient):
+    handlers = handlers.basic_handlers
+
+
+def write_lines(tmpdir):
+    path = tmpdir.join('capture.txt')
+    path.write_binary(b''.join(RAW_LINES))
+    return str(path)
+
+
+def write_segment(tmpdir):
+    writer = capture.SegmentWriter(directory=str(tmpdir))
+    for line in RAW_LINES:
+        writer.handler(None, line)
+    writer.close()
+    return writer.segments[0]
+
+
+class TestReadCapture:
+    def test_lines(self, tmpdir):
+        records = list(read_capture(write_lines(tmpdir)))
+        assert records == [(None, line) for line in RAW_LINES]
+
+    def test_blank_lines_skipped(self, tmpdir):
+        path = tmpdir.join('blanks.txt')
+        path.write_binary(b'\n' + b''.join(RAW_LINES) + b'\r\n')
+        records = list(read_capture(str(path)))
+        assert records == [(None, line) for line in RAW_LINES]
+
+    def test_segment(self, tmpdir):
+        records = list(read_capture(write_segment(tmpdir)))
+        assert [raw for _, raw in records] == RAW_LINES
+        assert all(received is not None for received, _ in records)
+
+
+def test_recording_connection():
+    connection = RecordingConnection(client=BlankClient())
+    connection.send(b'PONG :server\r\n')
+    assert connection.sent == [b'PONG :server\r\n']
+
+
+class TestReplayer:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def test_report(self, tmpdir):
+        client = ReplayClient()
+        replayer = Replayer(client, write_lines(tmpdir))
+
+        report = self.loop.run_until_complete(replayer.run())
+
+        assert report['messages'] == 2
+        assert report['sent'] == 1  # PONG
+        assert report['instrumentation']['commands'] == {'PRIVMSG': 1, 'PING': 1}
+        handler_name = 'framewirc.handlers.ping'
+        assert report['instrumentation']['handlers'][handler_name]['calls'] == 2
+
+    def test_sends_recorded(self, tmpdir):
+        client = ReplayClient()
+        replayer = Replayer(client, write_lines(tmpdir))
+
+        self.loop.run_until_complete(replayer.run())
+
+        assert replayer.connection.sent == [b'PONG :server\r\n']
+
+    def test_speed(self, tmpdir):
+        """At a given speed, the gaps between messages are kept."""
+        writer = capture.SegmentWriter(directory=str(tmpdir))
+        now = time.time()
+        for offset, line in enumerate(RAW_LINES):
+            with mock.patch('time.time', return_value=now + offset):
+                writer.handler(None, line)
+        writer.close()
+        replayer = Replayer(ReplayClient(), writer.segments[0], speed=20)
+
+        report = self.loop.run_until_complete(replayer.run())
+
+        assert report['elapsed'] >= 0.05
+
+
+def test_main(tmpdir, capsys):
+    main([write_lines(tmpdir), 'tests.test_replay.ReplayClient'])
+    report = json.loads(capsys.readouterr()[0])
+    assert report['messages'] == 2
@@ -0,0 +1,225 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from framewirc import exceptions, replies
+from framewirc.connection import Connection
+from framewirc.messages import ReceivedMessage
+
+from .utils import BlankClient
+
+
+class CollectorTestCase:
+    """Base TestCase with a ReplyCollector attached to a mock connection."""
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+        self.client = BlankClient()
+        self.client.connection = mock.MagicMock(spec=Connection)
+        self.collector = replies.ReplyCollector(client=self.client)
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def feed(self, *raw_messages):
+        for raw_message in raw_messages:
+            self.collector.feed(ReceivedMessage(raw_message))
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def start(self, query, key, message=b'QUERY\r\n'):
+        task = self.loop.create_task(self.collector.fetch(query, key, message))
+        self.run(asyncio.sleep(0))  # Let the query get sent.
+        return task
+
+
+class TestFetch(CollectorTestCase):
+    def test_names(self):
+        """NAMES replies are collected into a single list of nicks."""
+        task = self.start(replies.NAMES, '#chan')
+        self.feed(
+            b':server 353 me = #chan :@op +voiced\r\n',
+            b':server 353 me = #chan :user\r\n',
+            b':server 366 me #chan :End of /NAMES list.\r\n',
+        )
+        assert self.run(task) == ['@op', '+voiced', 'user']
+
+    def test_who(self):
+        task = self.start(replies.WHO, '#chan')
+        self.feed(
+            b':server 352 me #chan ~id host.com irc.server nick H@ :0 Real Name\r\n',
+            b':server 315 me #chan :End of /WHO list.\r\n',
+        )
+        expected = replies.WhoReply(
+            channel='#chan',
+            ident='~id',
+            host='host.com',
+            server='irc.server',
+            nick='nick',
+            flags='H@',
+            hops=0,
+            real_name='Real Name',
+        )
+        assert self.run(task) == [expected]
+
+    def test_list(self):
+        task = self.start(replies.LIST, '')
+        self.feed(
+            b':server 321 me Channel :Users  Name\r\n',
+            b':server 322 me #chan 42 :Topic here\r\n',
+            b':server 323 me :End of /LIST\r\n',
+        )
+        assert self.run(task) == [replies.ChannelListing('#chan', 42, 'Topic here')]
+
+    def test_bans(self):
+        task = self.start(replies.BANS, '#chan')
+        self.feed(
+            b':server 367 me #chan *!*@bad.host op 1500000000\r\n',
+            b':server 367 me #chan *!*@short.ban\r\n',
+            b':server 368 me #chan :End of Channel Ban List\r\n',
+        )
+        assert self.run(task) == [
+            replies.Ban('*!*@bad.host', 'op', 1500000000),
+            replies.Ban('*!*@short.ban', None, None),
+        ]
+
+    def test_message_sent(self):
+        self.start(replies.NAMES, '#chan', message=b'NAMES #chan\r\n')
+        self.client.connection.send.assert_called_once_with(b'NAMES #chan\r\n')
+
+    def test_replies_go_to_oldest_request(self):
+        """Replies are matched to requests in the order they were sent."""
+        first = self.start(replies.NAMES, '#first')
+        second = self.start(replies.NAMES, '#second')
+        self.feed(
+            b':server 353 me = #first :a\r\n',
+            b':server 366 me #first :End of /NAMES list.\r\n',
+            b':server 353 me = #second :b\r\n',
+            b':server 366 me #second :End of /NAMES list.\r\n',
+        )
+        assert self.run(first) == ['a']
+        assert self.run(second) == ['b']
+
+    def test_unrequested_replies_ignored(self):
+        """Replies that nobody asked for don't cause errors."""
+        self.feed(
+            b':server 353 me = #chan :a\r\n',
+            b':server 366 me #chan :End of /NAMES list.\r\n',
+        )
+
+    def test_identical_requests_share_query(self):
+        """Identical requests in flight only send one query to the network."""
+        first = self.start(replies.NAMES, '#chan')
+        second = self.start(replies.NAMES, '#CHAN')
+        self.feed(
+            b':server 353 me = #chan :a\r\n',
+            b':server 366 me #chan :End of /NAMES list.\r\n',
+        )
+        assert self.run(first) == self.run(second) == ['a']
+        assert self.client.connection.send.call_count == 1
+
+    def test_cached(self):
+        """Results are cached, and not requested again."""
+        first = self.start(replies.NAMES, '#chan')
+        self.feed(b':server 366 me #chan :End of /NAMES list.\r\n')
+        self.run(first)
+
+        second = self.start(replies.NAMES, '#chan')
+        assert self.run(second) == []
+        assert self.client.connection.send.call_count == 1
+
+    def test_cache_expires(self):
+        """Once the cache has expired, the network is asked again."""
+        self.collector.cache_ttl = 0
+        first = self.start(replies.NAMES, '#chan')
+        self.feed(b':server 366 me #chan :End of /NAMES list.\r\n')
+        self.run(first)
+
+        self.start(replies.NAMES, '#chan')
+        assert self.client.connection.send.call_count == 2
+
+    def test_timeout(self):
+        """A request that is never answered raises TimeoutError."""
+        self.collector.timeout = 0
+        task = self.start(replies.NAMES, '#chan')
+        with pytest.raises(asyncio.TimeoutError):
+            self.run(task)
+        assert not self.collector._in_flight
+
+    def test_other_channel_ignored(self):
+        """Floods for other channels (eg: after a JOIN) aren't collected."""
+        task = self.start(replies.NAMES, '#a')
+        self.feed(
+            b':server 353 me = #b :me x y\r\n',
+            b':server 366 me #b :End of /NAMES list.\r\n',
+        )
+        assert not task.done()
+
+        self.feed(
+            b':server 353 me = #A :me z\r\n',
+            b':server 366 me #A :End of /NAMES list.\r\n',
+        )
+        assert self.run(task) == ['me', 'z']
+
+    def test_end_matched_to_mask(self):
+        """The end of a WHO names its mask, so it resolves the right request."""
+        first = self.start(replies.WHO, '*.first.com')
+        second = self.start(replies.WHO, '*.second.com')
+        self.feed(b':server 315 me *.second.com :End of /WHO list.\r\n')
+        assert self.run(second) == []
+        assert not first.done()
+
+    def test_error(self):
+        """An error numeric for the target fails the request at once."""
+        task = self.start(replies.BANS, '#gone')
+        self.feed(b':server 403 me #gone :No such channel\r\n')
+        with pytest.raises(exceptions.ReplyError) as error:
+            self.run(task)
+        assert error.value.message.command == '403'
+        assert not self.collector._in_flight
+
+    def test_error_for_other_target(self):
+        task = self.start(replies.BANS, '#chan')
+        self.feed(b':server 403 me #gone :No such channel\r\n')
+        assert not task.done()
+
+    def test_error_for_oldest_kind(self):
+        """An error shared by several kinds of query answers the oldest."""
+        names = self.start(replies.NAMES, '#gone')
+        bans = self.start(replies.BANS, '#gone')
+        self.feed(b':server 403 me #gone :No such channel\r\n')
+        with pytest.raises(exceptions.ReplyError):
+            self.run(names)
+        assert not bans.done()
+
+    def test_malformed_reply(self):
+        """A reply that can't be parsed only fails the request it is for."""
+        bad = self.start(replies.LIST, '#bad')
+        good = self.start(replies.BANS, '#chan')
+        self.feed(
+            b':server 322 me #bad lots :Topic\r\n',
+            b':server 322 me #other 1 :Topic\r\n',
+            b':server 323 me :End of /LIST\r\n',
+            b':server 368 me #chan :End of Channel Ban List\r\n',
+        )
+        with pytest.raises(ValueError):
+            self.run(bad)
+        assert self.run(good) == []
+
+    def test_send_fails(self):
+        """A request that couldn't be sent isn't left in flight."""
+        self.client.connection.send.side_effect = ConnectionResetError
+        task = self.start(replies.NAMES, '#chan')
+        with pytest.raises(ConnectionResetError):
+            self.run(task)
+        assert not self.collector._in_flight
+        assert not self.collector._queues[replies.NAMES]
+
+    def test_disconnected(self):
+        """Requests in flight fail when the connection closes."""
+        task = self.start(replies.NAMES, '#chan')
+        self.collector.disconnected()
+        with pytest.raises(ConnectionError):
+            self.run(task)
+        assert not self.collector._in_flight
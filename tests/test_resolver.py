@@ -0,0 +1,177 @@
+import asyncio
+import socket
+from unittest import mock
+
+import pytest
+
+from framewirc import resolver
+from framewirc.connection import Connection
+from framewirc.resolver import interleave, race, Resolver
+
+from .utils import BlankClient
+
+
+V4 = socket.AF_INET
+V6 = socket.AF_INET6
+
+
+class StubResolver(Resolver):
+    """Answers from a dict, instead of DNS."""
+    def __init__(self, hosts, **kwargs):
+        super().__init__(**kwargs)
+        self.hosts = hosts
+        self.lookups = []
+
+    async def lookup(self, host, port):
+        self.lookups.append(host)
+        return [(family, (address, port)) for family, address in self.hosts[host]]
+
+
+class LoopTestCase:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+def test_interleave():
+    addresses = [(V6, 'a'), (V6, 'b'), (V6, 'c'), (V4, 'd'), (V4, 'e')]
+    assert interleave(addresses) == [
+        (V6, 'a'), (V4, 'd'), (V6, 'b'), (V4, 'e'), (V6, 'c'),
+    ]
+
+
+class TestResolver(LoopTestCase):
+    def test_cached(self):
+        stub = StubResolver({'irc.example.com': [(V4, '192.0.2.1')]})
+
+        first = self.run(stub.resolve('irc.example.com', 6697))
+        second = self.run(stub.resolve('irc.example.com', 6697))
+
+        assert first == second == [(V4, ('192.0.2.1', 6697))]
+        assert stub.lookups == ['irc.example.com']
+
+    def test_expired(self):
+        stub = StubResolver({'irc.example.com': [(V4, '192.0.2.1')]}, ttl=60)
+        with mock.patch('time.monotonic', return_value=0):
+            self.run(stub.resolve('irc.example.com', 6697))
+        with mock.patch('time.monotonic', return_value=61):
+            self.run(stub.resolve('irc.example.com', 6697))
+        assert len(stub.lookups) == 2
+
+    def test_forget(self):
+        stub = StubResolver({'irc.example.com': [(V4, '192.0.2.1')]})
+        self.run(stub.resolve('irc.example.com', 6697))
+        stub.forget('irc.example.com', 6697)
+        self.run(stub.resolve('irc.example.com', 6697))
+        assert len(stub.lookups) == 2
+
+
+class TestRace(LoopTestCase):
+    def connect_stub(self, behaviour):
+        """Patch connecting so each address sleeps, then fails or connects."""
+        self.attempts = []
+        self.cancelled = []
+
+        async def connect_one(family, sockaddr):
+            self.attempts.append(sockaddr)
+            delay, outcome = behaviour[sockaddr]
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.cancelled.append(sockaddr)
+                raise
+            if outcome is None:
+                raise ConnectionRefusedError(sockaddr)
+            return outcome
+        return mock.patch.object(resolver, '_connect_one', connect_one)
+
+    def test_slow_address_overtaken(self):
+        winner = mock.Mock()
+        behaviour = {'dead': (10, None), 'live': (0, winner)}
+        with self.connect_stub(behaviour):
+            start = self.loop.time()
+            result = self.run(race([(V6, 'dead'), (V4, 'live')], delay=0.01))
+        assert result is winner
+        assert self.loop.time() - start < 1
+
+    def test_failure_starts_next(self):
+        """A failed attempt doesn't wait out the delay."""
+        winner = mock.Mock()
+        behaviour = {'refused': (0, None), 'live': (0, winner)}
+        with self.connect_stub(behaviour):
+            start = self.loop.time()
+            result = self.run(race([(V6, 'refused'), (V4, 'live')], delay=10))
+        assert result is winner
+        assert self.loop.time() - start < 1
+
+    def test_all_fail(self):
+        behaviour = {'a': (0, None), 'b': (0, None)}
+        with self.connect_stub(behaviour):
+            with pytest.raises(OSError):
+                self.run(race([(V4, 'a'), (V4, 'b')], delay=0.01))
+        assert self.attempts == ['a', 'b']
+
+    def test_losers_cancelled(self):
+        """Attempts still running when one connects are abandoned."""
+        winner = mock.Mock()
+        behaviour = {'slow': (10, None), 'live': (0, winner)}
+        with self.connect_stub(behaviour):
+            self.run(race([(V4, 'slow'), (V4, 'live')], delay=0.01))
+        assert self.cancelled == ['slow']
+
+
+class TestServers(LoopTestCase):
+    def closed_port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_rotates_past_dead_server(self):
+        async def serve(reader, writer):
+            writer.close()
+
+        async def scenario():
+            server = await asyncio.start_server(serve, '127.0.0.1', 0)
+            live_port = server.sockets[0].getsockname()[1]
+            stub = StubResolver({
+                'dead.example.com': [(V4, '127.0.0.1')],
+                'live.example.com': [(V4, '127.0.0.1')],
+            })
+            connection = Connection(
+                client=BlankClient(),
+                host='example.com',
+                resolver=stub,
+                servers=[
+                    ('dead.example.com', self.closed_port()),
+                    ('live.example.com', live_port),
+                ],
+            )
+            reader, writer = await connection._open(ssl=False)
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return stub
+
+        stub = self.run(scenario())
+        assert stub.lookups == ['dead.example.com', 'live.example.com']
+
+    def test_timeout(self):
+        async def hang(addresses, delay):
+            await asyncio.sleep(10)
+
+        connection = Connection(
+            client=BlankClient(),
+            host='example.com',
+            connect_timeout=0.01,
+            resolver=StubResolver({'example.com': [(V4, '192.0.2.1')]}),
+        )
+        with mock.patch('framewirc.connection.race', hang):
+            with pytest.raises(asyncio.TimeoutError):
+                self.run(connection._open(ssl=False))
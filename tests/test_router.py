@@ -0,0 +1,105 @@
+from unittest import mock
+
+from framewirc.client import Client
+from framewirc.messages import ReceivedMessage
+from framewirc.router import Command, CommandRouter
+
+
+def privmsg(body):
+    raw = b':nick!~user@host PRIVMSG #chan :' + body + b'\r\n'
+    return ReceivedMessage(raw)
+
+
+class TestCommand:
+    def test_split_all(self):
+        command = Command('cmd', None)
+        assert command.split('a  b c') == ('a', 'b', 'c')
+
+    def test_split_nargs(self):
+        """The last argument takes the rest of the line."""
+        command = Command('cmd', None, nargs=2)
+        assert command.split('a b c') == ('a', 'b c')
+
+    def test_split_none(self):
+        command = Command('cmd', None, nargs=0)
+        assert command.split('a b c') == ()
+
+
+class TestDispatch:
+    def setup_method(self, method):
+        self.client = mock.MagicMock(spec=Client)
+        self.router = CommandRouter()
+        self.handler = mock.Mock()
+        self.other = mock.Mock()
+        self.router.add('say', self.handler, nargs=2, usage='<target> <message>')
+        self.router.add('sing', self.other)
+
+    def test_dispatched(self):
+        message = privmsg(b'!say #other hello there')
+
+        self.router.handler(self.client, message)
+
+        kwargs = self.handler.call_args[1]
+        assert kwargs['args'] == ('#other', 'hello there')
+        assert kwargs['channel'] == '#chan'
+        assert kwargs['sender_nick'] == 'nick'
+        assert kwargs['message'] is message
+        assert self.other.called is False
+
+    def test_not_a_command(self):
+        self.router.handler(self.client, privmsg(b'say #other hello'))
+        assert self.handler.called is False
+
+    def test_unknown(self):
+        self.router.handler(self.client, privmsg(b'!sa #other hello'))
+        assert self.handler.called is False
+
+    def test_abbreviation(self):
+        self.router.abbreviations = True
+
+        self.router.handler(self.client, privmsg(b'!sin la la'))
+
+        assert self.other.call_args[1]['args'] == ('la', 'la')
+
+    def test_ambiguous_abbreviation(self):
+        self.router.abbreviations = True
+
+        self.router.handler(self.client, privmsg(b'!s la la'))
+
+        assert self.handler.called is False
+        assert self.other.called is False
+
+    def test_too_few_args(self):
+        self.router.handler(self.client, privmsg(b'!say #other'))
+
+        assert self.handler.called is False
+        self.client.privmsg.assert_called_once_with(
+            '#chan',
+            'Usage: !say <target> <message>',
+        )
+
+    def test_prefix(self):
+        router = CommandRouter(prefix='.')
+        router.add('say', self.handler)
+
+        router.handler(self.client, privmsg(b'.say hi'))
+
+        assert self.handler.called is True
+
+    def test_decorator(self):
+        @self.router.command('dance', help='Dance!')
+        def dance(**kwargs):
+            pass
+
+        assert self.router.lookup('dance').handler is dance
+
+    def test_help(self):
+        self.router.add('say', self.handler, usage='<text>', help='Say it.')
+
+        self.router.handler(self.client, privmsg(b'!help'))
+
+        assert self.client.privmsg.mock_calls == [
+            mock.call('#chan', '!help - List the commands.'),
+            mock.call('#chan', '!say <text> - Say it.'),
+            mock.call('#chan', '!sing'),
+        ]
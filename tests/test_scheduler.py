@@ -0,0 +1,197 @@
+import asyncio
+import datetime
+from unittest import mock
+
+import pytest
+
+from framewirc.messages import ReceivedMessage
+from framewirc.scheduler import Cron, Job, Scheduler
+
+from .utils import BlankClient
+
+
+class TestCron:
+    def next_after(self, spec, when):
+        return Cron(spec).next_after(datetime.datetime(*when))
+
+    def test_every_minute(self):
+        assert self.next_after('* * * * *', (2020, 1, 1, 12, 30, 15)) == (
+            datetime.datetime(2020, 1, 1, 12, 31)
+        )
+
+    def test_step(self):
+        assert self.next_after('*/15 * * * *', (2020, 1, 1, 12, 31)) == (
+            datetime.datetime(2020, 1, 1, 12, 45)
+        )
+
+    def test_step_from_start(self):
+        """A step from a number runs to the end of the range."""
+        assert Cron('5/15 * * * *').minutes == {5, 20, 35, 50}
+
+    def test_sunday_as_seven(self):
+        assert Cron('0 0 * * 5-7').weekdays == {5, 6, 0}
+
+    def test_next_day(self):
+        assert self.next_after('0 9 * * *', (2020, 1, 1, 12, 0)) == (
+            datetime.datetime(2020, 1, 2, 9, 0)
+        )
+
+    def test_next_year(self):
+        assert self.next_after('0 0 1 1 *', (2020, 6, 1, 0, 0)) == (
+            datetime.datetime(2021, 1, 1, 0, 0)
+        )
+
+    def test_weekdays(self):
+        """2020-01-04 is a Saturday, so the next weekday is Monday the 6th."""
+        assert self.next_after('30 8 * * 1-5', (2020, 1, 4, 12, 0)) == (
+            datetime.datetime(2020, 1, 6, 8, 30)
+        )
+
+    def test_day_or_weekday(self):
+        """When both days are given, either will do (here, Sunday the 5th)."""
+        assert self.next_after('0 0 15 * 0', (2020, 1, 4, 12, 0)) == (
+            datetime.datetime(2020, 1, 5, 0, 0)
+        )
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Cron('* * *')
+        with pytest.raises(ValueError):
+            Cron('60 * * * *')
+
+    def test_never(self):
+        with pytest.raises(ValueError):
+            self.next_after('0 0 31 2 *', (2020, 1, 1, 0, 0))
+
+
+class TestScheduler:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+        self.calls = []
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def job(self, client, *args):
+        self.calls.append((client, args, self.loop.time()))
+
+    def run(self, setup, duration):
+        async def scenario():
+            scheduler = Scheduler(client='client')
+            setup(scheduler)
+            await asyncio.sleep(duration)
+            return scheduler
+        return self.loop.run_until_complete(scenario())
+
+    def test_call_later(self):
+        def setup(scheduler):
+            scheduler.call_later(0.01, self.job, 'arg')
+            scheduler.resume()
+
+        scheduler = self.run(setup, 0.05)
+
+        assert [call[:2] for call in self.calls] == [('client', ('arg',))]
+        assert len(scheduler) == 0
+
+    def test_every(self):
+        def setup(scheduler):
+            scheduler.every(0.02, self.job)
+            scheduler.resume()
+
+        scheduler = self.run(setup, 0.09)
+
+        assert 3 <= len(self.calls) <= 4
+        assert len(scheduler) == 1
+
+    def test_cancel(self):
+        def setup(scheduler):
+            scheduler.every(0.01, self.job).cancel()
+            scheduler.resume()
+
+        self.run(setup, 0.03)
+
+        assert self.calls == []
+
+    def test_paused(self):
+        """Nothing runs until resumed; then overdue jobs run once."""
+        def setup(scheduler):
+            scheduler.every(0.01, self.job)
+            self.loop.call_later(0.05, scheduler.resume)
+
+        self.run(setup, 0.055)
+
+        assert len(self.calls) == 1
+
+    def test_single_timer(self):
+        def setup(scheduler):
+            with mock.patch.object(self.loop, 'call_at') as call_at:
+                scheduler.resume()
+                for delay in (3, 2, 1, 4):
+                    scheduler.call_later(delay, self.job)
+            # Only a new earliest job moves the timer.
+            assert call_at.call_count == 3
+
+        self.run(setup, 0)
+
+    def test_exception(self):
+        """A failing job doesn't stop the others."""
+        def fail(client):
+            raise ValueError
+
+        def setup(scheduler):
+            self.loop.set_exception_handler(handler)
+            scheduler.call_later(0, fail)
+            scheduler.call_later(0, self.job)
+            scheduler.resume()
+
+        handler = mock.Mock()
+        self.run(setup, 0.01)
+
+        assert len(self.calls) == 1
+        assert isinstance(handler.call_args[0][1]['exception'], ValueError)
+
+
+class TestJob:
+    def next_due(self, job, now, wall_now):
+        with mock.patch('framewirc.scheduler.datetime') as mock_datetime:
+            mock_datetime.datetime.now.return_value = wall_now
+            mock_datetime.timedelta = datetime.timedelta
+            return job.next_due(now)
+
+    def test_cron_fired_early(self):
+        """A run that starts just before its minute isn't repeated."""
+        job = Job(None, (), cron=Cron('* * * * *'))
+        job.scheduled = datetime.datetime(2020, 1, 1, 12, 31)
+        early = datetime.datetime(2020, 1, 1, 12, 30, 59, 999000)
+
+        due = self.next_due(job, 100, early)
+
+        assert job.scheduled == datetime.datetime(2020, 1, 1, 12, 32)
+        assert due == pytest.approx(160.001)
+
+    def test_cron_missed_skipped(self):
+        job = Job(None, (), cron=Cron('* * * * *'))
+        job.scheduled = datetime.datetime(2020, 1, 1, 12, 31)
+        late = datetime.datetime(2020, 1, 1, 13, 0, 30)
+
+        self.next_due(job, 100, late)
+
+        assert job.scheduled == datetime.datetime(2020, 1, 1, 13, 1)
+
+
+class TestClientLifecycle:
+    def test_resumed_on_welcome(self):
+        client = BlankClient()
+        client.scheduler = mock.MagicMock(spec=Scheduler)
+
+        client.on_message(ReceivedMessage(b':server 001 nick :Welcome\r\n'))
+
+        client.scheduler.resume.assert_called_once_with()
+
+    def test_paused_on_disconnect(self):
+        client = BlankClient()
+        client.scheduler = mock.MagicMock(spec=Scheduler)
+
+        client.on_disconnect()
+
+        client.scheduler.pause.assert_called_once_with()
@@ -0,0 +1,161 @@
+import asyncio
+import multiprocessing
+from unittest import mock
+
+from framewirc import sharding
+from framewirc.connection import Connection
+from framewirc.sharding import ClientSpec, Outbox, Shard, Supervisor
+
+from .utils import BlankClient
+
+
+class ShardClient(BlankClient):
+    connect_to = mock.Mock()
+
+
+def spec(name):
+    return ClientSpec(name, ShardClient, name + '.example.com', {'nick': name})
+
+
+def test_assign():
+    assert sharding.assign('abcde', 2) == [['a', 'c', 'e'], ['b', 'd']]
+
+
+class TestOutbox:
+    def setup_method(self, method):
+        self.ours, self.theirs = multiprocessing.Pipe()
+        self.outbox = Outbox(self.theirs)
+
+    def test_full_pipe(self):
+        """Sending doesn't wait for the other end to read."""
+        data = [bytes(64 * 1024)] * 20
+        for item in data:
+            self.outbox.send(item)
+
+        assert [self.ours.recv() for _ in data] == data
+
+    def test_other_end_gone(self):
+        self.ours.close()
+        self.outbox.send(b'lost')
+        self.outbox._thread.join(1)
+
+        assert self.outbox.closed is True
+
+
+class TestShard:
+    def setup_method(self, method):
+        self.ours, theirs = multiprocessing.Pipe()
+        self.shard = Shard(0, theirs)
+
+    def test_connect(self):
+        self.shard.connect(spec('one'))
+
+        client = self.shard.clients['one']
+        assert client.nick == 'one'
+        assert client.shard is self.shard
+        client.connect_to.assert_called_with('one.example.com')
+
+    def test_send_local(self):
+        self.shard.connect(spec('one'))
+        connection = mock.MagicMock(spec=Connection)
+        self.shard.clients['one'].connection = connection
+
+        self.shard.send('one', b'PRIVMSG #chan :Hi\r\n')
+
+        connection.send.assert_called_once_with(b'PRIVMSG #chan :Hi\r\n')
+        assert not self.ours.poll()
+
+    def test_send_remote(self):
+        self.shard.send('elsewhere', b'PRIVMSG #chan :Hi\r\n')
+        assert self.ours.recv() == (sharding.SEND, 'elsewhere', b'PRIVMSG #chan :Hi\r\n')
+
+    def test_publish(self):
+        callback = mock.Mock()
+        self.shard.subscribe(callback)
+
+        self.shard.publish('event', {'data': 1})
+
+        callback.assert_called_once_with('event', {'data': 1})
+        assert self.ours.recv() == (sharding.PUBLISH, 'event', {'data': 1})
+
+    def test_receive(self):
+        callback = mock.Mock()
+        self.shard.subscribe(callback)
+        self.ours.send((sharding.PUBLISH, 'event', None))
+        self.ours.send((sharding.CONNECT, spec('two')))
+
+        self.shard.receive()
+
+        callback.assert_called_once_with('event', None)
+        assert list(self.shard.clients) == ['two']
+
+    def test_supervisor_gone(self):
+        """When the supervisor's end of the channel closes, the loop stops."""
+        loop = asyncio.new_event_loop()
+
+        async def start():
+            self.shard.start()
+
+        try:
+            loop.run_until_complete(start())
+            self.ours.close()
+            timeout = loop.call_later(1, loop.stop)
+            loop.run_forever()
+            assert loop.time() < timeout.when()
+            assert loop.remove_reader(self.shard.channel.fileno()) is False
+        finally:
+            loop.close()
+
+
+class TestSupervisor:
+    def make_supervisor(self, count=3):
+        supervisor = Supervisor([spec(str(n)) for n in range(count)], processes=count)
+        supervisor.channels = [mock.Mock() for _ in range(count)]
+        supervisor.outboxes = [mock.Mock() for _ in range(count)]
+        return supervisor
+
+    def test_processes_capped(self):
+        assert len(Supervisor([spec('one')], processes=4).assignments) == 1
+
+    def test_route_publish(self):
+        supervisor = self.make_supervisor()
+        command = (sharding.PUBLISH, 'event', None)
+
+        supervisor.route(1, command)
+
+        supervisor.outboxes[0].send.assert_called_once_with(command)
+        assert supervisor.outboxes[1].send.called is False
+        supervisor.outboxes[2].send.assert_called_once_with(command)
+
+    def test_route_send(self):
+        supervisor = self.make_supervisor()
+        command = (sharding.SEND, '2', b'PING :x\r\n')
+
+        supervisor.route(0, command)
+
+        assert supervisor.outboxes[1].send.called is False
+        supervisor.outboxes[2].send.assert_called_once_with(command)
+
+    def test_restarted(self):
+        supervisor = self.make_supervisor()
+        with mock.patch.object(supervisor, 'start_shard') as start_shard:
+            supervisor.shard_died(1)
+        start_shard.assert_called_once_with(1)
+
+    def test_rebalanced(self):
+        """Shards that die too often are given up, and their clients moved."""
+        supervisor = self.make_supervisor()
+        supervisor.max_restarts = 0
+        dead_channel = supervisor.channels[1]
+        dead_outbox = supervisor.outboxes[1]
+
+        supervisor.shard_died(1)
+
+        dead_channel.close.assert_called_once_with()
+        dead_outbox.close.assert_called_once_with()
+        assert supervisor.live() == [0, 2]
+        assert supervisor.assignments[1] == []
+        assert spec('1') in supervisor.assignments[0]
+        supervisor.outboxes[0].send.assert_called_once_with(
+            (sharding.CONNECT, spec('1')),
+        )
@@ -0,0 +1,137 @@
+import asyncio
+from unittest import mock
+
+from framewirc import simulator
+from framewirc.connection import Connection
+from framewirc.handlers import basic_handlers
+from framewirc.messages import ReceivedMessage
+
+from .utils import BlankClient
+
+
+class TestHistogram:
+    def test_empty(self):
+        histogram = simulator.Histogram()
+        assert histogram.percentile(50) is None
+        assert histogram.snapshot()['mean'] is None
+
+    def test_buckets(self):
+        """Durations are counted in power-of-two microsecond buckets."""
+        histogram = simulator.Histogram()
+        histogram.add(0.000005)  # 5µs
+        histogram.add(0.000007)  # 7µs
+        histogram.add(0.001)  # 1000µs
+        assert histogram.buckets == {4: 2, 512: 1}
+
+    def test_percentile(self):
+        histogram = simulator.Histogram()
+        for _ in range(99):
+            histogram.add(0.000005)
+        histogram.add(0.001)
+        assert histogram.percentile(50) == 0.000008
+        assert histogram.percentile(100) == 0.001024
+
+
+class TestTraffic:
+    def test_names_flood(self):
+        messages = list(simulator.names_flood('server', 'me', '#chan', 100))
+        nicks = []
+        for message in map(ReceivedMessage, messages[:-1]):
+            assert message.command == '353'
+            nicks.extend(message.suffix.split())
+        assert len(nicks) == 100
+        assert ReceivedMessage(messages[-1]).command == '366'
+
+    def test_netsplit(self):
+        messages = list(simulator.netsplit(('a.server', 'b.server'), 3))
+        assert len(messages) == 3
+        message = ReceivedMessage(messages[0])
+        assert message.command == 'QUIT'
+        assert message.suffix == b'a.server b.server'
+
+
+class TestSimulatedServer:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def connect(self, server, received):
+        """Connect a client to `server`, storing messages in `received`."""
+        def record(client, message):
+            received.append(message)
+
+        client = BlankClient(handlers=basic_handlers + (record,))
+        client.connection = Connection(
+            client=client,
+            host=server.host,
+            port=server.port,
+            ssl=False,
+        )
+        return client, self.loop.create_task(client.connection.connect())
+
+    def test_traffic(self):
+        """A registered client gets pinged, chatted to, and flooded on JOIN."""
+        server = simulator.SimulatedServer(
+            ping_interval=0.01,
+            privmsg_rate=1000,
+            names_count=100,
+        )
+        received = []
+
+        async def scenario():
+            await server.start()
+            client, task = self.connect(server, received)
+            await asyncio.sleep(0.05)
+            client.join('#load')
+            await asyncio.sleep(0.05)
+            await server.close()
+            await task
+
+        self.loop.run_until_complete(scenario())
+
+        commands = {message.command for message in received}
+        assert {'001', '005', 'PING', 'PRIVMSG', 'JOIN', '353', '366'} <= commands
+        stats = server.stats()
+        assert stats['ping_latency']['count'] > 0
+        assert stats['lines_in'] > 2
+        assert stats['lines_out'] > 100
+        assert stats['bytes_out_per_second'] > 0
+
+    def test_excess_flood(self):
+        """Clients that send too much are disconnected."""
+        server = simulator.SimulatedServer(ping_interval=10, privmsg_rate=0)
+        received = []
+
+        async def scenario():
+            await server.start()
+            client, task = self.connect(server, received)
+            await asyncio.sleep(0.01)
+            for _ in range(10):
+                client.join('#load')
+            await task
+            await server.close()
+
+        self.loop.run_until_complete(scenario())
+
+        assert received[-1].command == 'ERROR'
+        assert server.counters['flood_disconnects'] == 1
+
+    def test_slow_client_slows_chatter(self):
+        """Nothing more is sent until the client has taken the last batch."""
+        server = simulator.SimulatedServer(privmsg_rate=1000)
+        writer = mock.MagicMock(spec=asyncio.StreamWriter)
+        writer.transport.is_closing.return_value = False
+
+        async def scenario():
+            stuck = asyncio.get_event_loop().create_future()
+            writer.drain = mock.Mock(return_value=stuck)
+            session = simulator._Session(reader=None, writer=writer)
+            task = asyncio.get_event_loop().create_task(server._chatter(session))
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        self.loop.run_until_complete(scenario())
+
+        assert writer.write.call_count == 1
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+from unittest import mock
+
+from framewirc.connection import Connection
+from framewirc.spool import Spool
+
+
+class SpoolTestCase:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def make_spool(self, tmpdir):
+        return Spool(path=str(tmpdir.join('spool')))
+
+
+class TestAppend(SpoolTestCase):
+    def test_read(self, tmpdir):
+        spool = self.make_spool(tmpdir)
+        spool.append(b'PRIVMSG #chan :One\r\n')
+        spool.append(b'PRIVMSG #chan :Two\r\nPRIVMSG #chan :Three\r\n')
+        spool.close()
+
+        assert list(spool.read()) == [
+            b'PRIVMSG #chan :One\r\n',
+            b'PRIVMSG #chan :Two\r\n',
+            b'PRIVMSG #chan :Three\r\n',
+        ]
+
+    def test_expired(self, tmpdir):
+        """Messages older than max_age are not read."""
+        spool = self.make_spool(tmpdir)
+        spool.max_age = 60
+        with mock.patch('time.time', return_value=time.time() - 61):
+            spool.append(b'PRIVMSG #chan :Old\r\n')
+        spool.append(b'PRIVMSG #chan :New\r\n')
+        spool.close()
+
+        assert list(spool.read()) == [b'PRIVMSG #chan :New\r\n']
+
+
+class TestReplay(SpoolTestCase):
+    def test_sent_in_batches(self, tmpdir):
+        spool = self.make_spool(tmpdir)
+        spool.batch_size = 2
+        for n in range(3):
+            spool.append(b'PRIVMSG #chan :%d\r\n' % n)
+        connection = mock.MagicMock(spec=Connection)
+
+        self.loop.run_until_complete(spool.replay(connection))
+
+        assert connection.send_batch_async.mock_calls == [
+            mock.call([b'PRIVMSG #chan :0\r\n', b'PRIVMSG #chan :1\r\n']),
+            mock.call([b'PRIVMSG #chan :2\r\n']),
+        ]
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_empty(self, tmpdir):
+        spool = self.make_spool(tmpdir)
+        connection = mock.MagicMock(spec=Connection)
+
+        self.loop.run_until_complete(spool.replay(connection))
+
+        assert connection.send_batch_async.called is False
+
+    def test_connection_lost(self, tmpdir):
+        """Messages not sent when the connection drops are kept."""
+        spool = self.make_spool(tmpdir)
+        spool.batch_size = 1
+        for n in range(3):
+            spool.append(b'PRIVMSG #chan :%d\r\n' % n)
+        connection = mock.MagicMock(spec=Connection)
+        connection.send_batch_async.side_effect = [None, ConnectionResetError]
+
+        self.loop.run_until_complete(spool.replay(connection))
+        spool.close()
+
+        assert list(spool.read()) == [b'PRIVMSG #chan :2\r\n']
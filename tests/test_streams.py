@@ -0,0 +1,165 @@
+import asyncio
+
+from framewirc import filters
+from framewirc.messages import ReceivedMessage
+from framewirc.streams import BLOCK, DROP_NEWEST, DROP_OLDEST
+
+from .utils import BlankClient
+
+
+def message(n):
+    return ReceivedMessage(b'PRIVMSG #chan :%d\r\n' % n)
+
+
+class StreamTestCase:
+    def setup_method(self, method):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self, method):
+        self.loop.close()
+
+    def read_all(self, subscription):
+        async def read():
+            subscription.close()
+            suffixes = []
+            async for message in subscription:
+                suffixes.append(int(message.suffix))
+            return suffixes
+        return self.loop.run_until_complete(read())
+
+
+class TestMessages(StreamTestCase):
+    def test_iterate(self):
+        client = BlankClient()
+        subscription = client.messages()
+        for n in range(3):
+            client.on_message(message(n))
+
+        assert self.read_all(subscription) == [0, 1, 2]
+
+    def test_waits_for_message(self):
+        client = BlankClient()
+        subscription = client.messages()
+
+        async def read_one():
+            async for received in subscription:
+                return received
+
+        async def scenario():
+            reader = asyncio.ensure_future(read_one())
+            await asyncio.sleep(0)
+            client.on_message(message(1))
+            return await reader
+
+        assert self.loop.run_until_complete(scenario()) == message(1)
+
+    def test_filter(self):
+        client = BlankClient()
+        subscription = client.messages(filter=filters.command('NOTICE'))
+        client.on_message(message(1))
+        client.on_message(ReceivedMessage(b'NOTICE #chan :2\r\n'))
+
+        assert self.read_all(subscription) == [2]
+
+    def test_close(self):
+        client = BlankClient()
+        subscription = client.messages()
+        subscription.close()
+        client.on_message(message(1))
+
+        assert client.subscriptions == []
+        assert self.read_all(subscription) == []
+
+
+class TestOverflow(StreamTestCase):
+    def fill(self, overflow):
+        client = BlankClient()
+        subscription = client.messages(maxsize=2, overflow=overflow)
+        for n in range(3):
+            client.on_message(message(n))
+        return client, subscription
+
+    def test_drop_oldest(self):
+        client, subscription = self.fill(DROP_OLDEST)
+        assert subscription.dropped == 1
+        assert self.read_all(subscription) == [1, 2]
+
+    def test_drop_newest(self):
+        client, subscription = self.fill(DROP_NEWEST)
+        assert subscription.dropped == 1
+        assert self.read_all(subscription) == [0, 1]
+
+    def test_block(self):
+        """Messages are kept, and the client is saturated until there's room."""
+        client, subscription = self.fill(BLOCK)
+        assert subscription.dropped == 0
+        assert client.saturated is True
+
+        async def scenario():
+            drained = asyncio.ensure_future(client.drained())
+            await asyncio.sleep(0)
+            assert not drained.done()
+            await subscription.__anext__()
+            await subscription.__anext__()
+            await drained
+
+        self.loop.run_until_complete(scenario())
+        assert client.saturated is False
+
+    def test_block_closed_while_full(self):
+        """Closing a full subscription frees the reader waiting on it."""
+        client, subscription = self.fill(BLOCK)
+
+        async def scenario():
+            drained = asyncio.ensure_future(client.drained())
+            await asyncio.sleep(0)
+            subscription.close()
+            await asyncio.wait_for(drained, 1)
+
+        self.loop.run_until_complete(scenario())
+        assert subscription.saturated is False
+
+
+class TestDrained(StreamTestCase):
+    def test_backlog(self):
+        client = BlankClient()
+        first = client.messages(overflow=BLOCK)
+        second = client.messages(filter=filters.command('PRIVMSG'), overflow=BLOCK)
+        for n in range(3):
+            client.on_message(message(n))
+        assert client.backlog == 6
+
+        async def scenario():
+            drained = asyncio.ensure_future(client.drained(backlog=3))
+            await asyncio.sleep(0)
+            await first.__anext__()
+            await first.__anext__()
+            await asyncio.sleep(0)
+            assert not drained.done()
+            await second.__anext__()
+            await drained
+
+        self.loop.run_until_complete(scenario())
+        assert client.backlog == 3
+
+    def test_dropping_not_counted(self):
+        """Subscriptions that drop messages are bounded, so aren't a backlog."""
+        client = BlankClient()
+        client.messages(overflow=DROP_OLDEST)
+        client.messages(overflow=DROP_NEWEST)
+        client.on_message(message(1))
+        assert client.backlog == 0
+
+    def test_closed(self):
+        """A closed subscription no longer holds up the client."""
+        client = BlankClient()
+        subscription = client.messages(overflow=BLOCK)
+        client.on_message(message(1))
+
+        async def scenario():
+            drained = asyncio.ensure_future(client.drained(backlog=0))
+            await asyncio.sleep(0)
+            subscription.close()
+            await drained
+
+        self.loop.run_until_complete(scenario())
@@ -0,0 +1,113 @@
+import asyncio
+from unittest import mock
+
+from framewirc.messages import ReceivedMessage
+from framewirc.throttle import Throttle
+
+from .utils import BlankClient
+
+
+def privmsg(nick=b'nick', channel=b'#chan'):
+    raw = b':' + nick + b'!~user@host PRIVMSG ' + channel + b' :Spam\r\n'
+    return ReceivedMessage(raw)
+
+
+class TestThrottle:
+    def setup_method(self, method):
+        self.now = 1000.0
+        self.patcher = mock.patch('time.monotonic', side_effect=lambda: self.now)
+        self.patcher.start()
+
+    def teardown_method(self, method):
+        self.patcher.stop()
+
+    def test_burst(self):
+        throttle = Throttle(burst=2, rate=1)
+        results = [throttle(None, privmsg()) for _ in range(3)]
+        assert results == [True, True, False]
+        assert throttle.dropped == 1
+
+    def test_refill(self):
+        throttle = Throttle(burst=1, rate=0.5)
+        assert throttle(None, privmsg()) is True
+        self.now += 1
+        assert throttle(None, privmsg()) is False
+        self.now += 2
+        assert throttle(None, privmsg()) is True
+
+    def test_per_sender_and_channel(self):
+        throttle = Throttle(burst=1)
+        assert throttle(None, privmsg()) is True
+        assert throttle(None, privmsg(nick=b'other')) is True
+        assert throttle(None, privmsg(channel=b'#other')) is True
+        assert throttle(None, privmsg(nick=b'NICK')) is False
+
+    def test_other_commands(self):
+        throttle = Throttle(burst=0)
+        assert throttle(None, ReceivedMessage(b'PING :server\r\n')) is True
+        assert throttle(None, ReceivedMessage(b':server NOTICE * :hi\r\n')) is False
+
+    def test_max_keys(self):
+        throttle = Throttle(max_keys=2)
+        for n in range(5):
+            throttle(None, privmsg(nick=b'nick%d' % n))
+        assert len(throttle) == 2
+
+    def test_idle_evicted(self):
+        throttle = Throttle(burst=2, rate=1)
+        throttle(None, privmsg(nick=b'idle'))
+        self.now += 1
+        throttle(None, privmsg())
+        assert len(throttle) == 1
+
+
+class TestDefer:
+    def release(self, throttle, client, message):
+        """Send two messages from one sender, and wait for the second."""
+        async def scenario():
+            assert throttle(client, privmsg()) is True
+            assert throttle(client, message) is False
+            await asyncio.sleep(0.05)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+
+    def test_deferred(self):
+        """Messages over the limit are passed to the client again later."""
+        received = []
+        throttle = Throttle(burst=1, rate=100, defer=True)
+        client = BlankClient(
+            handlers=[lambda client, message: received.append(message)],
+            message_filters=(throttle,),
+        )
+        message = privmsg()
+
+        self.release(throttle, client, message)
+
+        # When it comes back, it is let through.
+        assert received == [message]
+        assert throttle.deferred == 1
+        assert not throttle._released
+
+    def test_released_dropped_by_other_filter(self):
+        """A released message that never reaches the throttle isn't kept."""
+        throttle = Throttle(burst=1, rate=100, defer=True)
+        handler = mock.Mock()
+        client = BlankClient(
+            handlers=[handler],
+            message_filters=(lambda client, message: False, throttle),
+        )
+
+        self.release(throttle, client, privmsg())
+
+        assert not throttle._released
+        assert handler.called is False
+
+    def test_max_deferred(self):
+        throttle = Throttle(burst=0, rate=1, defer=True, max_deferred=0)
+        assert throttle(None, privmsg()) is False
+        assert throttle.deferred == 0
+        assert throttle.dropped == 1
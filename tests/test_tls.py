@@ -0,0 +1,85 @@
+import asyncio
+import os
+import ssl
+
+from framewirc import tls
+from framewirc.instrumentation import Instrumentation
+
+from .utils import BlankClient
+
+
+CERTIFICATE = os.path.join(os.path.dirname(__file__), 'localhost.pem')
+
+
+class TestContextFor:
+    def test_shared(self):
+        context = tls.context_for('shared.example.com')
+        assert tls.context_for('shared.example.com') is context
+        assert tls.context_for('other.example.com') is not context
+
+    def test_verifies(self):
+        context = tls.context_for('verify.example.com')
+        assert isinstance(context, tls.ResumingContext)
+        assert context.check_hostname is True
+        assert context.verify_mode == ssl.CERT_REQUIRED
+
+    def test_set(self):
+        context = tls.create_context()
+        tls.set_context('set.example.com', context)
+        assert tls.context_for('set.example.com') is context
+
+
+def test_session_resumed():
+    """Reconnecting to a server resumes the previous TLS session."""
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(CERTIFICATE)
+    client_context = tls.create_context()
+    client_context.load_verify_locations(CERTIFICATE)
+    tls.set_context('resume-test', client_context)
+
+    handled = []
+
+    async def serve(reader, writer):
+        done = asyncio.get_event_loop().create_future()
+        handled.append(done)
+        await reader.readline()
+        writer.write(b'PING :server\r\n')
+        await reader.read()
+        writer.close()
+        done.set_result(None)
+
+    def disconnect_on_ping(client, message):
+        client.connection.disconnect()
+
+    async def scenario():
+        server = await asyncio.start_server(
+            serve,
+            'localhost',
+            0,
+            ssl=server_context,
+        )
+        client = BlankClient(
+            handlers=[disconnect_on_ping],
+            instrumentation=Instrumentation(),
+        )
+        for _ in range(2):
+            await client.connect_to(
+                'localhost',
+                network='resume-test',
+                port=server.sockets[0].getsockname()[1],
+            )
+        server.close()
+        await server.wait_closed()
+        await asyncio.wait(handled)
+        return client.instrumentation
+
+    loop = asyncio.new_event_loop()
+    try:
+        instrumentation = loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+    assert instrumentation.handshakes == 2
+    assert instrumentation.handshakes_resumed == 1
+    assert instrumentation.handshake_time > 0
+    assert 'localhost' in client_context.sessions
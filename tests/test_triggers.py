@@ -0,0 +1,87 @@
+from unittest import mock
+
+from framewirc.client import Client
+from framewirc.messages import ReceivedMessage
+from framewirc.triggers import TriggerMatcher
+
+
+class TestMatch:
+    def test_keywords(self):
+        matcher = TriggerMatcher({'shame': 1, 'yolo': 2, 'absent': 3})
+        assert matcher.match('yolo, shame on you') == [2, 1]
+
+    def test_no_match(self):
+        matcher = TriggerMatcher({'shame': 1})
+        assert matcher.match('nothing to see here') == []
+
+    def test_once_each(self):
+        matcher = TriggerMatcher({'shame': 1})
+        assert matcher.match('shame shame shame') == [1]
+
+    def test_special_characters(self):
+        matcher = TriggerMatcher({'c++': 1, '.': 2})
+        assert matcher.match('I like c++') == [1]
+
+    def test_keyword_prefixes(self):
+        """Keywords inside a longer keyword are found too, like `in`."""
+        matcher = TriggerMatcher({'cat': 1, 'category': 2})
+        assert matcher.match('category') == [1, 2]
+
+    def test_overlapping_keywords(self):
+        matcher = TriggerMatcher({'shame': 1, 'ham': 2})
+        assert matcher.match('shame') == [1, 2]
+
+    def test_regex(self):
+        matcher = TriggerMatcher()
+        matcher.add(r'\bhi\b', 1, regex=True)
+        matcher.add('this', 2)
+        assert matcher.match('this is hi') == [2, 1]
+        assert matcher.match('thin hint') == []
+
+    def test_ignore_case(self):
+        matcher = TriggerMatcher({'YOLO': 1}, ignore_case=True)
+        assert matcher.match('yolo') == [1]
+
+    def test_ignore_case_folding(self):
+        """Characters that casefold to a keyword's match it."""
+        matcher = TriggerMatcher({'s': 1, 'strasse': 2}, ignore_case=True)
+        assert matcher.match('\u017f') == [1]  # Long s.
+        assert matcher.match('Stra\xdfe') == [1, 2]
+
+    def test_keyword_named_like_regex(self):
+        matcher = TriggerMatcher({'t0': 1})
+        matcher.add('x', 2, regex=True)
+        assert matcher.match('t0 x') == [1, 2]
+
+
+class TestIncremental:
+    def test_added_after_match(self):
+        """Triggers added later are compiled on their own."""
+        matcher = TriggerMatcher({'one': 1})
+        matcher.match('')
+        matcher.add('two', 2)
+
+        assert matcher.match('one two') == [1, 2]
+        assert len(matcher._segments) == 2
+
+    def test_compacted(self):
+        matcher = TriggerMatcher()
+        matcher.max_segments = 2
+        for n in range(3):
+            matcher.add('word{}'.format(n), n)
+            matcher.add('re{}'.format(n), -n, regex=True)
+            matcher.match('')
+
+        assert len(matcher._segments) == 1
+        assert matcher.match('word2 re1 word0') == [2, -1, 0]
+        assert len(matcher) == 6
+
+
+def test_handler():
+    matcher = TriggerMatcher({'shame': 'ding'})
+    client = mock.MagicMock(spec=Client)
+    message = ReceivedMessage(b':nick!~user@host PRIVMSG #chan :shame!\r\n')
+
+    matcher.handler(client, message)
+
+    client.privmsg.assert_called_once_with('#chan', 'ding')